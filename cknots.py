@@ -11,19 +11,105 @@ Chromosome should be an integer between 1-23 (23 is X chromosome) or -1 to run
 all chromosomes.
 
 Usage:
-    cknots.py <in_bedpe> <in_ccd> <out_dir> <chromosome> [--full] [--compute_chromosome] [--timeout=<t>] [--mem=<m>]
+    cknots.py <in_bedpe> <in_ccd> <out_dir> <chromosome> [--full | --tiered] [--compute_chromosome]
+              [--timeout=<t>] [--mem=<m>] [--workers=<w>] [--mem_budget=<b>]
+              [--cost_model=<c>] [--cache=<d>] [--cache_size=<s>]
+              [--pd_workers=<w>] [--pd_queue=<q>] [--pd_timeout=<t>] [--pd_mem=<m>] [--pd_dir=<d>]
+              [--full_timeout=<t>] [--escalation_density=<e>] [--escalation_regions=<r>]
+              [--ccd_list=<l> | --split_only | --merge | --plan] [--no_prescreen] [--reduce]
+              [--scratch=<d>] [--grace_period=<g>] [--retries=<r>] [--retry_reduce]
+              [--status_interval=<s>] [--config=<f>] [--inter_ccd=<w>]
 
 Options:
     -h --help               Show this help message
     --full                  Use non-linear algorithm
+    --tiered                Use linear algorithm on all CCDs, then non-linear algorithm on CCDs
+                            in which linear one found nothing despite dense graph, or which
+                            overlap --escalation_regions. Results are in results.json and
+                            results_full.json
     --compute_chromosome    Try to find knots on entire chromosome, with 4x timeout of single CCD
-    --timeout=<t>           Single CCD timeout in seconds [default: 21600]
-    --mem=<m>               Memory limit in GB [default: 600]
+    --inter_ccd=<w>         After all CCDs, find knots crossing CCD boundaries in windows reaching
+                            <w> bp into neighbouring CCDs. Knots found in single CCDs are not repeated,
+                            new ones are listed in results_inter_ccd.json of every chromosome
+    --timeout=<t>           Single CCD timeout in seconds, 21600 by default
+    --mem=<m>               Memory limit of single minor finder in GB, enforced on its resident memory,
+                            no limit by default (only the memory budget), it used to be 600
+    --workers=<w>           Number of CCDs processed concurrently, CCDs of all chromosomes
+                            share one queue, 1 by default
+    --mem_budget=<b>        Memory in GB shared by all concurrently running CCDs, defaults
+                            to memory of the machine
+    --cost_model=<c>        File with CCD runtimes of previous runs, used to start the most expensive
+                            CCDs first, defaults to cost_model.json in <out_dir>
+    --cache=<d>             Directory with minor finder results cached between runs, CCDs with
+                            the same graph are not computed again
+    --cache_size=<s>        Maximal size of the cache in GB, 50 by default
+    --pd_workers=<w>        Number of path decompositions computed concurrently with --full,
+                            while minor finders run on CCDs decomposed before, 1 by default
+    --pd_queue=<q>          Maximal number of path decompositions computed ahead of minor finders,
+                            defaults to number of workers
+    --pd_timeout=<t>        Single CCD path decomposition timeout in seconds, 3600 by default
+    --pd_mem=<m>            Memory limit of single path decomposition in GB, no limit by default
+    --pd_dir=<d>            Directory for intermediate path decompositions, defaults to /dev/shm
+    --full_timeout=<t>      Single CCD timeout of non-linear algorithm in seconds with --tiered,
+                            linear one uses timeout given by --timeout, 21600 by default
+    --escalation_density=<e>  Minimal edges per node of CCDs computed again with non-linear
+                            algorithm with --tiered [default: 2.5]
+    --escalation_regions=<r>  .bed file with regions, in which all CCDs are computed with
+                            non-linear algorithm with --tiered
+    --ccd_list=<l>          File with CCDs to compute (e.g. chr_01/name.mp, one per line),
+                            already split into <out_dir> by a run with --split_only
+    --split_only            Only split input files and write CCDs to compute with their predicted
+                            runtime and memory to ccd_costs.json in <out_dir>
+    --merge                 Only build results.json of all chromosomes computed by runs with --ccd_list,
+                            CCDs of ccd_costs.json without results are listed in remaining_ccds.txt
+    --plan                  Only split input files and predict cost of every CCD (size, treewidth,
+                            cutwidth, runtime, memory, pre-screen) without running minor finders.
+                            Writes plan.txt and plan.json to <out_dir> and suggested settings to
+                            plan_config.json, usable with --config. Uses all CPUs
+    --no_prescreen          Run minor finder also on CCDs which cannot contain K6 minor (too small
+                            or too low treewidth), by default they get empty results
+    --reduce                With linear algorithm, split CCD graphs into blocks which are searched
+                            separately (in parallel) and drop nodes without contact edges
+    --scratch=<d>           Fast local directory (e.g. /dev/shm) for intermediate files, only graphs,
+                            minors and results.json are copied back to <out_dir>
+    --grace_period=<g>      Time in seconds given to running CCDs after SIGTERM or SIGINT, then they
+                            are killed and CCDs left are written to checkpoint.json, 20 by default
+    --retries=<r>           Number of times CCDs which ran out of time or memory are computed again
+                            after all other CCDs, with doubled timeout or memory limit and fewer
+                            CCDs running next to them, 1 by default
+    --retry_reduce          Retry CCDs of linear algorithm with graph reduction (see --reduce)
+    --status_interval=<s>   Time in seconds between updates of status.json and status.prom
+                            (Prometheus textfile) with progress of the run in <out_dir>, 5 by default
+    --config=<f>            JSON file with runtime settings (see RuntimeConfig), defaults to $CKNOTS_CONFIG.
+                            Settings can also be given as environment variables, e.g. CKNOTS_WORKERS.
+                            Options override environment variables, which override the file
 """
 import logging
 import os
+import sys
 from docopt import docopt
 
+# option -> setting of RuntimeConfig
+CONFIG_OPTIONS = {
+    '--timeout': 'ccd_timeout',
+    '--full_timeout': 'full_timeout',
+    '--pd_timeout': 'pd_timeout',
+    '--workers': 'workers',
+    '--pd_workers': 'pd_workers',
+    '--pd_queue': 'pd_queue_size',
+    '--mem': 'max_memory',
+    '--mem_budget': 'memory_budget',
+    '--pd_mem': 'pd_max_memory',
+    '--scratch': 'scratch_dir',
+    '--pd_dir': 'pd_dir',
+    '--cache': 'cache_dir',
+    '--cache_size': 'cache_size',
+    '--cost_model': 'cost_model_path',
+    '--grace_period': 'grace_period',
+    '--retries': 'retries',
+    '--status_interval': 'status_interval'
+}
+
 
 def run(arguments):
     if arguments['--full']:
@@ -31,31 +117,36 @@ def run(arguments):
     else:
         splitting_algorithm = 'find-k6-linear'
 
-    update_config_memory(arguments['--mem'])
-
     from cknots.cknots import run_docker
-    run_docker.run(
+    from cknots.cknots.runtime_config import RuntimeConfig
+
+    config = RuntimeConfig.load(
+        cli_values={setting: arguments[option] for option, setting in CONFIG_OPTIONS.items()},
+        config_path=arguments['--config']
+    )
+
+    return run_docker.run(
         in_bedpe=arguments['<in_bedpe>'],
         in_ccd=arguments['<in_ccd>'],
         out_dir=arguments['<out_dir>'],
         chromosome=arguments['<chromosome>'],
+        config=config,
         minor_finding_algorithm=splitting_algorithm,
-        ccd_timeout=arguments['--timeout'],
-        compute_chromosome=arguments['--compute_chromosome']
+        compute_chromosome=arguments['--compute_chromosome'],
+        tiered=arguments['--tiered'],
+        escalation_density=arguments['--escalation_density'],
+        escalation_regions=arguments['--escalation_regions'],
+        ccd_list=arguments['--ccd_list'],
+        split_only=arguments['--split_only'],
+        merge=arguments['--merge'],
+        plan=arguments['--plan'],
+        prescreen=not arguments['--no_prescreen'],
+        reduce_graphs=arguments['--reduce'],
+        retry_reduce=arguments['--retry_reduce'],
+        inter_ccd_window=arguments['--inter_ccd']
     )
 
 
-def update_config_memory(param):
-    current_file_path = os.path.realpath(__file__)
-    config_file_path = os.path.join(
-        os.path.split(current_file_path)[0],
-        'cknots/config.py'
-    )
-
-    with open(config_file_path, 'w') as f:
-        f.writelines([f'MAX_MEMORY = {int(param)} * 1024 * 1024 * 1024', ''])
-
-
 def create_results_dir(out_dir):
     out_dir_abs_path = os.path.abspath(out_dir)
 
@@ -114,6 +205,11 @@ if __name__ == "__main__":
         message = f'Invalid chromosome number: {in_chromosome}'
         raise Exception(message)
 
+    if parsed_args['--ccd_list'] is not None:
+        chromosome_name = os.path.splitext(os.path.split(parsed_args['--ccd_list'])[-1])[0]
+    elif parsed_args['--merge']:
+        chromosome_name = 'merge'
+
     set_up_logger(chromosome_name)
 
     logging.info(f'cKNOTs started.')
@@ -127,4 +223,4 @@ if __name__ == "__main__":
     check_arg(parsed_args, '<in_ccd>')
     check_arg(parsed_args, '<in_bedpe>')
 
-    run(parsed_args)
+    sys.exit(run(parsed_args))
@@ -102,13 +102,16 @@ class CCD:
         if len(self.graph.nodes) == 0:
             return 0
 
-        adj_matrix = nx.linalg.adjacency_matrix(self.graph)
-        cutwidth = 0
-        for i in range(1, adj_matrix.shape[0] + 1):
-            potential_cutwidth = adj_matrix[:i, i:].sum()
-            if potential_cutwidth > cutwidth:
-                cutwidth = potential_cutwidth
-        return cutwidth
+        # Width of the cut after each node in graph's node order, counting edges
+        # going forward in that order. Computed with a single sweep over edges.
+        node_index = {node: i for i, node in enumerate(self.graph.nodes)}
+        cut_changes = np.zeros(len(node_index) + 1, dtype=np.int64)
+        for u, v in self.graph.edges:
+            if node_index[u] < node_index[v]:
+                cut_changes[node_index[u]] += 1
+                cut_changes[node_index[v]] -= 1
+
+        return int(np.cumsum(cut_changes).max())
 
     def overlaps_with(self, other: 'CCD'):
         if self.start < other.end and other.start < self.end:
@@ -56,10 +56,11 @@ class Chromosome:
                 os.path.join(path, f'{name}.{i+1:04d}.chr{self.name}.mp.raw_minors')
             )
 
-    def load_from_path(self, path, name=None):
+    def load_from_path(self, path, name=None, results_filename='results.json'):
         """
         path: path to directory with cKNOTs results for given chromosome.
         chromosome_number: 1 to 22 or 'X' or 'Y'
+        results_filename: results.json, or results_inter_ccd.json with links crossing CCD boundaries
         """
 
         if name is None:
@@ -77,7 +78,7 @@ class Chromosome:
         else:
             self.name = str(name)
 
-        with open(os.path.join(path, 'results.json')) as f:
+        with open(os.path.join(path, results_filename)) as f:
             results_data = json.load(f)
 
         self.ccds = []
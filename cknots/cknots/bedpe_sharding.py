@@ -0,0 +1,148 @@
+"""
+Splitting genome-wide .bedpe file into per-chromosome shards in a single pass,
+so that splitter does not have to read the whole file for every chromosome.
+"""
+
+import logging
+import os
+from array import array
+
+import numpy as np
+
+LINE_NUMBERS_FLUSH_SIZE = 1024 * 1024
+
+# number of lines between checks whether sharding should stop
+STOP_CHECK_INTERVAL = 1024 * 1024
+
+
+def chromosome_number(chromosome_name):
+    """
+    Translates chromosome name from first column of .bedpe file into
+    chromosome number the same way splitter does (chrX is 23).
+
+    :param chromosome_name: name of chromosome, e.g. 'chr1'
+    :return: chromosome number or -1 if name is not recognized
+    """
+    if len(chromosome_name) > 5 or not chromosome_name.startswith('chr'):
+        return -1
+    if 'chrX' in chromosome_name:
+        return 23
+    if 'chrY' in chromosome_name:
+        return 24
+    if 'chrM' in chromosome_name:
+        return 25
+    try:
+        return int(chromosome_name[3:5])
+    except ValueError:
+        return -1
+
+
+class _Shard:
+
+    def __init__(self, shard_path):
+        self.path = shard_path
+        self.line_numbers_path = f'{shard_path}.lines'
+        self.file = open(shard_path, 'wb', buffering=LINE_NUMBERS_FLUSH_SIZE)
+        self.line_numbers_file = open(self.line_numbers_path, 'wb')
+        self.line_numbers = array('Q')
+        self.lines_count = 0
+
+    def write(self, line, line_number):
+        self.file.write(line)
+        self.line_numbers.append(line_number)
+        self.lines_count += 1
+        if len(self.line_numbers) >= LINE_NUMBERS_FLUSH_SIZE:
+            self.flush_line_numbers()
+
+    def flush_line_numbers(self):
+        self.line_numbers.tofile(self.line_numbers_file)
+        self.line_numbers = array('Q')
+
+    def close(self):
+        self.flush_line_numbers()
+        self.file.close()
+        self.line_numbers_file.close()
+
+
+def shard_bedpe(in_bedpe, shards_dir, chromosomes, stop=None):
+    """
+    Streams .bedpe file once and writes lines of each chromosome (by chrom1)
+    into shards_dir/chr_<chromosome>/<name of in_bedpe>. Original line numbers
+    of lines in every shard are written to <shard>.lines, see restore_line_numbers().
+
+    :param in_bedpe: path to .bedpe file
+    :param shards_dir: directory for shards
+    :param chromosomes: chromosome numbers (1-23) to keep
+    :param stop: threading.Event, sharding stops once it is set (checked every STOP_CHECK_INTERVAL lines)
+    :return: dict chromosome number -> path to shard, or None if shard is empty;
+        None if sharding was stopped, shards are incomplete then
+    """
+    bedpe_name = os.path.split(in_bedpe)[-1]
+    shards = {}
+
+    for chromosome in chromosomes:
+        shard_dir = os.path.join(shards_dir, f'chr_{chromosome}')
+        os.makedirs(shard_dir, exist_ok=True)
+        shards[chromosome] = _Shard(os.path.join(shard_dir, bedpe_name))
+
+    chromosome_numbers = {}
+    stopped = False
+
+    with open(in_bedpe, 'rb', buffering=LINE_NUMBERS_FLUSH_SIZE) as f:
+        for line_number, line in enumerate(f, start=1):
+            if line_number % STOP_CHECK_INTERVAL == 0 and stop is not None and stop.is_set():
+                stopped = True
+                break
+
+            fields = line.split(maxsplit=1)
+            if len(fields) == 0:
+                continue
+
+            chromosome_name = fields[0]
+            if chromosome_name not in chromosome_numbers:
+                chromosome_numbers[chromosome_name] = chromosome_number(chromosome_name.decode(errors='replace'))
+
+            shard = shards.get(chromosome_numbers[chromosome_name])
+            if shard is not None:
+                shard.write(line, line_number)
+
+    if stopped:
+        for shard in shards.values():
+            shard.close()
+        logging.warning(f'Sharding of {in_bedpe} stopped at line {line_number}')
+        return None
+
+    shard_paths = {}
+    for chromosome, shard in shards.items():
+        shard.close()
+        logging.info(f'Shard of chromosome {chromosome} has {shard.lines_count} lines')
+        shard_paths[chromosome] = shard.path if shard.lines_count > 0 else None
+
+    return shard_paths
+
+
+def restore_line_numbers(mp_path, shard_path):
+    """
+    Splitter writes number of .bedpe line as the last field of EDGE line.
+    For .mp files made from a shard, replaces it with line number in
+    the original .bedpe file, so the output is the same as without sharding.
+
+    :param mp_path: path to .mp file created from shard
+    :param shard_path: path to shard
+    :return: None
+    """
+    line_numbers = np.fromfile(f'{shard_path}.lines', dtype=np.uint64)
+
+    with open(mp_path) as f:
+        lines = f.readlines()
+
+    for i, line in enumerate(lines):
+        if line.startswith('EDGE'):
+            fields = line.split(' ')
+            fields[-1] = f'{line_numbers[int(fields[-1]) - 1]}\n'
+            lines[i] = ' '.join(fields)
+
+    tmp_path = f'{mp_path}.tmp'
+    with open(tmp_path, 'w') as f:
+        f.writelines(lines)
+    os.replace(tmp_path, mp_path)
@@ -0,0 +1,107 @@
+"""
+Packing CCDs into bins of similar cost, each computed by one Slurm array task.
+"""
+
+import math
+from dataclasses import dataclass, field
+
+from cknots.cknots.retry_policy import TIMEOUT_FACTOR
+
+GB = 1024 * 1024 * 1024
+
+# Predicted runtimes are rough, array tasks get this much more time
+TIME_SAFETY_FACTOR = 2.0
+# Time (seconds) for starting the container and loading the CCDs of a bin
+TIME_OVERHEAD = 10 * 60
+
+MIN_MEMORY_GB = 2
+
+
+@dataclass
+class CCDBin:
+    ccds: list = field(default_factory=list)  # records of ccd_costs.json
+    runtime: float = 0.0  # predicted, seconds
+    memory: int = 0  # bytes, CCDs of a bin are computed one after another
+    max_ccd_time: float = 0.0  # seconds, the longest a single CCD can take, see ccd_time_limit()
+
+    def add(self, ccd):
+        self.ccds.append(ccd)
+        self.runtime += ccd['predicted_runtime']
+        self.memory = max(self.memory, ccd['memory_estimate'])
+
+    @property
+    def memory_gb(self):
+        """
+        Memory of array task, rounded up to a power of two, so that bins
+        fall into few resource classes.
+        """
+        memory_gb = max(math.ceil(self.memory / GB), MIN_MEMORY_GB)
+        return 2 ** math.ceil(math.log2(memory_gb))
+
+    @property
+    def time_minutes(self):
+        """
+        Time limit of array task, rounded up to full hours. Predicted runtimes
+        are rough, so the bin gets TIME_SAFETY_FACTOR times its predicted runtime,
+        but at least enough for one of its CCDs to use all of max_ccd_time
+        while the others take their predicted runtime.
+        """
+        seconds = max(self.runtime * TIME_SAFETY_FACTOR, self.runtime + self.max_ccd_time) + TIME_OVERHEAD
+        return 60 * math.ceil(seconds / 3600)
+
+
+def ccd_time_limit(timeout, retries=0, timeout_factor=TIMEOUT_FACTOR):
+    """
+    The longest a single CCD can take: timeout of the first attempt and of every retry,
+    each multiplied by timeout_factor, see RetryPolicy.
+
+    :param timeout: timeout (seconds) of the first attempt, with path decomposition
+        timeout added for the full algorithm
+    :param retries: number of retries of CCDs which ran out of time
+    :param timeout_factor: growth of timeout of every retry
+    :return: time in seconds
+    """
+    return sum(timeout * timeout_factor ** i for i in range(int(retries) + 1))
+
+
+def pack_ccds(ccds, max_bin_runtime, max_ccd_time=0.0):
+    """
+    First fit decreasing: CCDs from the most expensive are put into the first
+    bin of the same memory class in which they fit into max_bin_runtime. CCDs
+    predicted to run longer than max_bin_runtime get their own bin.
+
+    :param ccds: records of ccd_costs.json (with predicted_runtime and memory_estimate)
+    :param max_bin_runtime: maximal predicted runtime (seconds) of one bin
+    :param max_ccd_time: the longest a single CCD can take, see ccd_time_limit()
+    :return: list of CCDBin
+    """
+    bins = []
+
+    for ccd in sorted(ccds, key=lambda x: x['predicted_runtime'], reverse=True):
+        ccd_bin = CCDBin(max_ccd_time=max_ccd_time)
+        ccd_bin.add(ccd)
+
+        for candidate in bins:
+            if candidate.memory_gb == ccd_bin.memory_gb \
+                    and candidate.runtime + ccd['predicted_runtime'] <= max_bin_runtime:
+                candidate.add(ccd)
+                break
+        else:
+            bins.append(ccd_bin)
+
+    return bins
+
+
+def resource_classes(bins):
+    """
+    Groups bins needing the same memory and time, each group is one job array.
+
+    :param bins: list of CCDBin
+    :return: dict (memory in GB, time in minutes) -> list of CCDBin
+    """
+    classes = {}
+
+    for ccd_bin in bins:
+        classes.setdefault((ccd_bin.memory_gb, ccd_bin.time_minutes), []).append(ccd_bin)
+
+    return classes
@@ -2,30 +2,110 @@
 This is supposed to run on Docker.
 """
 
+import glob
 import json
 import os
 import subprocess
 import logging
-import resource
+import shutil
+import signal
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from dataclasses import dataclass, field
 
 import pandas as pd
 
-from cknots import config
-
-
-def limit_max_memory():
-    max_memory = config.MAX_MEMORY
-    resource.setrlimit(resource.RLIMIT_AS, (max_memory, max_memory))
+from cknots.cknots.bedpe_sharding import restore_line_numbers, shard_bedpe
+from cknots.cknots.cost_model import CostModel
+from cknots.cknots.escalation import DEFAULT_MIN_DENSITY, EscalationPolicy
+from cknots.cknots.graceful_stop import GracefulStop
+from cknots.cknots.graph_features import graph_features
+from cknots.cknots.graph_reduction import map_minors_to_original, read_mp, split_into_blocks, write_block_mp
+from cknots.cknots.inter_ccd import INTER_CCD_DIRNAME, INTER_CCD_RESULTS_FILENAME, CCDBoundaries, \
+    crossing_minors, has_crossing_edges, inter_ccd_windows, minor_edges, split_minors
+from cknots.cknots.memory_budget import GB, MemoryBudget, MemoryEstimator, available_memory
+from cknots.cknots.memory_watchdog import MemoryWatchdog
+from cknots.cknots.process_runner import ProcessResult, run_process
+from cknots.cknots.resource_usage import ResourceUsage, usage_fields
+from cknots.cknots.result_cache import GB as CACHE_GB, ResultCache
+from cknots.cknots.result_staging import ResultStager, copy_file
+from cknots.cknots.results_journal import ResultsJournal, write_results_json
+from cknots.cknots.retry_policy import RetryPolicy, attempt_record
+from cknots.cknots.run_plan import RunPlan, PLAN_TABLE_FILENAME
+from cknots.cknots.run_status import RunStatus
+from cknots.cknots.runtime_config import RuntimeConfig
+
+
+RESULTS_FILENAMES = {
+    'linear': 'results.json',
+    'full': 'results_full.json'
+}
+
+JOURNAL_FILENAMES = {
+    'linear': 'results.jsonl',
+    'full': 'results_full.jsonl'
+}
+
+# CCDs to compute with their predicted cost, written with split_only
+CCD_COSTS_FILENAME = 'ccd_costs.json'
+
+# CCDs left by a run stopped with a signal
+CHECKPOINT_FILENAME = 'checkpoint.json'
+
+# CCDs of CCD_COSTS_FILENAME without results after merge, in format of ccd_list
+REMAINING_CCDS_FILENAME = 'remaining_ccds.txt'
+
+
+@dataclass
+class CCDTask:
+    ccd_dir: str
+    input_filename: str
+    ccd_start: int
+    ccd_end: int
+    algorithm_type: str
+    features: dict = field(default_factory=dict)
+    predicted_runtime: float = 0.0
+    memory_estimate: int = 0
+    results: dict = None  # results of path decomposition stage, passed to minor finder
+    escalation_reason: str = None  # why CCD is computed with the full algorithm in tiered mode
+    attempts: list = field(default_factory=list)  # attempt_record() of previous attempts
+    timeout_factor: float = 1  # multiplies timeouts of retried CCDs
+    memory_factor: float = 1  # multiplies memory limit and reserved memory of CCDs retried after running out of memory
+    reduce_graph: bool = False  # run linear minor finder with graph reduction
+
+    @property
+    def file_path(self):
+        return os.path.join(self.ccd_dir, self.input_filename)
+
+    @property
+    def result_path(self):
+        if self.algorithm_type == 'full':
+            return f'{self.file_path}.pd.raw_minors'
+        return f'{self.file_path}.raw_minors'
 
 
 class ComputationScheduler:
 
     def __init__(self, in_bedpe, in_ccd, out_dir, chromosome,
-                 ccd_timeout=6 * 60 * 60,
+                 config=None,
                  minor_finding_algorithm='find-k6-linear',
                  splitting_algorithm='splitter',
                  arguments=None,
-                 compute_chromosome=False
+                 compute_chromosome=False,
+                 tiered=False,
+                 full_arguments=None,
+                 escalation_density=DEFAULT_MIN_DENSITY,
+                 escalation_regions=None,
+                 ccd_list=None,
+                 split_only=False,
+                 merge=False,
+                 plan=False,
+                 prescreen=True,
+                 reduce_graphs=False,
+                 retry_reduce=False,
+                 inter_ccd_window=None
                  ):
         """
         Class for scheaduling running of knot finding algorithm.
@@ -34,10 +114,64 @@ class ComputationScheduler:
         :param in_ccd: path to ccd file
         :param out_dir: path to *non-existing* directory with results
         :param chromosome: chromosome (1-23 or -1 for all) to process
-        :param ccd_timeout: time (seconds) for timeout of single ccd
+        :param config: RuntimeConfig with timeouts, workers, memory limits and
+            directories of the run, defaults to RuntimeConfig()
         :param minor_finding_algorithm: name of minor finding algorithm
         :param splitting_algorithm: name of splitting algorithm
+        :param tiered: run linear minor finder on all CCDs and the full algorithm
+            only on CCDs selected by EscalationPolicy
+        :param full_arguments: arguments of find-knots in the full tier
+        :param escalation_density: minimal edges per node of CCDs escalated after
+            linear minor finder found nothing
+        :param escalation_regions: path to .bed file with regions in which all CCDs are escalated
+        :param ccd_list: path to file with CCDs (e.g. chr_01/name.mp, one per line) to compute,
+            split by a previous run with split_only. Splitter is not run if given
+        :param split_only: only run splitter and write CCDs to compute with
+            their predicted runtime and memory to CCD_COSTS_FILENAME in out_dir
+        :param merge: only build results.json of all chromosomes from journals of
+            runs with ccd_list, merge their resource usage tables and list CCDs
+            without results in REMAINING_CCDS_FILENAME
+        :param plan: only run splitter and write predicted cost of every CCD with
+            settings suggested for the run, see RunPlan. Graph features are computed
+            on all available CPUs
+        :param prescreen: do not run minor finders on CCDs which cannot contain
+            K6 minor, see prescreen.k6_minor_excluded()
+        :param reduce_graphs: run linear minor finder separately on blocks of CCD graph,
+            without nodes which have no contact edges, see graph_reduction
+        :param retry_reduce: retry CCDs of the linear minor finder with graph reduction
+        :param inter_ccd_window: after all CCDs, look for minors crossing CCD boundaries
+            in windows reaching inter_ccd_window bp into neighbouring CCDs, see inter_ccd.
+            Minors found in single CCDs are not repeated. Not used if None
+
+        Settings of config:
+            ccd_timeout, full_timeout (tiered mode), pd_timeout: timeouts (seconds) of single CCD
+            workers: number of CCDs processed concurrently
+            max_memory: memory (GB) of single minor finder, no limit if None
+            memory_budget: memory (GB) shared by all running minor finders, defaults
+                to memory of the machine. Memory limits and the budget are enforced
+                on real RSS by MemoryWatchdog
+            cost_model_path: path to .json file with runtimes of previous runs, used
+                to predict runtimes of CCDs, defaults to cost_model.json in out_dir
+            cache_dir, cache_size: directory with cache of minor finder results shared
+                between runs (no cache if None) and its maximal size in GB
+            pd_workers: number of path decompositions computed concurrently (full algorithm)
+            pd_queue_size: maximal number of path decompositions computed ahead
+                of the minor finder, defaults to number of workers
+            pd_max_memory: memory limit (GB) of single path decomposition, no limit if None
+            pd_dir: directory for path decompositions, defaults to scratch_dir or /dev/shm
+            scratch_dir: fast local directory for intermediate files. Only .mp files,
+                results of minor finders and results.json are written to out_dir, results
+                are copied back in batches by ResultStager. Defaults to out_dir
+            grace_period: time (seconds) given to running CCDs after SIGTERM or SIGINT,
+                before they are killed and the run is stopped, see GracefulStop
+            retries: number of times CCDs which ran out of time or memory are computed
+                again after all other CCDs, with higher limits, see RetryPolicy
+            status_interval: time (seconds) between updates of status.json and
+                status.prom in out_dir, see RunStatus
         """
+        if config is None:
+            config = RuntimeConfig()
+        self.config = config
 
         if minor_finding_algorithm == 'find-k6-linear':
             self.minor_finding_algorithm_type = 'linear'
@@ -47,42 +181,269 @@ class ComputationScheduler:
         else:
             raise NotImplementedError(f'{minor_finding_algorithm} not implemented.')
 
+        if tiered and self.minor_finding_algorithm_type != 'linear':
+            raise ValueError('Tiered mode starts with the linear minor finder.')
+
         self.in_bedpe = in_bedpe
         self.in_ccd = in_ccd
         self.out_dir = out_dir
         self.chromosome = int(chromosome)
-        self.ccd_timeout = int(ccd_timeout)
+        self.ccd_timeout = int(config.ccd_timeout)
         self.minor_finding_algorithm = self._get_bin_path(minor_finding_algorithm)
         self.splitting_algorithm = self._get_bin_path(splitting_algorithm)
         self.arguments = arguments
+
+        # algorithm type -> (minor finder, arguments, timeout)
+        self.finders = {
+            self.minor_finding_algorithm_type: (self.minor_finding_algorithm, self.arguments, self.ccd_timeout)
+        }
+        self.escalation_policy = None
+        if tiered:
+            self.path_decomposition_algorithm = self._get_bin_path('path-decomposition')
+            self.finders['full'] = (self._get_bin_path('find-knots'), full_arguments, int(config.full_timeout))
+            self.escalation_policy = EscalationPolicy(escalation_density, escalation_regions)
+
         self.compute_chromosome = compute_chromosome
+        self.workers = max(1, int(config.workers))
+
+        if config.memory_budget is None:
+            self.memory_budget = MemoryBudget(available_memory())
+        else:
+            self.memory_budget = MemoryBudget(int(float(config.memory_budget) * GB))
+
+        self.max_memory = None if config.max_memory is None else int(float(config.max_memory) * GB)
+        self.memory_watchdog = MemoryWatchdog(self.memory_budget.total)
+
+        self.memory_estimator = MemoryEstimator(os.path.join(out_dir, 'memory_model.json'))
+
+        cost_model_path = config.cost_model_path
+        if cost_model_path is None:
+            cost_model_path = os.path.join(out_dir, 'cost_model.json')
+        self.cost_model = CostModel(cost_model_path)
+
+        self.resource_usage = ResourceUsage()
+
+        self.pd_workers = max(1, int(config.pd_workers))
+        self.pd_queue_size = self.workers if config.pd_queue_size is None else max(1, int(config.pd_queue_size))
+        self.pd_timeout = int(config.pd_timeout)
+        self.pd_max_memory = None if config.pd_max_memory is None else int(float(config.pd_max_memory) * GB)
+
+        # CCDs are split and computed in work_dir, out_dir gets only what is needed for analysis
+        self.work_dir = out_dir
+        self.result_stager = None
+        if config.scratch_dir is not None and not merge:
+            self.work_dir = os.path.join(config.scratch_dir, f'cknots_{os.getpid()}')
+            self.result_stager = ResultStager()
+            logging.info(f'Running with intermediate files in {self.work_dir}')
+
+        pd_dir = config.pd_dir
+        if pd_dir is None and config.scratch_dir is not None:
+            pd_dir = config.scratch_dir
+        elif pd_dir is None:
+            pd_dir = '/dev/shm' if os.access('/dev/shm', os.W_OK) else out_dir
+        self.pd_dir = os.path.join(pd_dir, f'cknots_pd_{os.getpid()}')
+
+        self.result_cache = None
+        if config.cache_dir is not None:
+            self.result_cache = ResultCache(config.cache_dir, int(float(config.cache_size) * CACHE_GB))
+
+        self.ccd_list = None
+        self.run_name = ''  # suffix of files written by this run, if they are shared with other runs
+        if ccd_list is not None:
+            with open(ccd_list) as f:
+                self.ccd_list = set(
+                    (os.path.join(self.work_dir, os.path.split(x.strip())[0]), os.path.split(x.strip())[1])
+                    for x in f if x.strip() != ''
+                )
+            self.run_name = '_' + os.path.splitext(os.path.split(ccd_list)[-1])[0]
+
+        self.prescreen = prescreen
+
+        self.reduce_graphs = reduce_graphs and self.minor_finding_algorithm_type == 'linear' \
+            and self.escalation_policy is None
+        if reduce_graphs and not self.reduce_graphs:
+            logging.warning('Graph reduction is available only for the linear minor finder, not used.')
+        # Blocks of one CCD are computed in parallel, but with at most self.workers finders at once
+        self.process_slots = threading.BoundedSemaphore(self.workers)
+        self.split_only = split_only
+        if split_only:
+            self.run_name = '_split'
+        self.merge = merge
+
+        self.plan = plan
+        # splitter and graph features of CCDs are computed with analysis_workers
+        self.analysis_workers = self.workers
+        if plan:
+            self.run_name = '_plan'
+            self.analysis_workers = max(self.workers, len(os.sched_getaffinity(0)))
+
+        self.status = RunStatus(out_dir, self.run_name, self.workers, self.memory_watchdog, self.memory_budget,
+                                interval=float(config.status_interval))
+
+        self.graceful_stop = GracefulStop(int(config.grace_period))
+        self.retry_policy = RetryPolicy(max_attempts=1 + int(config.retries), reduce_linear=retry_reduce)
+        self.remaining_tasks = []  # tasks not computed because of a signal
 
         self.ccd_dirs = []  # filled in in self._run_splitter()
 
+        self.inter_ccd_window = None if inter_ccd_window is None else int(inter_ccd_window)
+        if self.inter_ccd_window is not None and (ccd_list is not None or split_only or plan):
+            logging.warning('Minors crossing CCD boundaries are searched for only in runs of all CCDs.')
+            self.inter_ccd_window = None
+        self.inter_ccd_dirs = []  # filled in in self._compute_inter_ccd()
+
         self.resuming_computation = False
 
+        # (ccd_dir, algorithm_type) -> {input_filename: ccd_results}
+        self.chromosome_results = {}
+        # (ccd_dir, algorithm_type) -> ResultsJournal
+        self.journals = {}
+
         logging.info('Computation scheduler created.')
 
-        memory_limit_gb = config.MAX_MEMORY / (1024 * 1024 * 1024)
-        logging.info(f'Running with memory limit: {memory_limit_gb}GB')
+        if self.max_memory is not None:
+            logging.info(f'Running with memory limit: {self.max_memory / GB:.1f}GB')
+        logging.info(f'Running with {self.workers} worker(s)')
+        logging.info(f'Running with memory budget: {self.memory_budget.total / GB:.1f}GB')
 
     def run(self):
         """
-        Run computations. Splits input files and runs minor finder
-        on each CCD (for each chromosome, if running on more than one).
-        :return: None
+        Run computations. Splits input files, puts CCDs of all processed
+        chromosomes into one queue and runs minor finder on them using
+        a pool of workers.
+        :return: exit code, 128 + signal number if stopped by a signal
         """
         logging.info(f'Looking for minors in {self.in_bedpe} with CCDs defined in {self.in_ccd}')
 
-        self._run_splitter()
+        if self.merge:
+            self._merge_results()
+            return 0
+
+        self.graceful_stop.install()
+        self.status.phase = 'splitting'
+        self.status.start()
 
+        all_ccds = pd.read_csv(self.in_ccd,
+                               sep='\t',
+                               header=None,
+                               names=['chromosome', 'start', 'end'])
+
+        if self.ccd_list is None:
+            self._run_splitter(all_ccds)
+        else:
+            self.ccd_dirs = sorted(set(ccd_dir for ccd_dir, _ in self.ccd_list))
+            logging.info(f'Computing {len(self.ccd_list)} CCDs from the list, splitter not run.')
+            if self.result_stager is not None:
+                self._stage_in_ccd_list()
+
+        if self.graceful_stop.requested.is_set():
+            # no CCD was queued, the next run with the same out_dir splits input files again
+            logging.warning('Run stopped while splitting input files, no CCDs computed.')
+            self._remove_work_dir()
+            self.graceful_stop.uninstall()
+            self.memory_watchdog.stop()
+            self.status.stop('stopped')
+            return self._write_checkpoint()
+
+        tasks = []
         for ccd_dir in self.ccd_dirs:
-            if self.minor_finding_algorithm_type == 'full':
-                self._run_full_minor_finder(ccd_dir)
-            elif self.minor_finding_algorithm_type == 'linear':
-                self._run_linear_minor_finder(ccd_dir)
+            for algorithm_type in self.finders:
+                self._load_previous_results(ccd_dir, algorithm_type)
+            tasks += self._collect_ccd_tasks(ccd_dir, all_ccds, self.minor_finding_algorithm_type)
+
+        for algorithm_type in self.finders:
+            for task in self._collect_finished_tasks(algorithm_type):
+                self.status.finished(task, self.chromosome_results[(task.ccd_dir, algorithm_type)][task.input_filename],
+                                     in_run=False)
 
-    def _run_splitter(self):
+        self.status.phase = 'preparing'
+
+        tasks, finished_tasks = self._prepare_tasks(tasks, self.ccd_dirs)
+
+        if self.plan:
+            self._write_plan(tasks)
+        elif self.split_only:
+            self._write_ccd_costs(tasks)
+
+        if self.split_only or self.plan:
+            self.resource_usage.write(self.out_dir, self.run_name)
+            self._remove_work_dir()
+            self.graceful_stop.uninstall()
+            self.memory_watchdog.stop()
+            self.status.stop('finished')
+            return 0
+
+        tasks += self._escalate_finished(finished_tasks)
+
+        # Longest expected first, so that huge CCDs do not start last
+        tasks.sort(key=lambda x: x.predicted_runtime, reverse=True)
+
+        logging.info(f'{len(tasks)} CCDs queued for minor finding, '
+                     + f'{sum(x.predicted_runtime for x in tasks) / 3600:.2f}h of predicted runtime.')
+
+        self._execute(tasks)
+
+        if self.inter_ccd_window is not None and self.graceful_stop.signum is None:
+            self._compute_inter_ccd(all_ccds)
+
+        if os.path.exists(self.pd_dir):
+            shutil.rmtree(self.pd_dir)
+
+        self._remove_work_dir()
+
+        for ccd_dir in self.ccd_dirs + self.inter_ccd_dirs:
+            for algorithm_type in self.finders:
+                self._save_results(ccd_dir, algorithm_type)
+
+        if self.inter_ccd_window is not None and self.graceful_stop.signum is None:
+            for ccd_dir in self.ccd_dirs:
+                self._write_inter_ccd_results(ccd_dir, all_ccds)
+
+        self.resource_usage.write(self.out_dir, self.run_name)
+
+        self.graceful_stop.uninstall()
+        self.memory_watchdog.stop()
+        self.status.stop('finished' if self.graceful_stop.signum is None else 'stopped')
+        return self._write_checkpoint()
+
+    def _prepare_tasks(self, tasks, ccd_dirs):
+        """
+        Takes results of cached CCDs, computes graph features, stores results of
+        pre-screened CCDs and predicts runtime of the rest.
+
+        :return: tuple (tasks to compute, tasks of CCDs in ccd_dirs computed before
+            by the linear minor finder, which may be escalated in tiered mode)
+        """
+        if self.result_cache is not None and not self.plan:
+            tasks = self._fetch_cached_results(tasks)
+
+        # CCDs computed by the linear minor finder in previous runs or taken from cache
+        finished_tasks = []
+        if self.escalation_policy is not None:
+            finished_tasks = self._collect_finished_tasks('linear', ccd_dirs)
+
+        self._compute_features(tasks + finished_tasks)
+
+        if self.prescreen and not self.plan:
+            tasks = self._store_prescreened_results(tasks)
+
+        for task in tasks:
+            task.predicted_runtime = self.cost_model.predict(task.algorithm_type, task.features)
+
+        return tasks, finished_tasks
+
+    def _escalate_finished(self, finished_tasks):
+        escalated_tasks = []
+
+        for task in finished_tasks:
+            ccd_results = self.chromosome_results[(task.ccd_dir, 'linear')][task.input_filename]
+            escalated_task = self._escalate(task, ccd_results)
+            if escalated_task is not None:
+                escalated_tasks.append(escalated_task)
+
+        return escalated_tasks
+
+    def _run_splitter(self, all_ccds):
 
         if self.chromosome in range(1, 24):
             chromosomes_to_process = [self.chromosome]
@@ -93,77 +454,147 @@ class ComputationScheduler:
             logging.error(error_message)
             raise ValueError(error_message)
 
-        for chromosome in chromosomes_to_process:
+        shards_dir = os.path.join(self.work_dir, '.shards')
 
-            chromosome_name = f"{chromosome:02d}" if chromosome != 23 else 'X'
-            logging.info(f'Running splitter on chromosome {chromosome_name}')
+        logging.info(f'Sharding {self.in_bedpe} by chromosome')
+        shard_paths = shard_bedpe(self.in_bedpe, shards_dir, chromosomes_to_process, stop=self.graceful_stop.requested)
 
-            input_cmd = [self.splitting_algorithm,
-                         '-c', f'{chromosome}',
-                         '-s',
-                         '-f', f'{self.in_bedpe}',
-                         '-d', f'{self.in_ccd}']
+        if shard_paths is None:
+            shutil.rmtree(shards_dir)
+            return
 
-            subprocess.run(
-                input_cmd
+        with ThreadPoolExecutor(max_workers=self.analysis_workers) as executor:
+            self.ccd_dirs = list(executor.map(
+                lambda x: self._split_chromosome(x, shard_paths[x], all_ccds),
+                chromosomes_to_process
+            ))
+
+        shutil.rmtree(shards_dir)
+
+        logging.info('Bedpe file split into CCDs and divided into folders in results directory.')
+
+    def _split_chromosome(self, chromosome, shard_path, all_ccds):
+        """
+        Runs splitter on shard of one chromosome. Splitter writes .mp files next
+        to its input, so every shard has its own directory and all files found
+        there belong to this chromosome.
+
+        With inter_ccd_window, splitter runs once more on windows around CCD
+        boundaries, which go to INTER_CCD_DIRNAME in the chromosome directory.
+        """
+        chromosome_name = f"{chromosome:02d}" if chromosome != 23 else 'X'
+        ccd_files_destination_path = os.path.join(self.work_dir, f'chr_{chromosome_name}')
+        ccd_files_out_path = self._out_path(ccd_files_destination_path)
+
+        try:
+            os.makedirs(
+                ccd_files_out_path
             )
+        except FileExistsError:
+            message = f'Directory {ccd_files_out_path} already exists, resuming computation.'
+            logging.warning(message)
+            self.resuming_computation = True
 
-            ccd_files_current_path = os.path.split(self.in_bedpe)[0]
-            ccd_files_destination_path = os.path.join(self.out_dir, f'chr_{chromosome_name}')
+        os.makedirs(ccd_files_destination_path, exist_ok=True)
 
-            files_to_move = [
-                x for x in os.listdir(ccd_files_current_path) \
-                if x.endswith(f'{chromosome:04}.mp') or x.endswith(f'{chromosome:04}.mp.tr')
-            ]
+        if shard_path is None:
+            logging.info(f'No contacts on chromosome {chromosome_name}')
+            return ccd_files_destination_path
 
-            try:
-                os.makedirs(
-                    ccd_files_destination_path
-                )
-            except FileExistsError:
-                message = f'Directory {ccd_files_destination_path} already exists, resuming computation.'
-                logging.warning(message)
-                self.resuming_computation = True
-
-            for file in files_to_move:
-                os.rename(
-                    os.path.join(ccd_files_current_path, file),
-                    os.path.join(ccd_files_destination_path, file)
-                )
+        # after a signal, chromosomes not split yet are left to the next run
+        if self.graceful_stop.requested.is_set():
+            return ccd_files_destination_path
 
-            self.ccd_dirs.append(ccd_files_destination_path)
+        logging.info(f'Running splitter on chromosome {chromosome_name}')
 
-        logging.info('Bedpe file split into CCDs and divided into folders in results directory.')
+        self._run_splitter_on_shard(chromosome, shard_path, self.in_ccd, ccd_files_destination_path, 'splitter')
 
-    def _run_linear_minor_finder(self, ccd_dir_path):
-        ccds_to_analyze = sorted([x for x in os.listdir(ccd_dir_path) if x.endswith('.mp')])
+        if self.inter_ccd_window is not None and not self.graceful_stop.requested.is_set():
+            windows = self._inter_ccd_windows(all_ccds, ccd_files_destination_path)
+            windows_path = os.path.join(os.path.split(shard_path)[0], 'inter_ccd_windows.bed')
+            with open(windows_path, 'w') as f:
+                f.writelines(f'{self._csv_chromosome_name(ccd_files_destination_path)}\t{start}\t{end}\n'
+                             for start, end in windows)
 
-        all_ccds = pd.read_csv(self.in_ccd,
-                               sep='\t',
-                               header=None,
-                               names=['chromosome', 'start', 'end'])
+            logging.info(f'Running splitter on {len(windows)} windows around CCD boundaries '
+                         + f'of chromosome {chromosome_name}')
 
-        chromosome_results = []
-        if self.resuming_computation:
-            chromosome_results = [None] * len(all_ccds)
+            inter_ccd_path = os.path.join(ccd_files_destination_path, INTER_CCD_DIRNAME)
+            os.makedirs(self._out_path(inter_ccd_path), exist_ok=True)
+            os.makedirs(inter_ccd_path, exist_ok=True)
+            self._run_splitter_on_shard(chromosome, shard_path, windows_path, inter_ccd_path, 'inter_ccd_splitter')
 
-            with open(os.path.join(ccd_dir_path, 'results.json')) as f:
-                previous_results = json.load(f)
+        return ccd_files_destination_path
 
-            for results_for_ccd in previous_results:
-                idx = int(results_for_ccd['input_filename'][-7:-3]) - 1
-                chromosome_results[idx] = results_for_ccd
+    def _run_splitter_on_shard(self, chromosome, shard_path, ccd_path, ccd_files_destination_path, stage):
+        """
+        Splits shard into .mp files of regions given in ccd_path (.bed file)
+        and moves them to ccd_files_destination_path.
 
-        csv_chr_name = str(os.path.split(ccd_dir_path)[-1]) \
-            .replace('_0', '') \
-            .replace('_', '')
+        :param stage: name of the stage in resource usage
+        """
+        chromosome_name = f"{chromosome:02d}" if chromosome != 23 else 'X'
+
+        input_cmd = [self.splitting_algorithm,
+                     '-c', f'{chromosome}',
+                     '-s',
+                     '-f', f'{shard_path}',
+                     '-d', f'{ccd_path}']
+
+        splitter = run_process(
+            input_cmd,
+            stdout=subprocess.DEVNULL,
+            registry=self.graceful_stop
+        )
+        self.resource_usage.add(stage, chromosome_name, os.path.split(self.in_bedpe)[-1],
+                                splitter, splitter.return_code)
+
+        if self.graceful_stop.interrupted(splitter.return_code):
+            # .mp files may be incomplete, they are removed with the shard
+            logging.warning(f'Splitter stopped on chromosome {chromosome_name}.')
+            return
+
+        ccd_files_current_path = os.path.split(shard_path)[0]
+        ccd_files_out_path = self._out_path(ccd_files_destination_path)
+
+        files_to_move = [
+            x for x in os.listdir(ccd_files_current_path) \
+            if x.endswith(f'{chromosome:04}.mp') or x.endswith(f'{chromosome:04}.mp.tr')
+        ]
+
+        for file in files_to_move:
+            if file.endswith('.mp'):
+                restore_line_numbers(os.path.join(ccd_files_current_path, file), shard_path)
+
+            os.rename(
+                os.path.join(ccd_files_current_path, file),
+                os.path.join(ccd_files_destination_path, file)
+            )
+
+            # graphs are needed for analysis of results, .mp.tr files are not
+            if self.result_stager is not None and file.endswith('.mp'):
+                copy_file(os.path.join(ccd_files_destination_path, file),
+                          os.path.join(ccd_files_out_path, file))
+
+    def _collect_ccd_tasks(self, ccd_dir_path, all_ccds, algorithm_type):
+        """
+        Pairs CCD files of one chromosome with CCD coordinates and returns
+        the ones that still have to be computed.
+        """
+        # with scratch and ccd_list, only listed CCDs are in ccd_dir_path, but all are needed
+        # to pair them with coordinates
+        ccds_to_analyze = sorted([x for x in os.listdir(self._out_path(ccd_dir_path)) if x.endswith('.mp')])
+
+        csv_chr_name = self._csv_chromosome_name(ccd_dir_path)
 
         relevant_ccds_iterator = all_ccds[all_ccds['chromosome'] == csv_chr_name].iterrows()
 
         ccd_info_start_history = []
         ccd_info_end_history = []
 
-        for i, ccd in enumerate(ccds_to_analyze):
+        tasks = []
+
+        for ccd in ccds_to_analyze:
 
             try:
                 _, ccd_info = next(relevant_ccds_iterator)
@@ -174,222 +605,1093 @@ class ComputationScheduler:
                 ccd_info_end_history.append(ccd_end)
 
             except StopIteration:
-                if self.compute_chromosome:
+                if self.compute_chromosome and len(ccd_info_start_history) > 0:
                     ccd_start = min(ccd_info_start_history)
                     ccd_end = max(ccd_info_end_history)
                 else:
                     continue
 
-            ccd_results = {
-                'input_filename': str(ccd),
-                'results_exist': False,
-                'results_not_empty': False,
-                'results_filename': None,
-                'return_code': None,
-                'ccd_start': ccd_start,
-                'ccd_end': ccd_end
-            }
-
-            file_path = os.path.join(ccd_dir_path, ccd)
-            file_name = os.path.split(file_path)[-1]
+            task = CCDTask(ccd_dir=ccd_dir_path,
+                           input_filename=str(ccd),
+                           ccd_start=int(ccd_start),
+                           ccd_end=int(ccd_end),
+                           algorithm_type=algorithm_type)
 
-            result_path = f'{file_path}.raw_minors'
+            if self.ccd_list is not None and (ccd_dir_path, task.input_filename) not in self.ccd_list:
+                continue
 
-            if self.resuming_computation and os.path.exists(result_path):
-                logging.info(f'Results for {file_path} already exists, skipping')
+            if self._is_finished(task):
+                logging.info(f'Results for {task.file_path} already exists, skipping')
                 continue
 
-            logging.info(f'Running minor finder on {file_path}')
+            tasks.append(task)
 
-            input_cmd = [self.minor_finding_algorithm,
-                         '-f', f'{file_path}',
-                         '-o', f'{file_path}.raw_minors']
+        return tasks
 
-            if self.arguments is not None:
-                input_cmd = input_cmd + self.arguments
+    @staticmethod
+    def _csv_chromosome_name(ccd_dir_path):
+        # chr_01 -> chr1, chr_X -> chrX
+        return str(os.path.split(ccd_dir_path)[-1]) \
+            .replace('_0', '') \
+            .replace('_', '')
 
-            try:
-                result = subprocess.run(
-                    input_cmd,
-                    timeout=self.ccd_timeout
-                )
+    def _is_finished(self, task):
+        previous_results = self.chromosome_results[(task.ccd_dir, task.algorithm_type)]
+        return task.input_filename in previous_results and os.path.exists(self._out_path(task.result_path))
 
+    def _collect_finished_tasks(self, algorithm_type, ccd_dirs=None):
+        """
+        Recreates tasks of CCDs which already have results of algorithm_type.
+
+        :param ccd_dirs: directories of CCDs, defaults to self.ccd_dirs
+        """
+        tasks = []
+
+        for ccd_dir in self.ccd_dirs if ccd_dirs is None else ccd_dirs:
+            for ccd_results in self.chromosome_results[(ccd_dir, algorithm_type)].values():
+                tasks.append(CCDTask(ccd_dir=ccd_dir,
+                                     input_filename=ccd_results['input_filename'],
+                                     ccd_start=ccd_results['ccd_start'],
+                                     ccd_end=ccd_results['ccd_end'],
+                                     algorithm_type=algorithm_type))
+
+        return tasks
+
+    def _escalate(self, task, ccd_results):
+        """
+        Decides if CCD computed with the linear minor finder is computed
+        again with the full algorithm.
+
+        :return: task for the full algorithm, or None
+        """
+        if task.features['k6_excluded'] is not None:
+            return None
+
+        reason = self.escalation_policy.reason(self._csv_chromosome_name(task.ccd_dir), task, ccd_results)
+        if reason is None:
+            return None
+
+        escalated_task = CCDTask(ccd_dir=task.ccd_dir,
+                                 input_filename=task.input_filename,
+                                 ccd_start=task.ccd_start,
+                                 ccd_end=task.ccd_end,
+                                 algorithm_type='full',
+                                 features=task.features,
+                                 escalation_reason=reason)
+
+        if self._is_finished(escalated_task):
+            return None
+
+        logging.info(f'{task.input_filename} escalated to the full algorithm ({reason})')
+        escalated_task.predicted_runtime = self.cost_model.predict('full', task.features)
+
+        return escalated_task
+
+    def _cache_key(self, task):
+        minor_finding_algorithm, arguments, _ = self.finders[task.algorithm_type]
+
+        algorithm_paths = [minor_finding_algorithm]
+        if task.algorithm_type == 'full':
+            algorithm_paths = [self.path_decomposition_algorithm] + algorithm_paths
+
+        # graph reduction finds the same minors, but may write them differently
+        if self._reduced(task):
+            arguments = (arguments or []) + ['reduce']
+
+        return ResultCache.key(task.file_path, algorithm_paths, arguments)
+
+    def _fetch_cached_results(self, tasks):
+        """
+        Takes results of CCDs with graphs computed before from the cache.
+
+        :return: tasks which were not in the cache
+        """
+        not_cached = []
+
+        for task in tasks:
+            if self.result_cache.fetch(self._cache_key(task), task.result_path):
+                logging.info(f'Results for {task.file_path} taken from cache')
+
+                ccd_results = self._empty_ccd_results(task)
                 ccd_results['results_exist'] = True
-                ccd_results['results_filename'] = os.path.split(result_path)[-1]
-                ccd_results['return_code'] = result.returncode
+                ccd_results['results_filename'] = os.path.split(task.result_path)[-1]
+                ccd_results['results_not_empty'] = os.stat(task.result_path).st_size > 0
+                ccd_results['return_code'] = 0
+                ccd_results['cached'] = True
 
-                if result.returncode == 0:
-                    logging.info(f'{file_name} processing finished')
-                else:
-                    if os.path.exists(result_path):
-                        logging.warning(f'{file_name} processing ended with and error, but result file exists. '
-                                        + f'Return code: {result.returncode}')
-                    else:
-                        logging.error(f'{file_name} processing ended with and error, and result file does not exist. '
-                                      + f'Return code: {result.returncode}')
-                        ccd_results['results_exist'] = False
-                        ccd_results['results_filename'] = ''
-
-            except subprocess.TimeoutExpired:
-                logging.error(f'Timeout expired on {file_path}')
-                ccd_results['results_exist'] = False
-                ccd_results['results_filename'] = ''
-                ccd_results['return_code'] = 124
-
-            except Exception as other_exception:
-                logging.error(f'Exception occurred {other_exception}')
-                ccd_results['results_exist'] = False
-                ccd_results['results_filename'] = ''
-                ccd_results['return_code'] = 1
-
-            if os.path.exists(result_path) and os.stat(result_path).st_size > 0:
-                ccd_results['results_not_empty'] = True
-
-            if self.resuming_computation:
-                chromosome_results[i] = ccd_results
+                self._store_result(task, ccd_results)
             else:
-                chromosome_results.append(ccd_results)
+                not_cached.append(task)
 
-            with open(os.path.join(ccd_dir_path, 'results.json'), 'w') as f:
-                json.dump(chromosome_results, f, indent=4, sort_keys=True)
+        logging.info(f'{len(tasks) - len(not_cached)} of {len(tasks)} CCDs taken from cache.')
 
-        with open(os.path.join(ccd_dir_path, 'results.json'), 'w') as f:
-            json.dump(chromosome_results, f, indent=4, sort_keys=True)
+        return not_cached
 
-    def _run_full_minor_finder(self, ccd_dir_path):
-        ccds_to_analyze = sorted([x for x in os.listdir(ccd_dir_path) if x.endswith('.mp')])
+    def _store_in_cache(self, task, ccd_results):
+        if self.result_cache is not None and ccd_results['return_code'] == 0 and ccd_results['results_exist']:
+            self.result_cache.store(self._cache_key(task), task.result_path)
 
-        all_ccds = pd.read_csv(self.in_ccd,
-                               sep='\t',
-                               header=None,
-                               names=['chromosome', 'start', 'end'])
+    def _compute_features(self, tasks):
+        """
+        Computes graph features of CCDs in parallel. Features are cached
+        in graph_features.json of each chromosome directory, so resumed
+        computations do not compute them again.
+        """
+        ccd_dirs = sorted(set(x.ccd_dir for x in tasks))
+
+        cached_features = {}
+        for ccd_dir in ccd_dirs:
+            cache_path = os.path.join(self._out_path(ccd_dir), 'graph_features.json')
+            if os.path.exists(cache_path):
+                with open(cache_path) as f:
+                    cached_features[ccd_dir] = json.load(f)
+            else:
+                cached_features[ccd_dir] = {}
+
+        to_compute = []
+        for task in tasks:
+            cached = cached_features[task.ccd_dir].get(task.input_filename)
+            if cached is not None and cached['size'] == os.stat(task.file_path).st_size \
+                    and 'k6_excluded' in cached['features']:
+                task.features = cached['features']
+            else:
+                to_compute.append(task)
 
-        chromosome_results = []
-        if self.resuming_computation:
-            chromosome_results = [None] * len(all_ccds)
+        logging.info(f'Computing graph features of {len(to_compute)} CCDs.')
 
-            with open(os.path.join(ccd_dir_path, 'results_full.json')) as f:
-                previous_results = json.load(f)
+        with ProcessPoolExecutor(max_workers=self.analysis_workers) as executor:
+            computed = executor.map(graph_features, [x.file_path for x in to_compute])
 
-            for results_for_ccd in previous_results:
-                idx = int(results_for_ccd['input_filename'][-7:-3]) - 1
-                chromosome_results[idx] = results_for_ccd
+            for task, features in zip(to_compute, computed):
+                task.features = features
+                cached_features[task.ccd_dir][task.input_filename] = {
+                    'size': os.stat(task.file_path).st_size,
+                    'features': features
+                }
 
-        csv_chr_name = str(os.path.split(ccd_dir_path)[-1]) \
-            .replace('_0', '') \
-            .replace('_', '')
+        if len(to_compute) == 0:
+            return
 
-        relevant_ccds_iterator = all_ccds[all_ccds['chromosome'] == csv_chr_name].iterrows()
+        for ccd_dir in ccd_dirs:
+            # may be shared by runs with ccd_list
+            tmp_path = os.path.join(self._out_path(ccd_dir), f'graph_features.json.{os.getpid()}.tmp')
+            with open(tmp_path, 'w') as f:
+                json.dump(cached_features[ccd_dir], f)
+            os.replace(tmp_path, os.path.join(self._out_path(ccd_dir), 'graph_features.json'))
 
-        ccd_info_start_history = []
-        ccd_info_end_history = []
+    def _store_prescreened_results(self, tasks):
+        """
+        Stores empty results of CCDs which cannot contain K6 minor,
+        without running minor finder on them.
 
-        for i, ccd in enumerate(ccds_to_analyze):
+        :return: tasks which passed the pre-screen
+        """
+        passed = []
 
-            try:
-                _, ccd_info = next(relevant_ccds_iterator)
-                ccd_start = ccd_info['start']
-                ccd_end = ccd_info['end']
+        for task in tasks:
+            reason = task.features['k6_excluded']
+            if reason is None:
+                passed.append(task)
+                continue
 
-                ccd_info_start_history.append(ccd_start)
-                ccd_info_end_history.append(ccd_end)
+            # Result file may be a hardlink to cache entry, which must not be truncated
+            if os.path.exists(task.result_path):
+                os.remove(task.result_path)
+            open(task.result_path, 'w').close()
 
-            except StopIteration:
-                if self.compute_chromosome:
-                    ccd_start = min(ccd_info_start_history)
-                    ccd_end = max(ccd_info_end_history)
-                else:
-                    continue
+            ccd_results = self._empty_ccd_results(task)
+            ccd_results['results_exist'] = True
+            ccd_results['results_filename'] = os.path.split(task.result_path)[-1]
+            ccd_results['return_code'] = 0
+            ccd_results['prescreened'] = reason
+
+            self._store_result(task, ccd_results)
+
+        logging.info(f'{len(tasks) - len(passed)} of {len(tasks)} CCDs cannot contain K6 minor, '
+                     + 'minor finder not run on them.')
+
+        return passed
+
+    def _write_ccd_costs(self, tasks):
+        ccd_costs = []
+
+        for task in tasks:
+            ccd_costs.append({
+                'ccd_dir': os.path.relpath(task.ccd_dir, self.work_dir),
+                'input_filename': task.input_filename,
+                'algorithm_type': task.algorithm_type,
+                'nodes': task.features['nodes'],
+                'edges': task.features['edges'],
+                'predicted_runtime': task.predicted_runtime,
+                'memory_estimate': self.memory_estimator.estimate(task.algorithm_type,
+                                                                  task.features['nodes'],
+                                                                  task.features['edges'])
+            })
+
+        with open(os.path.join(self.out_dir, CCD_COSTS_FILENAME), 'w') as f:
+            json.dump(ccd_costs, f, indent=4)
+
+        logging.info(f'{len(ccd_costs)} CCDs to compute written to {CCD_COSTS_FILENAME}.')
+
+    def _write_plan(self, tasks):
+        """
+        Writes predicted cost of tasks, with CCDs which would be pre-screened
+        or escalated in tiered mode, and prints the summary with the most
+        expensive CCDs.
+        """
+        timeouts = {self.minor_finding_algorithm_type: ('ccd_timeout', self.ccd_timeout)}
+        if self.escalation_policy is not None:
+            timeouts['full'] = ('full_timeout', self.finders['full'][2])
 
-            ccd_results = {
-                'input_filename': str(ccd),
-                'results_exist': False,
-                'results_not_empty': False,
-                'results_filename': None,
-                'return_code': None,
-                'ccd_start': ccd_start,
-                'ccd_end': ccd_end
-            }
+        run_plan = RunPlan(timeouts, self.max_memory)
+        run_plan.finished = sum(len(self.chromosome_results[(x, self.minor_finding_algorithm_type)])
+                                for x in self.ccd_dirs)
 
-            file_path = os.path.join(ccd_dir_path, ccd)
-            file_name = os.path.split(file_path)[-1]
+        for task in tasks:
+            chromosome_name = self._csv_chromosome_name(task.ccd_dir)
+            prescreened = task.features['k6_excluded'] if self.prescreen else None
 
-            result_path = f'{file_path}.pd.raw_minors'
+            run_plan.add(chromosome_name, task, self._plan_memory_estimate(task), prescreened=prescreened)
 
-            if self.resuming_computation and os.path.exists(result_path):
-                logging.info(f'Results for {file_path} already exists, skipping')
+            if self.escalation_policy is None or prescreened is not None:
                 continue
 
-            logging.info(f'Running path decomposition on {file_path}')
+            # linear minor finder not run yet, assume it finds nothing
+            reason = self.escalation_policy.reason(chromosome_name, task,
+                                                   {'return_code': 0, 'results_not_empty': False})
+            if reason is None:
+                continue
 
-            input_cmd = [self.path_decomposition_algorithm,
-                         '-f', f'{file_path}']
+            escalated_task = CCDTask(ccd_dir=task.ccd_dir,
+                                     input_filename=task.input_filename,
+                                     ccd_start=task.ccd_start,
+                                     ccd_end=task.ccd_end,
+                                     algorithm_type='full',
+                                     features=task.features,
+                                     escalation_reason=reason)
+            escalated_task.predicted_runtime = self.cost_model.predict('full', task.features)
+
+            run_plan.add(chromosome_name, escalated_task, self._plan_memory_estimate(escalated_task),
+                         escalation=reason)
+
+        suggested = run_plan.suggest(self.config, len(os.sched_getaffinity(0)), available_memory())
+        summary = run_plan.summary(self.workers, suggested)
+        run_plan.write(self.out_dir, summary, suggested)
+
+        print(run_plan.format_summary(summary, suggested))
+        print(f'\nMost expensive CCDs (all in {PLAN_TABLE_FILENAME}):')
+        print(run_plan.table(limit=20))
+
+        logging.info(f'Plan of {len(run_plan.rows)} CCDs written to {PLAN_TABLE_FILENAME}, '
+                     + f'{summary["predicted_runtime"] / 3600:.2f}h of predicted runtime.')
+
+    def _plan_memory_estimate(self, task):
+        memory_estimate = self.memory_estimator.estimate(task.algorithm_type,
+                                                         task.features['nodes'],
+                                                         task.features['edges'])
+        if task.algorithm_type == 'full':
+            memory_estimate = max(memory_estimate,
+                                  self.memory_estimator.estimate('decomposition',
+                                                                 task.features['nodes'],
+                                                                 task.features['edges']))
+        return memory_estimate
+
+    def _inter_ccd_windows(self, all_ccds, ccd_dir_path):
+        ccds = all_ccds[all_ccds['chromosome'] == self._csv_chromosome_name(ccd_dir_path)]
+        return inter_ccd_windows(ccds['start'].to_numpy(), ccds['end'].to_numpy(), self.inter_ccd_window)
+
+    def _ccd_boundaries(self, all_ccds, ccd_dir_path):
+        ccds = all_ccds[all_ccds['chromosome'] == self._csv_chromosome_name(ccd_dir_path)]
+        return CCDBoundaries(ccds['start'].to_numpy(), ccds['end'].to_numpy())
+
+    def _compute_inter_ccd(self, all_ccds):
+        """
+        Runs minor finders on windows around CCD boundaries which have contact
+        edges crossing a boundary, once CCDs themselves are done. Windows are
+        journaled in their own directory, so resumed runs skip finished ones.
+        """
+        self.status.phase = 'preparing'
 
-            with open(f'{file_path}.pd', 'w') as f:
-                subprocess.call(
-                    input_cmd,
-                    stdout=f
-                )
+        tasks = []
+        for ccd_dir in self.ccd_dirs:
+            inter_ccd_dir = os.path.join(ccd_dir, INTER_CCD_DIRNAME)
+            if not os.path.isdir(self._out_path(inter_ccd_dir)):
+                continue
 
-            logging.info(f'Running minor finder on {file_path}')
+            self.inter_ccd_dirs.append(inter_ccd_dir)
+            for algorithm_type in self.finders:
+                self._load_previous_results(inter_ccd_dir, algorithm_type)
 
-            input_cmd = [self.minor_finding_algorithm,
-                         '-f', f'{file_path}.pd',
-                         '-o', f'{file_path}.pd.raw_minors']
+            tasks += self._collect_window_tasks(ccd_dir, all_ccds)
 
-            if self.arguments is not None:
-                input_cmd = input_cmd + self.arguments
+        tasks, finished_tasks = self._prepare_tasks(tasks, self.inter_ccd_dirs)
+        tasks += self._escalate_finished(finished_tasks)
 
-            try:
-                logging.info(f'Running: {input_cmd}')
+        tasks.sort(key=lambda x: x.predicted_runtime, reverse=True)
+
+        logging.info(f'{len(tasks)} windows around CCD boundaries queued for minor finding, '
+                     + f'{sum(x.predicted_runtime for x in tasks) / 3600:.2f}h of predicted runtime.')
+
+        self._execute(tasks)
+
+    def _collect_window_tasks(self, ccd_dir_path, all_ccds):
+        """
+        Tasks of windows of one chromosome which have contact edges crossing
+        a CCD boundary and are not computed yet. Window files are numbered
+        by splitter in order of windows.
+        """
+        inter_ccd_dir = os.path.join(ccd_dir_path, INTER_CCD_DIRNAME)
+        windows = self._inter_ccd_windows(all_ccds, ccd_dir_path)
+        boundaries = self._ccd_boundaries(all_ccds, ccd_dir_path)
+
+        tasks = []
+        skipped = 0
+
+        for window_file in sorted(x for x in os.listdir(self._out_path(inter_ccd_dir)) if x.endswith('.mp')):
+            # <bedpe>.0001.chr0021.mp, the last file has edges outside all windows
+            window_number = int(window_file.split('.')[-3])
+            if window_number > len(windows):
+                continue
+
+            if not has_crossing_edges(os.path.join(self._out_path(inter_ccd_dir), window_file), boundaries):
+                skipped += 1
+                continue
+
+            window_start, window_end = windows[window_number - 1]
+            task = CCDTask(ccd_dir=inter_ccd_dir,
+                           input_filename=window_file,
+                           ccd_start=window_start,
+                           ccd_end=window_end,
+                           algorithm_type=self.minor_finding_algorithm_type)
+
+            if self._is_finished(task):
+                continue
+
+            tasks.append(task)
+
+        logging.info(f'{skipped} windows of {self._csv_chromosome_name(ccd_dir_path)} have no contact edges '
+                     + 'crossing CCD boundaries, minor finder not run on them.')
+
+        return tasks
+
+    def _write_inter_ccd_results(self, ccd_dir_path, all_ccds):
+        """
+        Writes INTER_CCD_RESULTS_FILENAME of one chromosome, in format of results.json,
+        with minors of windows which cross a CCD boundary and were not found
+        in any CCD. They are written to <results of window>.crossing.raw_minors,
+        results of windows are kept as they are.
+        """
+        inter_ccd_dir = os.path.join(ccd_dir_path, INTER_CCD_DIRNAME)
+        if inter_ccd_dir not in self.inter_ccd_dirs:
+            return
+
+        boundaries = self._ccd_boundaries(all_ccds, ccd_dir_path)
+
+        known_edges = set()
+        for algorithm_type in self.finders:
+            for ccd_results in self.chromosome_results[(ccd_dir_path, algorithm_type)].values():
+                if ccd_results['results_exist']:
+                    with open(os.path.join(self._out_path(ccd_dir_path), ccd_results['results_filename'])) as f:
+                        known_edges.update(minor_edges(x) for x in split_minors(f.read()))
+
+        records = {}
+        crossing_links = 0
+
+        for algorithm_type in self.finders:
+            for input_filename, ccd_results in self.chromosome_results[(inter_ccd_dir, algorithm_type)].items():
+                record = dict(ccd_results,
+                              input_filename=f'{INTER_CCD_DIRNAME}/{input_filename}',
+                              window_links=0,
+                              crossing_links=0)
+
+                if ccd_results['results_exist']:
+                    with open(os.path.join(self._out_path(inter_ccd_dir), ccd_results['results_filename'])) as f:
+                        raw_minors = f.read()
+
+                    new_minors = crossing_minors(raw_minors, known_edges, boundaries)
+
+                    crossing_filename = ccd_results['results_filename'].replace('.raw_minors', '.crossing.raw_minors')
+                    with open(os.path.join(self._out_path(inter_ccd_dir), crossing_filename), 'w') as f:
+                        f.writelines(new_minors)
+
+                    record['results_filename'] = f'{INTER_CCD_DIRNAME}/{crossing_filename}'
+                    record['results_not_empty'] = len(new_minors) > 0
+                    record['window_links'] = len(split_minors(raw_minors))
+                    record['crossing_links'] = len(new_minors)
+                    crossing_links += len(new_minors)
+
+                records[(input_filename, algorithm_type)] = record
+
+        write_results_json(records, os.path.join(self._out_path(ccd_dir_path), INTER_CCD_RESULTS_FILENAME))
+
+        logging.info(f'{crossing_links} minors crossing CCD boundaries of '
+                     + f'{self._csv_chromosome_name(ccd_dir_path)} found in {len(records)} windows.')
+
+    def _merge_results(self):
+        """
+        Builds results.json of every chromosome directory in out_dir
+        from journals written by runs with ccd_list.
+        """
+        self.ccd_dirs = sorted(x for x in glob.glob(os.path.join(self.out_dir, 'chr_*')) if os.path.isdir(x))
+
+        for ccd_dir in self.ccd_dirs:
+            for algorithm_type in self.finders:
+                if os.path.exists(os.path.join(ccd_dir, JOURNAL_FILENAMES[algorithm_type])):
+                    self._save_results(ccd_dir, algorithm_type)
+
+        for usage_path in sorted(glob.glob(os.path.join(self.out_dir, 'resource_usage_*.csv'))):
+            self.resource_usage.load(usage_path)
+        self.resource_usage.write(self.out_dir)
+
+        logging.info(f'Results of {len(self.ccd_dirs)} chromosomes merged.')
+
+        self._write_remaining_ccds()
+
+    def _write_remaining_ccds(self):
+        """
+        Lists CCDs of CCD_COSTS_FILENAME which have no results in journals (e.g. their
+        run reached time limit of its job or was stopped by a signal) in
+        REMAINING_CCDS_FILENAME, so that they can be computed by a run with ccd_list.
+        The file is removed if all CCDs have results.
+
+        :return: number of CCDs without results
+        """
+        ccd_costs_path = os.path.join(self.out_dir, CCD_COSTS_FILENAME)
+        remaining_path = os.path.join(self.out_dir, REMAINING_CCDS_FILENAME)
+
+        if not os.path.exists(ccd_costs_path):
+            return 0
+
+        with open(ccd_costs_path) as f:
+            ccd_costs = json.load(f)
+
+        finished = {}  # (ccd_dir, algorithm_type) -> records of journal
+        remaining = []
+        for ccd in ccd_costs:
+            key = (os.path.join(self.out_dir, ccd['ccd_dir']), ccd['algorithm_type'])
+            if key not in finished:
+                finished[key] = self._journal(*key).load()
+            if ccd['input_filename'] not in finished[key]:
+                remaining.append(f"{ccd['ccd_dir']}/{ccd['input_filename']}")
+
+        if len(remaining) == 0:
+            if os.path.exists(remaining_path):
+                os.remove(remaining_path)
+            logging.info(f'All {len(ccd_costs)} CCDs of {CCD_COSTS_FILENAME} have results.')
+            return 0
+
+        tmp_path = f'{remaining_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            f.writelines(f'{x}\n' for x in remaining)
+        os.replace(tmp_path, remaining_path)
+
+        logging.warning(f'{len(remaining)} of {len(ccd_costs)} CCDs have no results, they are listed in '
+                        + f'{remaining_path} and can be computed with --ccd_list={remaining_path}')
+        return len(remaining)
+
+    def _execute(self, tasks):
+        """
+        Runs tasks from a single queue on pools of workers. Minor finders
+        are separate processes, so threads are enough to keep them busy.
+
+        CCDs processed with the full algorithm go through two stages: path
+        decomposition and minor finding, each with its own pool of workers.
+        Decompositions of next CCDs run while earlier ones are in the minor
+        finder, but at most pd_queue_size of them can be ahead of it.
+
+        A stage is started only if its memory estimate fits into the budget.
+
+        CCDs which ran out of time or memory are queued again, with higher limits,
+        once all other CCDs are done, see RetryPolicy.
+
+        After a signal, queued tasks are not started and go to self.remaining_tasks,
+        as well as tasks killed at the end of the grace period or stopped by the
+        signal themselves, see GracefulStop.interrupted().
+        """
+        pending = deque(tasks)
+        decomposed = deque()
+        retries = deque()
+        running = {}  # future -> (stage, task)
+
+        self.status.queued(tasks)
+        self.status.phase = 'computing'
+
+        with ThreadPoolExecutor(max_workers=self.workers) as finder_executor, \
+                ThreadPoolExecutor(max_workers=self.pd_workers) as decomposition_executor:
+
+            while pending or decomposed or running or retries:
+                if not (pending or decomposed or running):
+                    logging.info(f'Retrying {len(retries)} CCDs which ran out of time or memory.')
+                    pending.extend(sorted(retries, key=lambda x: x.predicted_runtime, reverse=True))
+                    retries.clear()
+
+                if self.graceful_stop.requested.is_set() and (pending or decomposed):
+                    for task in decomposed:
+                        self._remove_path_decomposition(task)
+                    self.remaining_tasks += list(pending) + list(decomposed)
+                    pending.clear()
+                    decomposed.clear()
+
+                running_stages = [stage for stage, _ in running.values()]
+
+                while running_stages.count('finder') < self.workers:
+                    linear_pending = deque(x for x in pending if x.algorithm_type == 'linear')
+                    queue = decomposed if decomposed else linear_pending
+
+                    task = self._next_admissible_task(queue, 'finder', nothing_running=len(running) == 0)
+                    if task is None:
+                        break
+                    if queue is linear_pending:
+                        pending.remove(task)
+
+                    self.memory_budget.reserve(task.memory_estimate)
+                    running[finder_executor.submit(self._process_ccd, task)] = ('finder', task)
+                    self.status.started(task)
+                    running_stages.append('finder')
+
+                while running_stages.count('decomposition') < self.pd_workers \
+                        and len(decomposed) + running_stages.count('decomposition') < self.pd_queue_size:
+                    full_pending = deque(x for x in pending if x.algorithm_type == 'full')
+
+                    task = self._next_admissible_task(full_pending, 'decomposition', nothing_running=len(running) == 0)
+                    if task is None:
+                        break
+                    pending.remove(task)
+
+                    self.memory_budget.reserve(task.memory_estimate)
+                    running[decomposition_executor.submit(self._run_path_decomposition, task)] = \
+                        ('decomposition', task)
+                    self.status.started(task)
+                    running_stages.append('decomposition')
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    stage, task = running.pop(future)
+                    self.memory_budget.release(task.memory_estimate)
+
+                    ccd_results = future.result()
+
+                    if self._interrupted(stage, ccd_results):
+                        # killed, or finished just before, computed again by the next run
+                        self._remove_path_decomposition(task)
+                        self.remaining_tasks.append(task)
+                        continue
+
+                    self._observe_memory(task, stage, ccd_results)
+
+                    if stage == 'decomposition' and ccd_results['decomposition_return_code'] == 0:
+                        decomposed.append(task)
+                        continue
+
+                    self._remove_path_decomposition(task)
+                    self._observe_runtime(task, ccd_results)
+                    self._store_in_cache(task, ccd_results)
+                    ccd_results['attempts'] = task.attempts + [attempt_record(task, ccd_results)]
+                    self._store_result(task, ccd_results)
+
+                    retried_task = self.retry_policy.retry(task, ccd_results)
+                    if retried_task is not None:
+                        retries.append(retried_task)
+                        self.status.queued([retried_task])
+                        continue
+
+                    if self.escalation_policy is not None and task.algorithm_type == 'linear':
+                        escalated_task = self._escalate(task, ccd_results)
+                        if escalated_task is not None:
+                            pending.append(escalated_task)
+                            self.status.queued([escalated_task])
+
+        if self.result_stager is not None:
+            self.result_stager.flush()
+
+        self.memory_estimator.save()
+        self.cost_model.save()
+
+    def _interrupted(self, stage, ccd_results):
+        """
+        Stage of CCD stopped by SIGTERM or SIGINT of the run, either killed at the end of the grace
+        period or signalled directly (e.g. by Slurm, which signals all processes of the job),
+        is not a failure: it is neither stored nor retried, but written to the checkpoint.
+        """
+        if stage == 'decomposition':
+            return self.graceful_stop.interrupted(ccd_results['decomposition_return_code'],
+                                                  ccd_results.get('decomposition_killed_by'))
+        return self.graceful_stop.interrupted(ccd_results['return_code'], ccd_results.get('finder_killed_by'))
+
+    def _next_admissible_task(self, queue, stage, nothing_running):
+        """
+        Takes the first task from queue which fits into the memory budget. If nothing
+        is running, the first task is taken anyway, so that CCDs larger than
+        the whole budget are not postponed forever.
+        """
+        if len(queue) == 0:
+            return None
+
+        memory_model = 'decomposition' if stage == 'decomposition' else None
+
+        for i, task in enumerate(queue):
+            task.memory_estimate = self.memory_estimator.estimate(memory_model or task.algorithm_type,
+                                                                  task.features['nodes'],
+                                                                  task.features['edges'])
+            if len(task.attempts) > 0:
+                # retried CCDs reserve at least what they used, more if they ran out of memory
+                task.memory_estimate = int(max(task.memory_estimate, task.attempts[-1]['peak_rss'])
+                                           * task.memory_factor)
+
+            if self.memory_budget.fits(task.memory_estimate):
+                del queue[i]
+                return task
+
+        if nothing_running:
+            task = queue.popleft()
+            logging.warning(f'{task.input_filename} is estimated to need {task.memory_estimate / GB:.2f}GB '
+                            + f'in {stage} stage, more than the memory budget, running it alone')
+            task.memory_estimate = self.memory_budget.total
+            return task
+
+        return None
+
+    def _observe_memory(self, task, stage, ccd_results):
+        if stage == 'decomposition':
+            memory_model = 'decomposition'
+            return_code = ccd_results['decomposition_return_code']
+            peak_rss = ccd_results['decomposition_peak_rss']
+        else:
+            memory_model = task.algorithm_type
+            return_code = ccd_results['return_code']
+            peak_rss = ccd_results['peak_rss']
+
+        if return_code == 0 and peak_rss > 0:
+            self.memory_estimator.observe(memory_model,
+                                          task.features['nodes'],
+                                          task.features['edges'],
+                                          peak_rss)
+
+    def _observe_runtime(self, task, ccd_results):
+        # Runtime of timed out CCD is only a lower bound, but still tells the model it is expensive
+        if ccd_results['return_code'] in (0, 124):
+            self.cost_model.observe(task.algorithm_type, task.features, ccd_results['runtime'])
+
+    def _process_ccd(self, task):
+        start_time = time.monotonic()
+
+        if task.algorithm_type == 'full':
+            ccd_results = self._run_full_minor_finder(task)
+        else:
+            ccd_results = self._run_linear_minor_finder(task)
+
+        ccd_results['runtime'] += time.monotonic() - start_time
+
+        return ccd_results
+
+    def _reduced(self, task):
+        return task.algorithm_type == 'linear' and (self.reduce_graphs or task.reduce_graph)
+
+    def _run_linear_minor_finder(self, task):
+        if self._reduced(task):
+            return self._run_reduced_minor_finder(task)
+
+        ccd_results = self._empty_ccd_results(task)
+
+        logging.info(f'Running minor finder on {task.file_path}')
+
+        minor_finding_algorithm, arguments, _ = self.finders[task.algorithm_type]
+
+        input_cmd = [minor_finding_algorithm,
+                     '-f', f'{task.file_path}',
+                     '-o', f'{task.result_path}']
+
+        if arguments is not None:
+            input_cmd = input_cmd + arguments
 
-                result = subprocess.run(
+        self._run_minor_finder(input_cmd, task, ccd_results)
+
+        return ccd_results
+
+    def _run_reduced_minor_finder(self, task):
+        """
+        Runs linear minor finder on blocks of the CCD graph in parallel and
+        writes found minors, in terms of the original graph, to the result file.
+        """
+        ccd_results = self._empty_ccd_results(task)
+        minor_finding_algorithm, arguments, timeout = self.finders[task.algorithm_type]
+        timeout = timeout * task.timeout_factor
+
+        node_names, edge_lines, edge_nodes = read_mp(task.file_path)
+        blocks = split_into_blocks(edge_nodes)
+        ccd_results['reduced_blocks'] = len(blocks)
+
+        logging.info(f'Running minor finder on {task.file_path} split into {len(blocks)} block(s)')
+
+        blocks_dir = os.path.join(self.pd_dir, os.path.split(task.ccd_dir)[-1], f'{task.input_filename}.blocks')
+        os.makedirs(blocks_dir, exist_ok=True)
+
+        def run_block(i):
+            block_path = os.path.join(blocks_dir, f'{i:04d}.mp')
+            write_block_mp(blocks[i], node_names, edge_lines, block_path)
+
+            input_cmd = [minor_finding_algorithm,
+                         '-f', block_path,
+                         '-o', f'{block_path}.raw_minors']
+            if arguments is not None:
+                input_cmd = input_cmd + arguments
+
+            with self.process_slots:
+                return run_process(input_cmd, timeout=timeout, registry=self.graceful_stop,
+                                   memory_watchdog=self.memory_watchdog,
+                                   memory_limit=self._memory_limit(self.max_memory, task))
+
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, len(blocks))) as executor:
+                block_results = list(executor.map(run_block, range(len(blocks))))
+
+            for result in block_results:
+                self._record_usage('finder', task, result, 124 if result.timed_out else result.return_code)
+
+            return_codes = [124 if x.timed_out else x.return_code for x in block_results]
+            ccd_results['return_code'] = next((x for x in return_codes if x != 0), 0)
+
+            ccd_results['finder_wall_time'] = max([x.wall_time for x in block_results], default=0.0)
+            ccd_results['finder_user_time'] = sum(x.user_time for x in block_results)
+            ccd_results['finder_sys_time'] = sum(x.sys_time for x in block_results)
+            ccd_results['finder_peak_rss'] = max([x.peak_rss for x in block_results], default=0)
+            killed = [x for x in block_results if x.killed_by is not None]
+            if len(killed) > 0:
+                ccd_results['finder_killed_by'] = killed[0].killed_by
+                ccd_results['finder_killed_at'] = killed[0].killed_at
+            ccd_results['peak_rss'] = ccd_results['finder_peak_rss']
+
+        except Exception as other_exception:
+            logging.error(f'Exception occurred {other_exception}')
+            ccd_results['return_code'] = 1
+
+        if ccd_results['return_code'] == 0:
+            minors = []
+            for i, block in enumerate(blocks):
+                with open(os.path.join(blocks_dir, f'{i:04d}.mp.raw_minors')) as f:
+                    minors.append(map_minors_to_original(f.read(), block, node_names))
+
+            # Result file may be a hardlink to cache entry, which must not be overwritten
+            if os.path.exists(task.result_path):
+                os.remove(task.result_path)
+            with open(f'{task.result_path}.tmp', 'w') as f:
+                f.writelines(minors)
+            os.replace(f'{task.result_path}.tmp', task.result_path)
+
+            ccd_results['results_exist'] = True
+            ccd_results['results_filename'] = os.path.split(task.result_path)[-1]
+            ccd_results['results_not_empty'] = os.stat(task.result_path).st_size > 0
+            logging.info(f'{task.input_filename} processing finished')
+        else:
+            if ccd_results['return_code'] == 124:
+                logging.error(f'Timeout expired on {task.file_path}')
+            else:
+                logging.error(f'{task.input_filename} processing ended with and error. '
+                              + f'Return code: {ccd_results["return_code"]}')
+            ccd_results['results_exist'] = False
+            ccd_results['results_filename'] = ''
+
+        shutil.rmtree(blocks_dir, ignore_errors=True)
+
+        return ccd_results
+
+    def _path_decomposition_path(self, task):
+        chromosome_dir = os.path.split(task.ccd_dir)[-1]
+        return os.path.join(self.pd_dir, chromosome_dir, f'{task.input_filename}.pd')
+
+    def _run_path_decomposition(self, task):
+        """
+        First stage of the full algorithm. Path decomposition is written to
+        pd_dir (tmpfs by default), it is removed once the minor finder is done.
+        """
+        start_time = time.monotonic()
+
+        task.results = self._empty_ccd_results(task)
+        ccd_results = task.results
+        ccd_results['decomposition_return_code'] = None
+        ccd_results.update(usage_fields('decomposition', ProcessResult()))
+
+        logging.info(f'Running path decomposition on {task.file_path}')
+
+        input_cmd = [self.path_decomposition_algorithm,
+                     '-f', f'{task.file_path}']
+
+        pd_path = self._path_decomposition_path(task)
+        os.makedirs(os.path.split(pd_path)[0], exist_ok=True)
+
+        try:
+            with open(pd_path, 'w') as f:
+                decomposition = run_process(
                     input_cmd,
-                    preexec_fn=limit_max_memory,
-                    timeout=self.ccd_timeout
+                    stdout=f,
+                    timeout=self.pd_timeout * task.timeout_factor,
+                    registry=self.graceful_stop,
+                    memory_watchdog=self.memory_watchdog,
+                    memory_limit=self._memory_limit(self.pd_max_memory, task)
                 )
 
-                ccd_results['results_exist'] = True
-                ccd_results['results_filename'] = os.path.split(result_path)[-1]
-                ccd_results['return_code'] = result.returncode
+            ccd_results.update(usage_fields('decomposition', decomposition))
+            ccd_results['decomposition_return_code'] = 124 if decomposition.timed_out else decomposition.return_code
+            self._record_usage('decomposition', task, decomposition, ccd_results['decomposition_return_code'])
 
-                if result.returncode == 0:
-                    logging.info(f'{file_name} processing finished')
-                else:
-                    if os.path.exists(result_path):
-                        logging.warning(f'{file_name} processing ended with and error, but result file exists. '
-                                        + f'Return code: {result.returncode}')
-                    else:
-                        logging.error(f'{file_name} processing ended with and error, and result file does not exist. '
-                                      + f'Return code: {result.returncode}')
-                        ccd_results['results_exist'] = False
-                        ccd_results['results_filename'] = ''
-
-            except subprocess.TimeoutExpired:
-                logging.error(f'Timeout expired on {file_path}')
-                ccd_results['results_exist'] = False
-                ccd_results['results_filename'] = ''
-                ccd_results['return_code'] = 124
-
-            except Exception as other_exception:
-                logging.error(f'Exception occurred {other_exception}')
-                ccd_results['results_exist'] = False
-                ccd_results['results_filename'] = ''
-                ccd_results['return_code'] = 1
-
-            if os.path.exists(result_path) and os.stat(result_path).st_size > 0:
-                ccd_results['results_not_empty'] = True
-
-            if self.resuming_computation:
-                chromosome_results[i] = ccd_results
+        except Exception as other_exception:
+            logging.error(f'Exception occurred {other_exception}')
+            ccd_results['decomposition_return_code'] = 1
+
+        if ccd_results['decomposition_return_code'] == 124:
+            logging.error(f'Path decomposition timeout expired on {task.file_path}')
+        elif ccd_results['decomposition_return_code'] != 0:
+            logging.error(f'Path decomposition of {task.input_filename} ended with an error. '
+                          + f'Return code: {ccd_results["decomposition_return_code"]}')
+
+        if ccd_results['decomposition_return_code'] != 0:
+            ccd_results['results_filename'] = ''
+            ccd_results['return_code'] = ccd_results['decomposition_return_code']
+
+        ccd_results['peak_rss'] = ccd_results['decomposition_peak_rss']
+        ccd_results['runtime'] = time.monotonic() - start_time
+
+        return ccd_results
+
+    def _run_full_minor_finder(self, task):
+        """
+        Second stage of the full algorithm, run on path decomposition
+        computed by self._run_path_decomposition().
+        """
+        ccd_results = task.results
+
+        logging.info(f'Running minor finder on {task.file_path}')
+
+        minor_finding_algorithm, arguments, _ = self.finders[task.algorithm_type]
+
+        input_cmd = [minor_finding_algorithm,
+                     '-f', f'{self._path_decomposition_path(task)}',
+                     '-o', f'{task.result_path}']
+
+        if arguments is not None:
+            input_cmd = input_cmd + arguments
+
+        logging.info(f'Running: {input_cmd}')
+
+        self._run_minor_finder(input_cmd, task, ccd_results)
+
+        return ccd_results
+
+    def _remove_path_decomposition(self, task):
+        if task.algorithm_type == 'full' and os.path.exists(self._path_decomposition_path(task)):
+            os.remove(self._path_decomposition_path(task))
+
+    @staticmethod
+    def _memory_limit(max_memory, task):
+        # retried CCDs get more memory, see RetryPolicy
+        return None if max_memory is None else int(max_memory * task.memory_factor)
+
+    def _run_minor_finder(self, input_cmd, task, ccd_results):
+        file_name = task.input_filename
+        result_path = task.result_path
+
+        # Result file may be a hardlink to cache entry, which must not be overwritten
+        if os.path.exists(result_path):
+            os.remove(result_path)
+
+        _, _, timeout = self.finders[task.algorithm_type]
+        timeout = timeout * task.timeout_factor
+
+        try:
+            result = run_process(
+                input_cmd,
+                timeout=timeout,
+                registry=self.graceful_stop,
+                memory_watchdog=self.memory_watchdog,
+                memory_limit=self._memory_limit(self.max_memory, task)
+            )
+
+            ccd_results.update(usage_fields('finder', result))
+            ccd_results['peak_rss'] = max(ccd_results['peak_rss'], result.peak_rss)
+            self._record_usage('finder', task, result, 124 if result.timed_out else result.return_code)
+
+            if result.timed_out:
+                raise subprocess.TimeoutExpired(input_cmd, timeout)
+
+            ccd_results['results_exist'] = True
+            ccd_results['results_filename'] = os.path.split(result_path)[-1]
+            ccd_results['return_code'] = result.return_code
+
+            if result.return_code == 0:
+                logging.info(f'{file_name} processing finished')
             else:
-                chromosome_results.append(ccd_results)
+                if os.path.exists(result_path):
+                    logging.warning(f'{file_name} processing ended with and error, but result file exists. '
+                                    + f'Return code: {result.return_code}')
+                else:
+                    logging.error(f'{file_name} processing ended with and error, and result file does not exist. '
+                                  + f'Return code: {result.return_code}')
+                    ccd_results['results_exist'] = False
+                    ccd_results['results_filename'] = ''
+
+        except subprocess.TimeoutExpired:
+            logging.error(f'Timeout expired on {task.file_path}')
+            ccd_results['results_exist'] = False
+            ccd_results['results_filename'] = ''
+            ccd_results['return_code'] = 124
+
+        except Exception as other_exception:
+            logging.error(f'Exception occurred {other_exception}')
+            ccd_results['results_exist'] = False
+            ccd_results['results_filename'] = ''
+            ccd_results['return_code'] = 1
+
+        if os.path.exists(result_path) and os.stat(result_path).st_size > 0:
+            ccd_results['results_not_empty'] = True
+
+    def _record_usage(self, stage, task, process_result, return_code):
+        self.resource_usage.add(stage,
+                                os.path.split(task.ccd_dir)[-1].replace('chr_', ''),
+                                task.input_filename,
+                                process_result,
+                                return_code,
+                                nodes=task.features.get('nodes'),
+                                edges=task.features.get('edges'))
+
+    @staticmethod
+    def _empty_ccd_results(task):
+        ccd_results = {
+            'input_filename': task.input_filename,
+            'results_exist': False,
+            'results_not_empty': False,
+            'results_filename': None,
+            'return_code': None,
+            'ccd_start': task.ccd_start,
+            'ccd_end': task.ccd_end,
+            'memory_estimate': task.memory_estimate,
+            'peak_rss': 0,
+            'predicted_runtime': task.predicted_runtime,
+            'runtime': 0.0,
+            'cached': False,
+            'nodes': task.features.get('nodes'),
+            'edges': task.features.get('edges'),
+            'algorithm_type': task.algorithm_type,
+            'escalation_reason': task.escalation_reason,
+            'prescreened': None,
+            'reduced_blocks': None,
+            'attempts': []
+        }
+        ccd_results.update(usage_fields('finder', ProcessResult()))
+
+        return ccd_results
+
+    def _journal(self, ccd_dir_path, algorithm_type):
+        key = (ccd_dir_path, algorithm_type)
+        if key not in self.journals:
+            self.journals[key] = ResultsJournal(os.path.join(self._out_path(ccd_dir_path),
+                                                             JOURNAL_FILENAMES[algorithm_type]))
+        return self.journals[key]
+
+    def _load_previous_results(self, ccd_dir_path, algorithm_type):
+        journal = self._journal(ccd_dir_path, algorithm_type)
+        chromosome_results = journal.load()
+
+        results_path = os.path.join(self._out_path(ccd_dir_path), RESULTS_FILENAMES[algorithm_type])
+
+        # results.json written by a version without journal
+        if len(chromosome_results) == 0 and self.resuming_computation and os.path.exists(results_path):
+            with open(results_path) as f:
+                previous_results = json.load(f)
+
+            for results_for_ccd in previous_results:
+                if results_for_ccd is not None:
+                    chromosome_results[results_for_ccd['input_filename']] = results_for_ccd
+                    journal.append(results_for_ccd)
+
+        self.chromosome_results[(ccd_dir_path, algorithm_type)] = chromosome_results
+
+    def _store_result(self, task, ccd_results):
+        self.status.finished(task, ccd_results)
+
+        journal = self._journal(task.ccd_dir, task.algorithm_type)
+
+        if self.result_stager is None:
+            journal.append(ccd_results)
+        else:
+            files = []
+            if ccd_results['results_exist']:
+                files.append((task.result_path, self._out_path(task.result_path)))
+            self.result_stager.stage(files, journal, ccd_results)
+
+        self.chromosome_results[(task.ccd_dir, task.algorithm_type)][task.input_filename] = ccd_results
+
+    def _save_results(self, ccd_dir_path, algorithm_type):
+        """
+        Builds results.json from the journal.
+        """
+        journal = self._journal(ccd_dir_path, algorithm_type)
+        journal.close()
+
+        write_results_json(journal.load(),
+                           os.path.join(self._out_path(ccd_dir_path), RESULTS_FILENAMES[algorithm_type]))
+
+    def _write_checkpoint(self):
+        """
+        Atomically writes CCDs left by a run stopped with a signal. Finished CCDs are
+        already in journals and results.json, so the next run with the same out_dir
+        computes exactly these ones. Checkpoint of a complete run is removed.
+
+        :return: exit code
+        """
+        checkpoint_path = os.path.join(self.out_dir, f'{os.path.splitext(CHECKPOINT_FILENAME)[0]}{self.run_name}.json')
+
+        if self.graceful_stop.signum is None:
+            if os.path.exists(checkpoint_path):
+                os.remove(checkpoint_path)
+            return 0
+
+        checkpoint = {
+            'signal': signal.Signals(self.graceful_stop.signum).name,
+            'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'remaining': sorted(
+                [{'ccd': os.path.relpath(x.file_path, self.work_dir), 'algorithm_type': x.algorithm_type}
+                 for x in self.remaining_tasks],
+                key=lambda x: (x['ccd'], x['algorithm_type'])
+            )
+        }
+
+        tmp_path = f'{checkpoint_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(checkpoint, f, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, checkpoint_path)
+
+        logging.warning(f'Run stopped by {checkpoint["signal"]}, {len(self.remaining_tasks)} CCDs left '
+                        + f'for the next run, see {checkpoint_path}')
 
-            with open(os.path.join(ccd_dir_path, 'results_full.json'), 'w') as f:
-                json.dump(chromosome_results, f, indent=4, sort_keys=True)
+        return 128 + self.graceful_stop.signum
+
+    def _out_path(self, path):
+        """
+        Translates path in work_dir into the corresponding path in out_dir.
+        """
+        return os.path.join(self.out_dir, os.path.relpath(path, self.work_dir))
+
+    def _stage_in_ccd_list(self):
+        """
+        Copies .mp files of CCDs from ccd_list to the scratch directory.
+        """
+        for ccd_dir, input_filename in self.ccd_list:
+            os.makedirs(ccd_dir, exist_ok=True)
+            shutil.copyfile(os.path.join(self._out_path(ccd_dir), input_filename),
+                            os.path.join(ccd_dir, input_filename))
+
+    def _remove_work_dir(self):
+        """
+        Copies back results left in the stager and removes the scratch directory.
+        """
+        if self.result_stager is None:
+            return
 
-        with open(os.path.join(ccd_dir_path, 'results_full.json'), 'w') as f:
-            json.dump(chromosome_results, f, indent=4, sort_keys=True)
+        self.result_stager.flush()
+        shutil.rmtree(self.work_dir, ignore_errors=True)
 
     @staticmethod
     def _get_bin_path(algorithm_name):
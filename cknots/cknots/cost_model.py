@@ -0,0 +1,94 @@
+"""
+Runtime prediction for minor finders, used to start the most expensive CCDs first.
+"""
+
+import numpy as np
+
+from cknots.cknots.observations_file import load_observations, save_observations
+
+FEATURES = ['nodes', 'edges', 'treewidth', 'cutwidth']
+
+# Weights of log(1 + runtime) regression used before any runtime was observed:
+# intercept, log(1 + nodes), log(1 + edges), treewidth, log(1 + cutwidth)
+PRIOR_WEIGHTS = {
+    'linear': [-6.0, 0.0, 1.0, 0.3, 1.0],
+    'full': [-5.0, 0.0, 1.0, 0.6, 1.0]
+}
+
+# How strongly fitted weights are pulled towards the prior
+PRIOR_STRENGTH = 10.0
+
+MAX_OBSERVATIONS = 5000
+
+
+def _design_row(features):
+    return [
+        1.0,
+        np.log1p(features['nodes']),
+        np.log1p(features['edges']),
+        float(features['treewidth']),
+        np.log1p(features['cutwidth'])
+    ]
+
+
+class CostModel:
+
+    def __init__(self, model_path=None):
+        """
+        Predicts runtime (seconds) of a minor finder on a CCD from features of its
+        graph, see graph_features.graph_features(). It is a ridge regression of
+        log(1 + runtime) pulled towards PRIOR_WEIGHTS and refitted on runtimes
+        observed in this and previous runs (saved to model_path, if given).
+
+        :param model_path: path to .json file with observations
+        """
+        self.model_path = model_path
+        self.observations = {algorithm_type: [] for algorithm_type in PRIOR_WEIGHTS}
+        self._weights = {}  # cache, cleared by each observation
+
+        # observations of this run not saved yet, see save()
+        self._new_observations = {algorithm_type: [] for algorithm_type in self.observations}
+
+        if model_path is not None:
+            self.observations.update(load_observations(model_path))
+
+    def weights(self, algorithm_type):
+        if algorithm_type not in self._weights:
+            self._weights[algorithm_type] = self._fit(algorithm_type)
+        return self._weights[algorithm_type]
+
+    def _fit(self, algorithm_type):
+        prior = np.array(PRIOR_WEIGHTS[algorithm_type])
+        observations = self.observations[algorithm_type]
+
+        if len(observations) == 0:
+            return prior
+
+        x = np.array([_design_row(features) for features, _ in observations])
+        y = np.log1p([runtime for _, runtime in observations])
+
+        regularization = PRIOR_STRENGTH * np.eye(len(prior))
+        return np.linalg.solve(x.T @ x + regularization, x.T @ y + regularization @ prior)
+
+    def predict(self, algorithm_type, features):
+        log_runtime = float(np.dot(self.weights(algorithm_type), _design_row(features)))
+        return float(np.expm1(max(log_runtime, 0.0)))
+
+    def observe(self, algorithm_type, features, runtime):
+        observation = ({name: features[name] for name in FEATURES}, runtime)
+        for observations in (self.observations[algorithm_type], self._new_observations[algorithm_type]):
+            observations.append(observation)
+            del observations[:-MAX_OBSERVATIONS]
+        self._weights.pop(algorithm_type, None)
+
+    def save(self):
+        """
+        Adds observations of this run to model_path, keeping ones saved there
+        by other runs in the meantime, see observations_file.save_observations().
+        """
+        if self.model_path is None:
+            return
+
+        self.observations.update(save_observations(self.model_path, self._new_observations, MAX_OBSERVATIONS))
+        self._new_observations = {algorithm_type: [] for algorithm_type in self.observations}
+        self._weights = {}
@@ -0,0 +1,64 @@
+"""
+Policy deciding which CCDs computed with the linear minor finder are
+computed again with the full algorithm in tiered mode.
+"""
+
+import numpy as np
+import pandas as pd
+
+# K6 has 15 edges on 6 vertices
+DEFAULT_MIN_DENSITY = 2.5
+
+MIN_NODES = 6
+
+
+class EscalationPolicy:
+
+    def __init__(self, min_density=DEFAULT_MIN_DENSITY, regions_path=None):
+        """
+        CCD is escalated to the full algorithm if it overlaps one of regions,
+        or if the linear minor finder finished without finding anything in
+        a graph with at least min_density edges per node. Chromatin backbone
+        edges between consecutive nodes (not listed in .mp file) are counted.
+
+        :param min_density: minimal ratio of edges to nodes of escalated CCDs,
+            no escalation by density if None
+        :param regions_path: path to .bed file (chromosome, start, end) with regions
+            in which every CCD is escalated
+        """
+        self.min_density = None if min_density is None else float(min_density)
+        self.regions = {}
+
+        if regions_path is not None:
+            regions = pd.read_csv(regions_path,
+                                  sep='\t',
+                                  header=None,
+                                  usecols=[0, 1, 2],
+                                  names=['chromosome', 'start', 'end'])
+
+            for chromosome, chromosome_regions in regions.groupby('chromosome'):
+                self.regions[chromosome] = (chromosome_regions['start'].to_numpy(),
+                                            chromosome_regions['end'].to_numpy())
+
+    def reason(self, chromosome_name, task, ccd_results):
+        """
+        :param chromosome_name: chromosome as in .bed files, e.g. chr1
+        :param task: CCDTask computed with the linear minor finder
+        :param ccd_results: results of the linear minor finder
+        :return: reason of escalation ('region' or 'density'), None if CCD is not escalated
+        """
+        if chromosome_name in self.regions:
+            starts, ends = self.regions[chromosome_name]
+            if np.any((starts < task.ccd_end) & (ends > task.ccd_start)):
+                return 'region'
+
+        if self.min_density is None or ccd_results['return_code'] != 0 or ccd_results['results_not_empty']:
+            return None
+
+        nodes = task.features['nodes']
+        edges = task.features['edges'] + nodes - 1  # with chromatin backbone
+
+        if nodes >= MIN_NODES and edges / nodes >= self.min_density:
+            return 'density'
+
+        return None
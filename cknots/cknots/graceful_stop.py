@@ -0,0 +1,102 @@
+"""
+Stopping computations on SIGTERM (e.g. preemption by Slurm) or SIGINT
+without losing or damaging results of finished CCDs.
+"""
+
+import logging
+import signal
+import threading
+
+from cknots.cknots.process_runner import kill
+
+HANDLED_SIGNALS = (signal.SIGTERM, signal.SIGINT)
+
+
+class GracefulStop:
+
+    def __init__(self, grace_period=20):
+        """
+        After a signal, no new processes should be started. Running processes
+        get grace_period seconds to finish and are killed afterwards.
+        A second signal kills them at once.
+
+        Processes are registered with add() and run in their own session, so
+        a signal sent to the process group of the scheduler (e.g. Ctrl+C in
+        a terminal) reaches only the scheduler. Signals sent to all processes
+        of the job (e.g. scancel or preemption by Slurm) reach the processes
+        too and they exit at once; see interrupted().
+
+        :param grace_period: time (seconds) given to running processes
+        """
+        self.grace_period = grace_period
+        self.signum = None
+        self.requested = threading.Event()  # signal received, do not start anything new
+        self.expired = threading.Event()  # grace period is over, running processes are killed
+
+        self._processes = set()
+        self._lock = threading.Lock()
+        self._previous_handlers = {}
+        self._timer = None
+
+    def install(self):
+        # signal handlers can be set only in the main thread
+        if threading.current_thread() is not threading.main_thread():
+            logging.warning('Not in the main thread, signals are not handled.')
+            return
+
+        for signum in HANDLED_SIGNALS:
+            self._previous_handlers[signum] = signal.signal(signum, self._handle)
+
+    def uninstall(self):
+        for signum, handler in self._previous_handlers.items():
+            signal.signal(signum, handler)
+        self._previous_handlers = {}
+
+        if self._timer is not None:
+            self._timer.cancel()
+
+    def add(self, process):
+        with self._lock:
+            if self.expired.is_set():
+                kill(process)
+            self._processes.add(process)
+
+    def discard(self, process):
+        with self._lock:
+            self._processes.discard(process)
+
+    def interrupted(self, return_code, killed_by=None):
+        """
+        Tells if a process with return_code was stopped along with the run: it exited
+        on a signal, after a stop was requested or after the grace period, and
+        MemoryWatchdog did not kill it.
+
+        :param return_code: return code of the process, negative if it exited on a signal
+        :param killed_by: reason of kill by MemoryWatchdog, if any
+        """
+        if self.expired.is_set():
+            return True
+        return self.requested.is_set() and return_code is not None and return_code < 0 and killed_by is None
+
+    def _handle(self, signum, frame):
+        if self.requested.is_set():
+            logging.warning(f'{signal.Signals(signum).name} received again, killing running processes.')
+            self._kill_all()
+            return
+
+        self.signum = signum
+        self.requested.set()
+        logging.warning(f'{signal.Signals(signum).name} received, no new CCDs are started. Running ones '
+                        + f'are killed in {self.grace_period}s.')
+
+        self._timer = threading.Timer(self.grace_period, self._kill_all)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _kill_all(self):
+        with self._lock:
+            if not self.expired.is_set() and len(self._processes) > 0:
+                logging.warning(f'Killing {len(self._processes)} running process(es).')
+            self.expired.set()
+            for process in self._processes:
+                kill(process)
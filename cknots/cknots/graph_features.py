@@ -0,0 +1,54 @@
+"""
+Features of CCD graphs read from .mp files.
+"""
+
+from cknots.analysis.ccd import CCD
+from cknots.cknots.prescreen import k6_minor_excluded
+
+
+def count_graph_elements(mp_path):
+    """
+    Counts NODE and EDGE lines of .mp file without building the graph.
+
+    :param mp_path: path to .mp file
+    :return: tuple (number of nodes, number of edges)
+    """
+    nodes = 0
+    edges = 0
+
+    with open(mp_path, 'rb') as f:
+        for line in f:
+            if line.startswith(b'NODE'):
+                nodes += 1
+            elif line.startswith(b'EDGE'):
+                edges += 1
+
+    return nodes, edges
+
+
+def graph_features(mp_path):
+    """
+    Features of CCD graph used to predict cost of finding minors in it:
+    number of nodes and edges of .mp file, treewidth approximation and
+    cutwidth heuristic of the graph (with chromatin backbone edges).
+    Also the reason why the graph cannot contain K6 minor (k6_excluded),
+    if there is one, see prescreen.k6_minor_excluded().
+
+    :param mp_path: path to .mp file
+    :return: dict with features
+    """
+    nodes, edges = count_graph_elements(mp_path)
+
+    ccd = CCD()
+    ccd.load_graph_from_file(mp_path)
+
+    treewidth = max(int(ccd.treewidth_approximation()), 0)
+
+    return {
+        'nodes': nodes,
+        'edges': edges,
+        'treewidth': treewidth,
+        'cutwidth': int(ccd.cutwidth_heuristic()),
+        # the bound of the whole graph already excludes most CCDs
+        'k6_excluded': k6_minor_excluded(ccd.graph, treewidth=treewidth)
+    }
@@ -0,0 +1,124 @@
+"""
+Reduction of CCD graphs before running the linear minor finder on them.
+
+find-k6-linear looks for minors whose branch sets are consecutive segments
+of the chromatin backbone, every segment being connected by contact edges
+with all segments except the neighbouring ones. Such a minor cannot span
+a position on the backbone which is not spanned by any contact edge, so
+the graph splits into blocks of overlapping contact edges, which are
+searched separately. Every segment has endpoints of at least three contact
+edges, so nodes without contact edges can be dropped; they are added back
+to the segments when minors are mapped to the original graph.
+"""
+
+import re
+from dataclasses import dataclass, field
+
+# Contact edges of a linear K6 minor, 15 edges of K6 minus 5 backbone connections
+LINEAR_K6_JUMP_EDGES = 10
+
+SEGMENT_PATTERN = re.compile(r'^(\s*segment=\d+ start=\()(\d+)=(\S+)(\) end=\()(\d+)(=\S+\).*)$')
+EDGE_PATTERN = re.compile(r'^(\s*from \d+ to \d+, eid=)(\d+)(, left=\()(\d+)(=\S+\), right=\()(\d+)(=\S+\).*)$')
+
+
+@dataclass
+class GraphBlock:
+    nodes: list = field(default_factory=list)  # indices of nodes in the original graph, sorted
+    edges: list = field(default_factory=list)  # indices of edges in the original graph
+
+
+def read_mp(mp_path):
+    """
+    :param mp_path: path to .mp file
+    :return: tuple (node names in order of NODE lines, list of EDGE lines,
+        list of (node index, node index) for every EDGE line)
+    """
+    node_names = []
+    edge_lines = []
+
+    with open(mp_path) as f:
+        for line in f:
+            if line.startswith('NODE'):
+                node_names.append(line.split()[1])
+            elif line.startswith('EDGE'):
+                edge_lines.append(line if line.endswith('\n') else line + '\n')
+
+    node_index = {name: i for i, name in enumerate(node_names)}
+    edge_nodes = [(node_index[x.split()[1]], node_index[x.split()[2]]) for x in edge_lines]
+
+    return node_names, edge_lines, edge_nodes
+
+
+def split_into_blocks(edge_nodes, min_edges=LINEAR_K6_JUMP_EDGES):
+    """
+    Splits graph into blocks of contact edges with overlapping spans on the backbone.
+    Neighbouring blocks may share a node. Blocks with less than min_edges
+    edges cannot contain a minor and are skipped.
+
+    :param edge_nodes: list of (node index, node index) of every edge
+    :param min_edges: minimal number of edges of a block
+    :return: list of GraphBlock
+    """
+    spans = sorted((min(u, v), max(u, v), eid) for eid, (u, v) in enumerate(edge_nodes) if u != v)
+
+    blocks = []
+    block_end = None
+
+    for start, end, eid in spans:
+        if block_end is None or start >= block_end:
+            blocks.append(GraphBlock())
+            block_end = end
+        block_end = max(block_end, end)
+        blocks[-1].edges.append(eid)
+
+    blocks = [x for x in blocks if len(x.edges) >= min_edges]
+
+    for block in blocks:
+        block.edges.sort()
+        block.nodes = sorted(set(v for eid in block.edges for v in edge_nodes[eid]))
+
+    return blocks
+
+
+def write_block_mp(block, node_names, edge_lines, block_mp_path):
+    with open(block_mp_path, 'w') as f:
+        f.writelines(f'NODE {node_names[v]}\n' for v in block.nodes)
+        f.writelines(edge_lines[eid] for eid in block.edges)
+
+
+def map_minors_to_original(raw_minors, block, node_names):
+    """
+    Translates node ids and eids in output of linear minor finder run on
+    a block into ids of the original graph. Segments are extended to cover
+    dropped nodes: the first one starts at the first node of the graph,
+    every other starts right after the end of the previous one.
+
+    :param raw_minors: contents of .raw_minors file of the block
+    :param block: GraphBlock
+    :param node_names: node names of the original graph
+    :return: contents of .raw_minors file in terms of the original graph
+    """
+    lines = []
+    previous_end = -1
+
+    for line in raw_minors.splitlines(keepends=True):
+        segment = SEGMENT_PATTERN.match(line)
+        edge = EDGE_PATTERN.match(line)
+
+        if segment is not None:
+            start = previous_end + 1
+            end = block.nodes[int(segment.group(5))]
+            line = f'{segment.group(1)}{start}={node_names[start]}{segment.group(4)}{end}{segment.group(6)}\n'
+            previous_end = end
+
+        elif edge is not None:
+            line = (f'{edge.group(1)}{block.edges[int(edge.group(2))]}{edge.group(3)}'
+                    + f'{block.nodes[int(edge.group(4))]}{edge.group(5)}'
+                    + f'{block.nodes[int(edge.group(6))]}{edge.group(7)}\n')
+
+        elif line.startswith('MINOR'):
+            previous_end = -1
+
+        lines.append(line)
+
+    return ''.join(lines)
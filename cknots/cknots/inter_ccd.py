@@ -0,0 +1,128 @@
+"""
+Minors crossing CCD boundaries. Instead of searching the whole chromosome,
+which finds again every minor found in single CCDs, minor finders run on
+windows around boundaries between neighbouring CCDs. Minors found there are
+kept only if they cross a boundary and were not found in any single CCD.
+"""
+
+import re
+
+import numpy as np
+
+# subdirectory of chromosome directory with graphs and results of windows
+INTER_CCD_DIRNAME = 'inter_ccd'
+
+# minors crossing CCD boundaries of one chromosome, in chromosome directory
+INTER_CCD_RESULTS_FILENAME = 'results_inter_ccd.json'
+
+# contact edge of minor in results of find-k6-linear: left=(<id>=<name>), right=(<id>=<name>)
+EDGE_NODES_PATTERN = re.compile(r'left=\(\d+=(\S+?)\), right=\(\d+=(\S+?)\)')
+
+# contact edge of minor in results of find-knots: edge(<branch> <branch>)=<eid>=(<name> <name>)
+FULL_EDGE_NODES_PATTERN = re.compile(r'edge\(\d+ \d+\)=\d+=\(([^\s()]+) ([^\s()]+)\)')
+
+
+def inter_ccd_windows(ccd_starts, ccd_ends, width):
+    """
+    Windows reaching width bp into both CCDs around every boundary between
+    neighbouring CCDs. Overlapping windows are merged, so that splitter
+    does not assign their edges to only one of them.
+
+    :param ccd_starts: starts of CCDs of one chromosome
+    :param ccd_ends: ends of these CCDs
+    :param width: how far (bp) windows reach into CCDs
+    :return: list of (start, end) of windows, sorted
+    """
+    ccds = sorted(zip(ccd_starts, ccd_ends))
+    windows = []
+
+    for (start, end), (next_start, next_end) in zip(ccds[:-1], ccds[1:]):
+        window_start = max(start, end - width)
+        window_end = min(next_end, next_start + width)
+
+        if len(windows) > 0 and window_start < windows[-1][1]:
+            windows[-1] = (windows[-1][0], max(windows[-1][1], window_end))
+        else:
+            windows.append((window_start, window_end))
+
+    return [(int(start), int(end)) for start, end in windows]
+
+
+def node_position(node_name):
+    # chr21_0002007000 -> 2007000
+    return int(node_name.rsplit('_', 1)[-1])
+
+
+class CCDBoundaries:
+
+    def __init__(self, ccd_starts, ccd_ends):
+        """
+        CCDs of one chromosome, used to tell if a set of positions lies within one of them.
+        """
+        order = np.argsort(ccd_starts)
+        self.starts = np.asarray(ccd_starts)[order]
+        self.ends = np.asarray(ccd_ends)[order]
+
+    def within_one_ccd(self, positions):
+        i = np.searchsorted(self.starts, min(positions), side='right') - 1
+        return i >= 0 and max(positions) <= self.ends[i]
+
+
+def has_crossing_edges(mp_path, boundaries):
+    """
+    :param mp_path: path to .mp file of window
+    :param boundaries: CCDBoundaries of the chromosome
+    :return: True if some contact edge of the graph does not lie within one CCD
+    """
+    with open(mp_path) as f:
+        for line in f:
+            if line.startswith('EDGE'):
+                fields = line.split()
+                if not boundaries.within_one_ccd([node_position(fields[1]), node_position(fields[2])]):
+                    return True
+    return False
+
+
+def split_minors(raw_minors):
+    """
+    :param raw_minors: contents of .raw_minors file of find-k6-linear (MINOR { ... } blocks)
+        or find-knots (one MINOR line per minor)
+    :return: list of texts of single minors
+    """
+    return ['MINOR' + x for x in raw_minors.split('MINOR')[1:]]
+
+
+def minor_edges(minor_text):
+    """
+    Contact edges of minor as sorted pairs of node names, which are the same in graphs
+    of CCDs and windows, unlike node ids and eids, and for both minor finders.
+    """
+    pairs = EDGE_NODES_PATTERN.findall(minor_text) + FULL_EDGE_NODES_PATTERN.findall(minor_text)
+    return frozenset(tuple(sorted(x)) for x in pairs)
+
+
+def crossing_minors(raw_minors, known_edges, boundaries):
+    """
+    Minors of window which cross a CCD boundary and have a set of contact
+    edges not seen before. Minors differing only in segments are the same link.
+
+    :param raw_minors: contents of .raw_minors file of window
+    :param known_edges: set of minor_edges() of minors found so far, updated
+    :param boundaries: CCDBoundaries of the chromosome
+    :return: list of texts of new minors
+    """
+    new_minors = []
+
+    for minor_text in split_minors(raw_minors):
+        edges = minor_edges(minor_text)
+        if len(edges) == 0 or edges in known_edges:
+            continue
+
+        positions = [node_position(x) for edge in edges for x in edge]
+        if boundaries.within_one_ccd(positions):
+            continue
+
+        known_edges.add(edges)
+        new_minors.append(minor_text)
+
+    return new_minors
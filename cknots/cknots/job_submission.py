@@ -0,0 +1,98 @@
+"""
+Submitting batch scripts to Slurm, or running them on the local machine
+the same way, so that Slurm workflows can be tested without a cluster.
+"""
+
+import itertools
+import logging
+import os
+import subprocess
+import threading
+
+
+class SbatchSubmitter:
+    """
+    Submits scripts with sbatch.
+    """
+
+    def submit(self, script_path, array_size=None, dependencies=None, wait=False):
+        """
+        :param script_path: path to batch script
+        :param array_size: number of tasks of job array, no array if None
+        :param dependencies: ids of jobs which have to end before this one starts
+        :param wait: do not return until the job ends
+        :return: job id
+        """
+        input_cmd = ['sbatch', '--parsable']
+
+        if array_size is not None:
+            input_cmd.append(f'--array=0-{array_size - 1}')
+        if dependencies:
+            input_cmd.append('--dependency=afterany:' + ':'.join(dependencies))
+        if wait:
+            input_cmd.append('--wait')
+
+        result = subprocess.run(input_cmd + [script_path], stdout=subprocess.PIPE, check=True, text=True)
+
+        # --parsable prints "job_id" or "job_id;cluster"
+        return result.stdout.strip().split(';')[0]
+
+    def wait_all(self):
+        pass
+
+
+class LocalSubmitter:
+    """
+    Stand-in for sbatch running scripts in local processes. Array tasks
+    get SLURM_ARRAY_TASK_ID like on Slurm, at most max_processes scripts
+    run at the same time and dependencies are respected.
+    """
+
+    def __init__(self, max_processes=1):
+        self._slots = threading.Semaphore(max(1, int(max_processes)))
+        self._job_ids = itertools.count(1)
+        self._jobs = {}  # job id -> thread
+
+    def submit(self, script_path, array_size=None, dependencies=None, wait=False):
+        job_id = str(next(self._job_ids))
+        dependency_threads = [self._jobs[x] for x in dependencies or []]
+
+        thread = threading.Thread(target=self._run_job,
+                                  args=(job_id, script_path, array_size, dependency_threads),
+                                  daemon=True)
+        self._jobs[job_id] = thread
+        thread.start()
+
+        if wait:
+            thread.join()
+
+        return job_id
+
+    def wait_all(self):
+        for thread in self._jobs.values():
+            thread.join()
+
+    def _run_job(self, job_id, script_path, array_size, dependency_threads):
+        for thread in dependency_threads:
+            thread.join()
+
+        task_ids = [None] if array_size is None else list(range(array_size))
+        task_threads = [threading.Thread(target=self._run_task, args=(job_id, script_path, x))
+                        for x in task_ids]
+
+        for thread in task_threads:
+            thread.start()
+        for thread in task_threads:
+            thread.join()
+
+    def _run_task(self, job_id, script_path, task_id):
+        env = dict(os.environ, SLURM_JOB_ID=job_id)
+        if task_id is not None:
+            env['SLURM_ARRAY_TASK_ID'] = str(task_id)
+
+        with self._slots:
+            logging.info(f'Running job {job_id} task {task_id}: {script_path}')
+            result = subprocess.run(['bash', script_path], env=env)
+
+        if result.returncode != 0:
+            logging.error(f'Job {job_id} task {task_id} ended with return code {result.returncode}')
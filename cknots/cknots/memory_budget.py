@@ -0,0 +1,126 @@
+"""
+Memory estimates for minor finders and admission control of
+concurrently running CCDs.
+"""
+
+import logging
+import os
+
+from cknots.cknots.observations_file import load_observations, save_observations
+
+GB = 1024 * 1024 * 1024
+MB = 1024 * 1024
+
+BASE_MEMORY = 64 * MB
+
+# Used until enough CCDs finished to learn from observed peak RSS
+DEFAULT_BYTES_PER_ELEMENT = {
+    'linear': 1 * MB,
+    'full': 16 * MB,
+    'decomposition': 64 * 1024
+}
+
+MIN_OBSERVATIONS = 5
+MAX_OBSERVATIONS = 1000
+OBSERVED_QUANTILE = 0.9
+SAFETY_FACTOR = 1.25
+
+
+def available_memory():
+    """
+    Returns memory (bytes) available to this machine or container.
+    """
+    memory = os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+
+    for cgroup_limit_path in ('/sys/fs/cgroup/memory.max',
+                              '/sys/fs/cgroup/memory/memory.limit_in_bytes'):
+        try:
+            with open(cgroup_limit_path) as f:
+                cgroup_limit = f.read().strip()
+        except OSError:
+            continue
+
+        if cgroup_limit.isdigit():
+            memory = min(memory, int(cgroup_limit))
+
+    return memory
+
+
+class MemoryEstimator:
+
+    def __init__(self, model_path=None):
+        """
+        Estimates peak memory of a minor finder from graph size (number of
+        nodes and edges of .mp file). Bytes per graph element are learned from
+        peak RSS of finished CCDs and saved to model_path, if given.
+
+        :param model_path: path to .json file with observations
+        """
+        self.model_path = model_path
+        self.observations = {algorithm_type: [] for algorithm_type in DEFAULT_BYTES_PER_ELEMENT}
+        self._bytes_per_element = {}  # cache, cleared by each observation
+
+        # observations of this run not saved yet, see save()
+        self._new_observations = {algorithm_type: [] for algorithm_type in self.observations}
+
+        if model_path is not None:
+            self.observations.update(load_observations(model_path))
+
+    def bytes_per_element(self, algorithm_type):
+        if algorithm_type not in self._bytes_per_element:
+            self._bytes_per_element[algorithm_type] = self._learn_bytes_per_element(algorithm_type)
+        return self._bytes_per_element[algorithm_type]
+
+    def _learn_bytes_per_element(self, algorithm_type):
+        ratios = sorted(
+            max(peak_rss - BASE_MEMORY, 0) / max(elements, 1)
+            for elements, peak_rss in self.observations[algorithm_type]
+        )
+
+        if len(ratios) < MIN_OBSERVATIONS:
+            return DEFAULT_BYTES_PER_ELEMENT[algorithm_type]
+
+        return ratios[int(OBSERVED_QUANTILE * (len(ratios) - 1))] * SAFETY_FACTOR
+
+    def estimate(self, algorithm_type, nodes, edges):
+        return int(BASE_MEMORY + self.bytes_per_element(algorithm_type) * (nodes + edges))
+
+    def observe(self, algorithm_type, nodes, edges, peak_rss):
+        for observations in (self.observations[algorithm_type], self._new_observations[algorithm_type]):
+            observations.append((nodes + edges, peak_rss))
+            del observations[:-MAX_OBSERVATIONS]
+        self._bytes_per_element.pop(algorithm_type, None)
+
+    def save(self):
+        """
+        Adds observations of this run to model_path, keeping ones saved there
+        by other runs in the meantime, see observations_file.save_observations().
+        """
+        if self.model_path is None:
+            return
+
+        self.observations.update(save_observations(self.model_path, self._new_observations, MAX_OBSERVATIONS))
+        self._new_observations = {algorithm_type: [] for algorithm_type in self.observations}
+        self._bytes_per_element = {}
+
+
+class MemoryBudget:
+
+    def __init__(self, total):
+        """
+        Memory shared by all concurrently running minor finders.
+
+        :param total: budget in bytes
+        """
+        self.total = total
+        self.reserved = 0
+
+    def fits(self, amount):
+        return self.reserved + amount <= self.total
+
+    def reserve(self, amount):
+        self.reserved += amount
+        logging.debug(f'Reserved {amount / GB:.2f}GB, {self.reserved / GB:.2f}GB of {self.total / GB:.2f}GB in use')
+
+    def release(self, amount):
+        self.reserved = max(self.reserved - amount, 0)
@@ -0,0 +1,191 @@
+"""
+Enforcing memory limits of child processes on their resident memory,
+sampled from /proc, instead of RLIMIT_AS. Allocators reserve much more
+address space than they use, so RLIMIT_AS kills finders long before
+they really run out of memory.
+"""
+
+import logging
+import os
+import signal
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+CLOCK_TICKS = os.sysconf('SC_CLK_TCK')
+GB = 1024 * 1024 * 1024
+
+
+def read_processes():
+    """
+    :return: dict pid -> (parent pid, RSS in bytes, CPU time in clock ticks) of all processes
+    """
+    processes = {}
+
+    for name in os.listdir('/proc'):
+        if not name.isdigit():
+            continue
+        try:
+            with open(f'/proc/{name}/stat', 'rb') as f:
+                stat = f.read()
+        except OSError:
+            continue  # process has just finished
+
+        # name of the command may contain spaces and parentheses, fields after it do not
+        fields = stat[stat.rfind(b')') + 2:].split()
+        processes[int(name)] = (int(fields[1]), int(fields[21]) * PAGE_SIZE, int(fields[11]) + int(fields[12]))
+
+    return processes
+
+
+def process_tree(pid, children):
+    """
+    :return: pids of process pid and all its descendants
+    """
+    tree = []
+    stack = [pid]
+    while stack:
+        current = stack.pop()
+        tree.append(current)
+        stack.extend(children.get(current, []))
+    return tree
+
+
+@dataclass
+class WatchedProcess:
+    process: object  # subprocess.Popen
+    limit: int = None  # bytes, None if only the global budget applies
+    start_time: float = 0.0
+    peak_rss: int = 0  # bytes, including descendants
+    killed_by: str = None  # 'memory_limit' or 'memory_budget'
+    killed_at: float = None  # seconds after start
+
+
+class MemoryWatchdog:
+
+    def __init__(self, memory_budget=None, interval=1.0):
+        """
+        Samples RSS of watched processes (with their descendants) every interval
+        seconds. A process over its own limit is killed. If all of them together
+        use more than memory_budget, the largest ones are killed until the rest fits.
+
+        Processes are killed with their process group, so they should be
+        started in their own session.
+
+        :param memory_budget: memory (bytes) of all watched processes, no limit if None
+        :param interval: time (seconds) between samples
+        """
+        self.memory_budget = memory_budget
+        self.interval = interval
+
+        # RSS (bytes) and CPU cores used by all watched processes at the last sample
+        self.rss = 0
+        self.cpu_cores = 0.0
+
+        self._watched = {}  # pid -> WatchedProcess
+        self._cpu_ticks = {}  # pid -> CPU time at the last sample
+        self._sample_time = None
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stopped = threading.Event()
+
+    def watch(self, process, limit=None):
+        """
+        :param process: subprocess.Popen
+        :param limit: memory (bytes) of this process, no limit if None
+        """
+        with self._lock:
+            self._watched[process.pid] = WatchedProcess(process, limit, time.monotonic())
+
+            if self._thread is None:
+                self._stopped.clear()
+                self._thread = threading.Thread(target=self._run, name='memory-watchdog', daemon=True)
+                self._thread.start()
+
+    def unwatch(self, process):
+        """
+        :return: WatchedProcess with peak RSS and the reason of kill, if any
+        """
+        with self._lock:
+            return self._watched.pop(process.pid)
+
+    def stop(self):
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is not None:
+            self._stopped.set()
+            thread.join()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.check()
+            except Exception as other_exception:
+                logging.error(f'Memory watchdog failed to check processes: {other_exception}')
+
+    def check(self):
+        with self._lock:
+            watched = list(self._watched.values())
+
+        if len(watched) == 0:
+            self.rss = 0
+            self.cpu_cores = 0.0
+            return
+
+        sample_time = time.monotonic()
+        processes = read_processes()
+        children = defaultdict(list)
+        for pid, (parent_pid, _, _) in processes.items():
+            children[parent_pid].append(pid)
+
+        usage = []
+        cpu_ticks = {}
+        for watched_process in watched:
+            tree = [x for x in process_tree(watched_process.process.pid, children) if x in processes]
+            rss = sum(processes[x][1] for x in tree)
+            cpu_ticks.update((x, processes[x][2]) for x in tree)
+
+            watched_process.peak_rss = max(watched_process.peak_rss, rss)
+
+            if watched_process.limit is not None and rss > watched_process.limit:
+                self._kill(watched_process, 'memory_limit', rss, watched_process.limit)
+            else:
+                usage.append((rss, watched_process))
+
+        # processes which finished since the last sample are not counted
+        if self._sample_time is not None and sample_time > self._sample_time:
+            used_ticks = sum(ticks - self._cpu_ticks[pid] for pid, ticks in cpu_ticks.items() if pid in self._cpu_ticks)
+            self.cpu_cores = used_ticks / CLOCK_TICKS / (sample_time - self._sample_time)
+        self._cpu_ticks = cpu_ticks
+        self._sample_time = sample_time
+        self.rss = sum(rss for rss, _ in usage)
+
+        if self.memory_budget is None:
+            return
+
+        total_rss = sum(rss for rss, _ in usage)
+        for rss, watched_process in sorted(usage, key=lambda x: x[0], reverse=True):
+            if total_rss <= self.memory_budget:
+                break
+            self._kill(watched_process, 'memory_budget', rss, self.memory_budget)
+            total_rss -= rss
+
+    def _kill(self, watched_process, reason, rss, limit):
+        with self._lock:
+            # finished in the meantime
+            if self._watched.get(watched_process.process.pid) is not watched_process:
+                return
+
+            watched_process.killed_by = reason
+            watched_process.killed_at = time.monotonic() - watched_process.start_time
+
+            logging.warning(f'Killing {" ".join(watched_process.process.args[:3])} '
+                            + f'using {rss / GB:.2f}GB, {reason.replace("_", " ")} is {limit / GB:.2f}GB')
+
+            try:
+                os.killpg(watched_process.process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
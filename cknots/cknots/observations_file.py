@@ -0,0 +1,50 @@
+"""
+Observations of runtime and memory models kept in .json files shared by
+runs, e.g. array tasks of one packed run saving to the same file at once.
+"""
+
+import fcntl
+import json
+import os
+
+
+def load_observations(model_path):
+    """
+    :param model_path: path to .json file with observations
+    :return: dict algorithm type -> list of observations, empty if there is no file
+    """
+    if not os.path.exists(model_path):
+        return {}
+
+    with open(model_path) as f:
+        return json.load(f)
+
+
+def save_observations(model_path, new_observations, max_observations):
+    """
+    Adds observations made by this process to the ones in the file, under an
+    exclusive lock of <model_path>.lock, so that observations saved by other
+    runs in the meantime are not lost. The file is replaced atomically.
+
+    :param model_path: path to .json file with observations
+    :param new_observations: dict algorithm type -> list of observations made since the last save
+    :param max_observations: maximal number of observations of one algorithm type, the oldest are dropped
+    :return: dict algorithm type -> list of all observations in the file
+    """
+    with open(f'{model_path}.lock', 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            observations = load_observations(model_path)
+
+            for algorithm_type, new in new_observations.items():
+                merged = observations.get(algorithm_type, []) + [list(x) for x in new]
+                observations[algorithm_type] = merged[-max_observations:]
+
+            tmp_path = f'{model_path}.{os.getpid()}.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(observations, f)
+            os.replace(tmp_path, model_path)
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    return observations
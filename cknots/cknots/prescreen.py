@@ -0,0 +1,101 @@
+"""
+Cheap necessary conditions for a K6 minor, used to skip minor finders
+on CCD graphs which certainly do not contain one.
+"""
+
+import networkx as nx
+from networkx.algorithms.approximation import treewidth_min_degree
+
+# K6 has 6 vertices, 15 edges and treewidth 5
+K6_NODES = 6
+K6_EDGES = 15
+K6_TREEWIDTH = 5
+
+# larger graphs are not pre-screened block by block, the cost would outweigh what it saves
+PRESCREEN_MAX_EDGES = 20000
+
+
+def reduce_graph(graph):
+    """
+    Removes vertices of degree at most 1 and suppresses vertices of degree 2
+    (replaces them with an edge between their neighbours) until there are none.
+    The result has a K6 minor if and only if the graph has one, as such
+    vertices can always be dropped from or contracted into a branch set.
+
+    :param graph: undirected graph, not modified
+    :return: reduced simple graph
+    """
+    reduced = nx.Graph(graph)
+    reduced.remove_edges_from(list(nx.selfloop_edges(reduced)))
+
+    to_check = [v for v in reduced if reduced.degree(v) <= 2]
+
+    while len(to_check) > 0:
+        v = to_check.pop()
+        if v not in reduced or reduced.degree(v) > 2:
+            continue
+
+        neighbors = list(reduced[v])
+        reduced.remove_node(v)
+        if len(neighbors) == 2:
+            reduced.add_edge(*neighbors)
+
+        to_check += neighbors
+
+    return reduced
+
+
+def candidate_blocks(graph):
+    """
+    K6 is 2-connected, so a K6 minor lies within one biconnected block.
+    Yields reduced blocks which are large enough to contain K6 minor.
+
+    :param graph: undirected graph
+    :return: generator of graphs
+    """
+    reduced = reduce_graph(graph)
+
+    for block_nodes in nx.biconnected_components(reduced):
+        if len(block_nodes) < K6_NODES:
+            continue
+
+        block = reduce_graph(reduced.subgraph(block_nodes))
+
+        if len(block) < len(block_nodes):
+            # degrees within the block are lower, it may split further
+            yield from candidate_blocks(block)
+        elif block.number_of_edges() >= K6_EDGES:
+            yield block
+
+
+def k6_minor_excluded(graph, treewidth=None, max_edges=PRESCREEN_MAX_EDGES):
+    """
+    Checks necessary conditions for a K6 minor, the cheap ones first: the graph has
+    at least 6 vertices and 15 edges, and treewidth at least 5 (treewidth of a minor is
+    not larger than of the graph). Then, in graphs with at most max_edges edges:
+    after reduction (see reduce_graph()) some biconnected block has at least 6
+    vertices, 15 edges and treewidth (its upper bound from min degree heuristic)
+    at least 5.
+
+    :param graph: graph of CCD, see cknots.analysis.ccd.parse_graph_from_mp()
+    :param treewidth: upper bound of treewidth of the graph, if already known
+    :param max_edges: graphs with more edges are not checked block by block
+    :return: reason why graph cannot contain K6 minor, None if it can
+    """
+    undirected = graph.to_undirected()
+
+    if undirected.number_of_nodes() < K6_NODES or undirected.number_of_edges() < K6_EDGES:
+        return 'size'
+    if treewidth is not None and treewidth < K6_TREEWIDTH:
+        return 'treewidth'
+    if undirected.number_of_edges() > max_edges:
+        return None
+
+    reason = 'size'
+
+    for block in candidate_blocks(undirected):
+        if treewidth_min_degree(block)[0] >= K6_TREEWIDTH:
+            return None
+        reason = 'treewidth'
+
+    return reason
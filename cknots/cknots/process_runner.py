@@ -0,0 +1,101 @@
+"""
+Running external programs with resource usage of the child process.
+"""
+
+import os
+import signal
+import subprocess
+import threading
+import time
+from dataclasses import dataclass
+
+
+@dataclass
+class ProcessResult:
+    return_code: int = None
+    timed_out: bool = False
+    peak_rss: int = 0  # bytes
+    wall_time: float = 0.0  # seconds
+    user_time: float = 0.0  # CPU seconds in user mode
+    sys_time: float = 0.0  # CPU seconds in kernel mode
+    killed_by: str = None  # reason of kill by MemoryWatchdog
+    killed_at: float = None  # seconds after start
+
+
+def kill(process):
+    """
+    Kills process started by run_process(). Unlike Popen.kill(), it never reaps the
+    process, which is left to run_process() (and its wait4()).
+    """
+    try:
+        os.kill(process.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+def run_process(input_cmd, timeout=None, stdout=None, preexec_fn=None, registry=None,
+                memory_watchdog=None, memory_limit=None):
+    """
+    Runs a command and waits for it with wait4(), so that resource usage
+    (CPU time, peak RSS) of this very child is known even if other children run at the same time.
+
+    :param input_cmd: command to run
+    :param timeout: time (seconds) after which the process is killed
+    :param stdout: file object to redirect standard output to
+    :param preexec_fn: function called in the child before exec
+    :param registry: GracefulStop (or other object with add() and discard()) which
+        may kill the process; the process gets its own session then
+    :param memory_watchdog: MemoryWatchdog supervising RSS of the process (and its
+        descendants); the process gets its own session then
+    :param memory_limit: memory (bytes) of the process enforced by memory_watchdog
+    :return: ProcessResult
+    """
+    start_time = time.monotonic()
+    process = subprocess.Popen(input_cmd, stdout=stdout, preexec_fn=preexec_fn,
+                               start_new_session=registry is not None or memory_watchdog is not None)
+    result = ProcessResult()
+
+    if registry is not None:
+        registry.add(process)
+    if memory_watchdog is not None:
+        memory_watchdog.watch(process, memory_limit)
+
+    def kill_on_timeout():
+        result.timed_out = True
+        kill(process)
+
+    timer = None
+    if timeout is not None:
+        timer = threading.Timer(timeout, kill_on_timeout)
+        timer.daemon = True
+        timer.start()
+
+    try:
+        # the child is left a zombie, so its pid (and process group) cannot be reused
+        # until nothing can send signals to it any more
+        os.waitid(os.P_PID, process.pid, os.WEXITED | os.WNOWAIT)
+    finally:
+        if timer is not None:
+            timer.cancel()
+            timer.join()
+        if registry is not None:
+            registry.discard(process)
+        watched = memory_watchdog.unwatch(process) if memory_watchdog is not None else None
+
+    _, status, rusage = os.wait4(process.pid, 0)
+
+    # wait4() reaped the child, let Popen know it is gone
+    process.returncode = os.waitstatus_to_exitcode(status)
+
+    result.return_code = process.returncode
+    result.wall_time = time.monotonic() - start_time
+    result.user_time = rusage.ru_utime
+    result.sys_time = rusage.ru_stime
+    result.peak_rss = rusage.ru_maxrss * 1024  # ru_maxrss is in kilobytes on Linux
+
+    if watched is not None:
+        result.peak_rss = max(result.peak_rss, watched.peak_rss)
+        result.killed_by = watched.killed_by
+        result.killed_at = watched.killed_at
+
+    return result
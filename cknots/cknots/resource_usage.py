@@ -0,0 +1,106 @@
+"""
+Resource usage of external programs run by the scheduler, collected
+into a per-run table with a summary of totals and percentiles.
+"""
+
+import logging
+import os
+import threading
+
+import pandas as pd
+
+USAGE_FIELDS = ['wall_time', 'user_time', 'sys_time', 'peak_rss']
+
+# set if MemoryWatchdog killed the process
+KILL_FIELDS = ['killed_by', 'killed_at']
+
+PERCENTILES = [0.5, 0.9, 0.99]
+
+
+def usage_fields(stage, process_result):
+    """
+    :param stage: name of the stage, used as prefix of the fields
+    :param process_result: ProcessResult of the stage
+    :return: dict e.g. {'finder_wall_time': ..., 'finder_peak_rss': ...}
+    """
+    return {f'{stage}_{name}': getattr(process_result, name) for name in USAGE_FIELDS + KILL_FIELDS}
+
+
+class ResourceUsage:
+
+    def __init__(self):
+        """
+        Table of invocations of splitter, path decomposition and minor
+        finders in this run. Rows may be added from many threads.
+        """
+        self.rows = []
+        self._lock = threading.Lock()
+
+    def add(self, stage, chromosome, input_filename, process_result, return_code, nodes=None, edges=None):
+        row = {
+            'stage': stage,
+            'chromosome': chromosome,
+            'input_filename': input_filename,
+            'nodes': nodes,
+            'edges': edges,
+            'return_code': return_code,
+            'cpu_time': process_result.user_time + process_result.sys_time
+        }
+        row.update({name: getattr(process_result, name) for name in USAGE_FIELDS + KILL_FIELDS})
+
+        with self._lock:
+            self.rows.append(row)
+
+    def summary(self):
+        """
+        :return: DataFrame with number of invocations, total times (hours) and
+            percentiles of wall time, CPU time and peak RSS of every stage
+        """
+        usage = pd.DataFrame(self.rows)
+        summary = []
+
+        for stage, stage_usage in usage.groupby('stage', sort=False):
+            stage_summary = {
+                'stage': stage,
+                'invocations': len(stage_usage),
+                'failed': int((stage_usage['return_code'] != 0).sum()),
+                'total_wall_hours': stage_usage['wall_time'].sum() / 3600,
+                'total_cpu_hours': stage_usage['cpu_time'].sum() / 3600
+            }
+            for name in ['wall_time', 'cpu_time', 'peak_rss']:
+                for percentile in PERCENTILES:
+                    stage_summary[f'{name}_p{int(percentile * 100)}'] = stage_usage[name].quantile(percentile)
+                stage_summary[f'{name}_max'] = stage_usage[name].max()
+
+            summary.append(stage_summary)
+
+        return pd.DataFrame(summary)
+
+    def load(self, usage_path):
+        """
+        Adds rows from resource_usage.csv written by another run.
+        """
+        usage = pd.read_csv(usage_path)
+        with self._lock:
+            self.rows += usage.to_dict('records')
+
+    def write(self, out_dir, suffix=''):
+        """
+        Writes resource_usage<suffix>.csv (one row per invocation) and
+        resource_summary<suffix>.csv to out_dir.
+
+        :return: None
+        """
+        if len(self.rows) == 0:
+            return
+
+        pd.DataFrame(self.rows).to_csv(os.path.join(out_dir, f'resource_usage{suffix}.csv'), index=False)
+
+        summary = self.summary()
+        summary.to_csv(os.path.join(out_dir, f'resource_summary{suffix}.csv'), index=False)
+
+        for _, stage_summary in summary.iterrows():
+            logging.info(f'{stage_summary["stage"]}: {stage_summary["invocations"]} runs, '
+                         + f'{stage_summary["total_wall_hours"]:.2f}h wall time, '
+                         + f'{stage_summary["total_cpu_hours"]:.2f}h CPU time, '
+                         + f'max peak RSS {stage_summary["peak_rss_max"] / 1024 ** 3:.2f}GB')
@@ -0,0 +1,139 @@
+"""
+Content-addressed cache of minor finder results shared between runs.
+"""
+
+import hashlib
+import logging
+import os
+import shutil
+import uuid
+
+GB = 1024 * 1024 * 1024
+
+_file_digests = {}
+
+
+def file_digest(path):
+    """
+    Returns sha256 of file contents, or empty string if file does not exist.
+    Digests are remembered for the lifetime of the process.
+    """
+    if path not in _file_digests:
+        digest = hashlib.sha256()
+        try:
+            with open(path, 'rb') as f:
+                for block in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(block)
+            _file_digests[path] = digest.hexdigest()
+        except FileNotFoundError:
+            _file_digests[path] = ''
+    return _file_digests[path]
+
+
+class ResultCache:
+
+    def __init__(self, cache_dir, max_size=50 * GB):
+        """
+        Cache of .raw_minors files keyed by the contents of .mp file, minor finder
+        (name and binary) and its arguments. Least recently used entries are
+        removed when total size of the cache exceeds max_size.
+
+        :param cache_dir: directory with cache entries, may be shared between runs
+        :param max_size: maximal size of the cache in bytes
+        """
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self._size = None  # total size of entries, known after first eviction
+
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def key(mp_path, algorithm_paths, arguments):
+        """
+        :param mp_path: path to .mp file
+        :param algorithm_paths: paths to binaries run on .mp file, in order
+        :param arguments: arguments of minor finder
+        :return: cache key
+        """
+        digest = hashlib.sha256()
+
+        with open(mp_path, 'rb') as f:
+            digest.update(f.read())
+
+        for algorithm_path in algorithm_paths:
+            digest.update(b'\0' + os.path.split(algorithm_path)[-1].encode())
+            digest.update(b'\0' + file_digest(algorithm_path).encode())
+
+        digest.update(b'\0' + ' '.join(arguments or []).encode())
+
+        return digest.hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f'{key}.raw_minors')
+
+    def fetch(self, key, destination):
+        """
+        Puts cached result at destination (as a hardlink, or a copy if
+        hardlinking is not possible).
+
+        :return: True if result was in the cache
+        """
+        entry_path = self._entry_path(key)
+        tmp_path = f'{destination}.{uuid.uuid4().hex}.tmp'
+
+        try:
+            try:
+                os.link(entry_path, tmp_path)
+            except FileNotFoundError:
+                return False
+            except OSError:
+                shutil.copyfile(entry_path, tmp_path)
+
+            os.replace(tmp_path, destination)
+            os.utime(entry_path)  # mark as recently used
+        except FileNotFoundError:
+            # entry evicted by another run in the meantime
+            return False
+
+        return True
+
+    def store(self, key, source):
+        entry_path = self._entry_path(key)
+        os.makedirs(os.path.split(entry_path)[0], exist_ok=True)
+
+        tmp_path = f'{entry_path}.{uuid.uuid4().hex}.tmp'
+        shutil.copyfile(source, tmp_path)
+        os.replace(tmp_path, entry_path)
+
+        if self._size is None:
+            self.evict()
+        else:
+            self._size += os.stat(entry_path).st_size
+            # other runs sharing the cache are only noticed when cache is scanned
+            if self._size > self.max_size:
+                self.evict()
+
+    def evict(self):
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for file in files:
+                if file.endswith('.raw_minors'):
+                    try:
+                        stat = os.stat(os.path.join(root, file))
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, os.path.join(root, file)))
+
+        total_size = sum(x[1] for x in entries)
+
+        for _, size, path in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total_size -= size
+            logging.info(f'Removed {path} from result cache')
+
+        self._size = total_size
@@ -0,0 +1,67 @@
+"""
+Copying results computed in a scratch directory (e.g. /dev/shm or node-local
+disk) back to the results directory in batches.
+"""
+
+import logging
+import os
+import shutil
+import time
+
+
+def copy_file(source, destination):
+    """
+    Copies file so that destination is either the old or the complete new file,
+    never a partial one. Replaces destination instead of writing into it,
+    so hardlinks to cache entries are not modified.
+    """
+    tmp_path = f'{destination}.{os.getpid()}.tmp'
+    shutil.copyfile(source, tmp_path)
+    with open(tmp_path, 'rb') as f:
+        os.fsync(f.fileno())
+    os.replace(tmp_path, destination)
+
+
+class ResultStager:
+
+    def __init__(self, batch_size=64, interval=60):
+        """
+        Journal records are appended only after all files of their batch are
+        copied, so after a crash every journaled CCD has its result file in
+        the results directory, and CCDs of a lost batch are computed again.
+
+        :param batch_size: number of records copied back together
+        :param interval: maximal time in seconds between copying back, checked
+            when a record is staged
+        """
+        self.batch_size = batch_size
+        self.interval = interval
+        self.pending = []  # (files as (source, destination), journal, record)
+        self.last_flush = time.monotonic()
+
+    def stage(self, files, journal, record):
+        """
+        :param files: list of (source, destination) paths
+        :param journal: ResultsJournal in the results directory
+        :param record: record appended to journal after files are copied
+        """
+        self.pending.append((files, journal, record))
+
+        if len(self.pending) >= self.batch_size or time.monotonic() - self.last_flush >= self.interval:
+            self.flush()
+
+    def flush(self):
+        if len(self.pending) > 0:
+            files_count = 0
+            for files, _, _ in self.pending:
+                for source, destination in files:
+                    copy_file(source, destination)
+                    files_count += 1
+
+            for _, journal, record in self.pending:
+                journal.append(record)
+
+            logging.info(f'Results of {len(self.pending)} CCDs ({files_count} files) copied from scratch.')
+
+        self.pending = []
+        self.last_flush = time.monotonic()
@@ -0,0 +1,102 @@
+"""
+Append-only journal of per-CCD results. Every record is a single JSON line
+written with one write() call and fsync'd, so a crash can damage at most
+the last line and several writers (threads or processes) can share one journal.
+"""
+
+import fcntl
+import json
+import logging
+import os
+import threading
+
+MAX_RECORD_SIZE = 64 * 1024
+
+
+class ResultsJournal:
+
+    def __init__(self, path):
+        """
+        :param path: path to .jsonl journal file
+        """
+        self.path = path
+        self._fd = None
+        self._lock = threading.Lock()
+
+    def append(self, record):
+        data = (json.dumps(record, sort_keys=True) + '\n').encode()
+
+        with self._lock:
+            if self._fd is None:
+                self._open()
+
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                os.write(self._fd, data)
+                os.fsync(self._fd)
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def load(self):
+        """
+        Reads the journal. Damaged lines (e.g. the last one, if writing it was
+        interrupted) are skipped.
+
+        :return: dict input filename -> last record for this file
+        """
+        records = {}
+
+        if not os.path.exists(self.path):
+            return records
+
+        with open(self.path) as f:
+            for line_number, line in enumerate(f, start=1):
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    logging.warning(f'Skipping damaged line {line_number} of {self.path}')
+                    continue
+
+                records[record['input_filename']] = record
+
+        return records
+
+    def close(self):
+        with self._lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+
+    def _open(self):
+        self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+        # Cut off a line left incomplete by a crash, so that it does not
+        # glue together with the next record
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            size = os.fstat(self._fd).st_size
+            with open(self.path, 'rb') as f:
+                f.seek(max(size - MAX_RECORD_SIZE, 0))
+                tail = f.read()
+            if len(tail) > 0 and not tail.endswith(b'\n'):
+                os.truncate(self.path, size - len(tail) + tail.rfind(b'\n') + 1)
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+
+def write_results_json(records, results_path):
+    """
+    Atomically writes results.json with records ordered by input filename.
+
+    :param records: dict input filename -> record
+    :param results_path: path to results.json
+    :return: None
+    """
+    ordered_results = [records[x] for x in sorted(records)]
+
+    tmp_path = f'{results_path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(ordered_results, f, indent=4, sort_keys=True)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, results_path)
@@ -0,0 +1,101 @@
+"""
+Computing again CCDs which ran out of time or memory, with higher limits.
+"""
+
+import dataclasses
+import logging
+import signal
+
+TIMEOUT_RETURN_CODE = 124
+
+# growth of timeout of CCDs retried after a timeout
+TIMEOUT_FACTOR = 2
+
+# the kernel OOM killer sends SIGKILL; SIGKILLs sent by the scheduler itself are told apart,
+# see failure()
+MEMORY_RETURN_CODES = (-signal.SIGKILL,)
+
+# stages of CCD killed by MemoryWatchdog have '<stage>_killed_by' set in CCD results
+KILLED_BY_FIELDS = ('finder_killed_by', 'decomposition_killed_by')
+
+
+def failure(ccd_results):
+    """
+    A CCD ran out of memory if MemoryWatchdog killed one of its stages, or if it
+    was killed with SIGKILL the scheduler did not send: timed out processes are
+    killed too, but get TIMEOUT_RETURN_CODE, and processes killed after SIGTERM or
+    SIGINT of the run are not retried at all.
+
+    :return: 'timeout', 'memory' or None if CCD did not run out of resources
+    """
+    if ccd_results['return_code'] == TIMEOUT_RETURN_CODE:
+        return 'timeout'
+    if any(ccd_results.get(x) is not None for x in KILLED_BY_FIELDS):
+        return 'memory'
+    if ccd_results['return_code'] in MEMORY_RETURN_CODES:
+        return 'memory'
+    return None
+
+
+def attempt_record(task, ccd_results):
+    """
+    Summary of a single attempt, kept in 'attempts' of CCD results.
+    """
+    return {
+        'attempt': len(task.attempts) + 1,
+        'return_code': ccd_results['return_code'],
+        'failure': failure(ccd_results),
+        'runtime': ccd_results['runtime'],
+        'peak_rss': ccd_results['peak_rss'],
+        'timeout_factor': task.timeout_factor,
+        'memory_factor': task.memory_factor,
+        'reduce_graph': task.reduce_graph
+    }
+
+
+class RetryPolicy:
+
+    def __init__(self, max_attempts=2, timeout_factor=TIMEOUT_FACTOR, memory_factor=2, reduce_linear=False):
+        """
+        Every retry multiplies timeout by timeout_factor if the previous attempt timed out,
+        and memory limit by memory_factor if it ran out of memory. Memory reserved
+        in the memory budget grows by memory_factor only in the latter case, so that
+        fewer CCDs run next to the retried one; CCD retried after a timeout reserves
+        as much as it used in the previous attempt.
+
+        :param max_attempts: maximal number of attempts of one CCD, including the first one
+        :param timeout_factor: growth of timeout
+        :param memory_factor: growth of memory limit and memory reserved
+        :param reduce_linear: retry CCDs of the linear minor finder with graph reduction
+        """
+        self.max_attempts = max(1, int(max_attempts))
+        self.timeout_factor = timeout_factor
+        self.memory_factor = memory_factor
+        self.reduce_linear = reduce_linear
+
+    def retry(self, task, ccd_results):
+        """
+        :param task: CCDTask which has just been computed
+        :param ccd_results: its results with 'attempts' of all attempts so far
+        :return: CCDTask of the next attempt, or None
+        """
+        reason = failure(ccd_results)
+        attempts = ccd_results['attempts']
+
+        if reason is None or len(attempts) >= self.max_attempts:
+            return None
+
+        retried_task = dataclasses.replace(
+            task,
+            results=None,
+            memory_estimate=0,
+            attempts=attempts,
+            timeout_factor=task.timeout_factor * (self.timeout_factor if reason == 'timeout' else 1),
+            memory_factor=task.memory_factor * (self.memory_factor if reason == 'memory' else 1),
+            reduce_graph=task.reduce_graph or (self.reduce_linear and task.algorithm_type == 'linear')
+        )
+
+        logging.info(f'{task.input_filename} ran out of {"time" if reason == "timeout" else "memory"}, '
+                     + f'queued for attempt {len(attempts) + 1} of {self.max_attempts}')
+
+        return retried_task
@@ -9,35 +9,66 @@ Options:
 from docopt import docopt
 
 from cknots.cknots.computation_scheduler import ComputationScheduler
+from cknots.cknots.escalation import DEFAULT_MIN_DENSITY
+
+LINEAR_ARGUMENTS = ['-c']
+FULL_ARGUMENTS = ['-n', '6', '-N', '6', '-d', '5', '-e', '0']
 
 
 def run(in_bedpe, in_ccd, out_dir, chromosome,
-        ccd_timeout=6 * 60 * 60,  # 6 hours
+        config=None,
         minor_finding_algorithm='find-k6-linear',
         splitting_algorithm='splitter',
-        compute_chromosome=False
+        compute_chromosome=False,
+        tiered=False,
+        escalation_density=DEFAULT_MIN_DENSITY,
+        escalation_regions=None,
+        ccd_list=None,
+        split_only=False,
+        merge=False,
+        plan=False,
+        prescreen=True,
+        reduce_graphs=False,
+        retry_reduce=False,
+        inter_ccd_window=None
         ):
+    """
+    :param config: RuntimeConfig of the run, defaults to RuntimeConfig()
+    :return: exit code of the run
+    """
 
     arguments = None
 
     if minor_finding_algorithm == 'find-k6-linear':
-        arguments = ['-c']
+        arguments = LINEAR_ARGUMENTS
     if minor_finding_algorithm == 'find-knots':
-        arguments = ['-n', '6', '-N', '6', '-d', '5', '-e', '0']
+        arguments = FULL_ARGUMENTS
 
     scheduler = ComputationScheduler(
         in_bedpe=in_bedpe,
         in_ccd=in_ccd,
         out_dir=out_dir,
         chromosome=chromosome,
-        ccd_timeout=ccd_timeout,
+        config=config,
         minor_finding_algorithm=minor_finding_algorithm,
         splitting_algorithm=splitting_algorithm,
         arguments=arguments,
-        compute_chromosome=compute_chromosome
+        compute_chromosome=compute_chromosome,
+        tiered=tiered,
+        full_arguments=FULL_ARGUMENTS,
+        escalation_density=escalation_density,
+        escalation_regions=escalation_regions,
+        ccd_list=ccd_list,
+        split_only=split_only,
+        merge=merge,
+        plan=plan,
+        prescreen=prescreen,
+        reduce_graphs=reduce_graphs,
+        retry_reduce=retry_reduce,
+        inter_ccd_window=inter_ccd_window
     )
 
-    scheduler.run()
+    return scheduler.run()
 
 
 if __name__ == "__main__":
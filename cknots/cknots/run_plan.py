@@ -0,0 +1,216 @@
+"""
+Dry run: cost of every CCD predicted from its graph before any minor
+finder is started, with settings suggested for the real run.
+"""
+
+import dataclasses
+import json
+import math
+import os
+
+import pandas as pd
+
+GB = 1024 * 1024 * 1024
+
+PLAN_FILENAME = 'plan.json'
+PLAN_TABLE_FILENAME = 'plan.txt'
+PLAN_CONFIG_FILENAME = 'plan_config.json'
+
+# suggested timeouts and memory limit leave this much room over the largest prediction
+TIMEOUT_MARGIN = 2
+MEMORY_MARGIN = 2
+
+TABLE_COLUMNS = ['chromosome', 'input_filename', 'algorithm_type', 'nodes', 'edges', 'treewidth', 'cutwidth',
+                 'runtime', 'memory_gb', 'notes']
+
+
+def _round_up(value, digits=1):
+    return math.ceil(value * 10 ** digits) / 10 ** digits
+
+
+class RunPlan:
+
+    def __init__(self, timeouts, max_memory=None):
+        """
+        Predicted runtime and memory of CCDs to compute. CCDs which would be
+        pre-screened, or which are predicted to exceed timeout or memory limit,
+        are marked.
+
+        In tiered mode CCDs overlapping escalation regions are computed with the full
+        algorithm for sure (escalation 'region'), dense ones only if the linear minor
+        finder finds nothing in them (escalation 'density'), which is not known before
+        the run. The latter are not counted in the predicted runtime.
+
+        :param timeouts: dict algorithm type -> (name of RuntimeConfig setting, timeout in seconds)
+        :param max_memory: memory limit (bytes) of single minor finder, no limit if None
+        """
+        self.timeouts = timeouts
+        self.max_memory = max_memory
+        self.rows = []
+        self.finished = 0  # CCDs with results of previous runs, not in the plan
+
+    def add(self, chromosome, task, memory_estimate, prescreened=None, escalation=None):
+        """
+        :param chromosome: chromosome as in .bed files, e.g. chr1
+        :param task: CCDTask with features and predicted runtime
+        :param memory_estimate: estimated peak memory (bytes)
+        :param prescreened: reason why CCD cannot contain K6 minor, see prescreen.k6_minor_excluded()
+        :param escalation: reason of escalation to the full algorithm in tiered mode
+        """
+        _, timeout = self.timeouts[task.algorithm_type]
+        computed = prescreened is None
+
+        self.rows.append({
+            'chromosome': chromosome,
+            'input_filename': task.input_filename,
+            'algorithm_type': task.algorithm_type,
+            'nodes': task.features['nodes'],
+            'edges': task.features['edges'],
+            'treewidth': task.features['treewidth'],
+            'cutwidth': task.features['cutwidth'],
+            'predicted_runtime': task.predicted_runtime if computed else 0.0,
+            'memory_estimate': memory_estimate if computed else 0,
+            'prescreened': prescreened,
+            'escalation': escalation,
+            'exceeds_timeout': computed and task.predicted_runtime > timeout,
+            'exceeds_memory': computed and self.max_memory is not None and memory_estimate > self.max_memory
+        })
+
+    def _computed_rows(self, with_possible=False):
+        return [x for x in self.rows
+                if x['prescreened'] is None and (with_possible or x['escalation'] != 'density')]
+
+    @staticmethod
+    def _makespan(rows, workers):
+        runtimes = [x['predicted_runtime'] for x in rows]
+        if len(runtimes) == 0:
+            return 0.0
+        return max(sum(runtimes) / workers, max(runtimes))
+
+    def suggest(self, config, cpus, machine_memory):
+        """
+        Workers: as many as CPUs, but not more than help to finish sooner, since
+        the run takes at least as long as its longest CCD. Memory budget: enough for
+        the largest CCDs running together, at least the memory limit. Memory limit and timeouts: MEMORY_MARGIN
+        and TIMEOUT_MARGIN times the largest prediction, timeouts are never lowered.
+
+        :param config: RuntimeConfig of the planned run
+        :param cpus: number of CPUs available to the run
+        :param machine_memory: memory (bytes) available to the run
+        :return: RuntimeConfig with suggested settings
+        """
+        rows = self._computed_rows()
+        all_rows = self._computed_rows(with_possible=True)
+
+        if len(rows) == 0:
+            return dataclasses.replace(config, workers=1)
+
+        runtimes = [x['predicted_runtime'] for x in rows]
+        useful_workers = math.ceil(sum(runtimes) / max(runtimes)) if max(runtimes) > 0 else len(rows)
+        workers = max(1, min(cpus, len(rows), useful_workers))
+
+        memory_estimates = sorted((x['memory_estimate'] for x in all_rows), reverse=True)
+        max_memory = min(memory_estimates[0] * MEMORY_MARGIN, machine_memory)
+        memory_budget = min(max(sum(memory_estimates[:workers]), max_memory), machine_memory)
+
+        timeouts = {}
+        for algorithm_type, (setting, timeout) in self.timeouts.items():
+            predicted = [x['predicted_runtime'] for x in all_rows if x['algorithm_type'] == algorithm_type]
+            if len(predicted) > 0:
+                timeouts[setting] = max(int(timeout), math.ceil(max(predicted) * TIMEOUT_MARGIN))
+
+        return dataclasses.replace(config,
+                                   workers=workers,
+                                   memory_budget=_round_up(memory_budget / GB),
+                                   max_memory=_round_up(max_memory / GB),
+                                   **timeouts)
+
+    def summary(self, workers, suggested):
+        """
+        :param workers: number of workers of the planned run
+        :param suggested: RuntimeConfig returned by suggest()
+        """
+        rows = self._computed_rows()
+        possible_rows = [x for x in self._computed_rows(with_possible=True) if x['escalation'] == 'density']
+
+        return {
+            'ccds': len([x for x in self.rows if x['escalation'] is None]),
+            'finished': self.finished,
+            'prescreened': len([x for x in self.rows if x['prescreened'] is not None]),
+            'escalated': len([x for x in rows if x['escalation'] is not None]),
+            'possibly_escalated': len(possible_rows),
+            'exceeding_timeout': len([x for x in rows if x['exceeds_timeout']]),
+            'exceeding_memory': len([x for x in rows if x['exceeds_memory']]),
+            'predicted_runtime': sum(x['predicted_runtime'] for x in rows),
+            'possibly_escalated_runtime': sum(x['predicted_runtime'] for x in possible_rows),
+            'largest_memory_estimate': max([x['memory_estimate'] for x in rows], default=0),
+            'predicted_time': self._makespan(rows, workers),
+            'suggested_predicted_time': self._makespan(rows, suggested.workers)
+        }
+
+    def table(self, limit=None):
+        """
+        :param limit: number of CCDs with the longest predicted runtime shown, all if None
+        :return: text table of CCDs
+        """
+        if len(self.rows) == 0:
+            return 'No CCDs to compute.'
+
+        rows = sorted(self.rows, key=lambda x: x['predicted_runtime'], reverse=True)[:limit]
+
+        table = pd.DataFrame(rows)
+        table['runtime'] = table['predicted_runtime'].map(lambda x: f'{x:.1f}s')
+        table['memory_gb'] = table['memory_estimate'].map(lambda x: f'{x / GB:.2f}')
+        table['notes'] = [self._notes(x) for x in rows]
+
+        return table[TABLE_COLUMNS].to_string(index=False)
+
+    @staticmethod
+    def _notes(row):
+        notes = []
+        if row['prescreened'] is not None:
+            notes.append(f'prescreened ({row["prescreened"]})')
+        if row['escalation'] == 'region':
+            notes.append('escalated (region)')
+        elif row['escalation'] == 'density':
+            notes.append('escalated if linear finds nothing')
+        if row['exceeds_timeout']:
+            notes.append('exceeds timeout')
+        if row['exceeds_memory']:
+            notes.append('exceeds memory limit')
+        return ', '.join(notes)
+
+    @staticmethod
+    def format_summary(summary, suggested):
+        lines = [
+            f'CCDs to compute: {summary["ccds"]} ({summary["finished"]} finished before, '
+            + f'{summary["prescreened"]} pre-screened)',
+            f'Escalated to the full algorithm: {summary["escalated"]}, '
+            + f'{summary["possibly_escalated"]} more if linear finds nothing '
+            + f'({summary["possibly_escalated_runtime"] / 3600:.2f}h)',
+            f'Predicted to exceed timeout: {summary["exceeding_timeout"]}, '
+            + f'memory limit: {summary["exceeding_memory"]}',
+            f'Predicted runtime: {summary["predicted_runtime"] / 3600:.2f}h of CCDs, '
+            + f'{summary["predicted_time"] / 3600:.2f}h with configured workers, '
+            + f'{summary["suggested_predicted_time"] / 3600:.2f}h with suggested ones',
+            f'Largest memory estimate: {summary["largest_memory_estimate"] / GB:.2f}GB',
+            f'Suggested settings ({PLAN_CONFIG_FILENAME}, use with --config):'
+        ]
+        lines += [f'    {name} = {value}' for name, value in dataclasses.asdict(suggested).items()]
+        return '\n'.join(lines)
+
+    def write(self, out_dir, summary, suggested):
+        """
+        Writes PLAN_FILENAME with all CCDs and the summary, PLAN_TABLE_FILENAME
+        with the same as text and PLAN_CONFIG_FILENAME with suggested settings,
+        which can be loaded with RuntimeConfig.load().
+        """
+        with open(os.path.join(out_dir, PLAN_FILENAME), 'w') as f:
+            json.dump({'summary': summary, 'suggested': dataclasses.asdict(suggested), 'ccds': self.rows},
+                      f, indent=4)
+
+        with open(os.path.join(out_dir, PLAN_TABLE_FILENAME), 'w') as f:
+            f.write(self.format_summary(summary, suggested) + '\n\n' + self.table() + '\n')
+
+        with open(os.path.join(out_dir, PLAN_CONFIG_FILENAME), 'w') as f:
+            json.dump(dataclasses.asdict(suggested), f, indent=4)
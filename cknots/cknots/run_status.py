@@ -0,0 +1,182 @@
+"""
+Machine-readable progress of a run: status.json and status.prom (Prometheus
+textfile collector format), rewritten atomically every few seconds.
+"""
+
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from collections import defaultdict
+
+STATES = ['queued', 'running', 'done', 'failed']
+
+
+def _atomic_write(path, text):
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+class RunStatus:
+
+    def __init__(self, out_dir, run_name='', workers=1, memory_watchdog=None, memory_budget=None, interval=5):
+        """
+        Keeps state of every CCD of the run (including ones finished by previous
+        runs) and writes status<run_name>.json and status<run_name>.prom to out_dir
+        every interval seconds.
+
+        ETA is remaining runtime predicted by the cost model, corrected by the ratio
+        of actual to predicted runtime of CCDs finished in this run, divided by workers.
+
+        :param out_dir: directory with results
+        :param run_name: suffix of status files, see ComputationScheduler.run_name
+        :param workers: number of CCDs processed concurrently
+        :param memory_watchdog: MemoryWatchdog with RSS and CPU usage of running processes
+        :param memory_budget: MemoryBudget of the scheduler
+        :param interval: time (seconds) between writes
+        """
+        self.out_dir = out_dir
+        self.run_name = run_name
+        self.workers = workers
+        self.memory_watchdog = memory_watchdog
+        self.memory_budget = memory_budget
+        self.interval = interval
+
+        self.phase = 'starting'
+        self.start_time = time.time()
+
+        # (chromosome, input_filename, algorithm_type) -> [state, predicted runtime, start time]
+        self._ccds = {}
+        self._done_in_run = 0
+        self._runtime_in_run = 0.0
+        self._predicted_in_run = 0.0
+
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stopped = threading.Event()
+
+    @staticmethod
+    def _key(task):
+        return os.path.split(task.ccd_dir)[-1].replace('chr_', ''), task.input_filename, task.algorithm_type
+
+    def queued(self, tasks):
+        with self._lock:
+            for task in tasks:
+                self._ccds[self._key(task)] = ['queued', task.predicted_runtime, None]
+
+    def started(self, task):
+        with self._lock:
+            self._ccds[self._key(task)] = ['running', task.predicted_runtime, time.monotonic()]
+
+    def finished(self, task, ccd_results, in_run=True):
+        """
+        :param in_run: CCD was computed in this run, not taken from a previous one
+        """
+        state = 'done' if ccd_results['return_code'] == 0 else 'failed'
+
+        with self._lock:
+            self._ccds[self._key(task)] = [state, task.predicted_runtime, None]
+
+            if in_run and ccd_results['runtime'] > 0 and task.predicted_runtime > 0:
+                self._done_in_run += 1
+                self._runtime_in_run += ccd_results['runtime']
+                self._predicted_in_run += task.predicted_runtime
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='run-status', daemon=True)
+        self._thread.start()
+
+    def stop(self, phase):
+        self.phase = phase
+        if self._thread is not None:
+            self._stopped.set()
+            self._thread.join()
+            self._thread = None
+        self.write()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.write()
+            except Exception as other_exception:
+                logging.error(f'Failed to write run status: {other_exception}')
+
+    def status(self):
+        now = time.monotonic()
+        chromosomes = defaultdict(lambda: {x: 0 for x in STATES})
+        remaining_runtime = 0.0
+
+        with self._lock:
+            for (chromosome, _, _), (state, predicted_runtime, start_time) in self._ccds.items():
+                chromosomes[chromosome][state] += 1
+                if state == 'queued':
+                    remaining_runtime += predicted_runtime
+                elif state == 'running':
+                    remaining_runtime += max(predicted_runtime - (now - start_time), 0.0)
+
+            correction = 1.0
+            if self._predicted_in_run > 0:
+                correction = self._runtime_in_run / self._predicted_in_run
+            done_in_run = self._done_in_run
+
+        elapsed = time.time() - self.start_time
+
+        return {
+            'host': socket.gethostname(),
+            'pid': os.getpid(),
+            'out_dir': os.path.abspath(self.out_dir),
+            'run_name': self.run_name,
+            'phase': self.phase,
+            'started': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.start_time)),
+            'updated': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'elapsed': elapsed,
+            'chromosomes': dict(sorted(chromosomes.items())),
+            'total': {x: sum(y[x] for y in chromosomes.values()) for x in STATES},
+            'ccds_per_hour': done_in_run / elapsed * 3600 if elapsed > 0 else 0.0,
+            'cpu_cores': self.memory_watchdog.cpu_cores if self.memory_watchdog is not None else None,
+            'memory_rss': self.memory_watchdog.rss if self.memory_watchdog is not None else None,
+            'memory_reserved': self.memory_budget.reserved if self.memory_budget is not None else None,
+            'memory_budget': self.memory_budget.total if self.memory_budget is not None else None,
+            'eta': remaining_runtime * correction / self.workers
+        }
+
+    def write(self):
+        status = self.status()
+        _atomic_write(os.path.join(self.out_dir, f'status{self.run_name}.json'), json.dumps(status, indent=4))
+        _atomic_write(os.path.join(self.out_dir, f'status{self.run_name}.prom'), self.prometheus(status))
+
+    @staticmethod
+    def prometheus(status):
+        labels = f'out_dir="{status["out_dir"]}",run="{status["run_name"]}",host="{status["host"]}"'
+
+        lines = [
+            '# HELP cknots_ccds Number of CCDs by state.',
+            '# TYPE cknots_ccds gauge'
+        ]
+        for chromosome, states in status['chromosomes'].items():
+            for state, count in states.items():
+                lines.append(f'cknots_ccds{{{labels},chromosome="{chromosome}",state="{state}"}} {count}')
+
+        gauges = [
+            ('ccds_per_hour', 'CCDs computed per hour in this run.', status['ccds_per_hour']),
+            ('cpu_cores', 'CPU cores used by running processes.', status['cpu_cores']),
+            ('memory_rss_bytes', 'Resident memory of running processes.', status['memory_rss']),
+            ('memory_reserved_bytes', 'Memory reserved in the memory budget.', status['memory_reserved']),
+            ('memory_budget_bytes', 'Memory budget.', status['memory_budget']),
+            ('eta_seconds', 'Predicted time to finish.', status['eta']),
+            ('elapsed_seconds', 'Time since start of the run.', status['elapsed']),
+            ('finished', '1 if the run is finished or stopped.', int(status['phase'] in ('finished', 'stopped'))),
+            ('last_update_timestamp_seconds', 'Time of this update.', time.time())
+        ]
+        for name, description, value in gauges:
+            if value is None:
+                continue
+            lines += [f'# HELP cknots_{name} {description}',
+                      f'# TYPE cknots_{name} gauge',
+                      f'cknots_{name}{{{labels}}} {value}']
+
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,91 @@
+"""
+Runtime settings of a single run (timeouts, workers, memory, scratch paths),
+layered from defaults, an optional config file, environment variables and
+command line options. Settings live in the process only, so any number of
+runs can be started at the same time from one installation.
+"""
+
+import dataclasses
+import json
+import logging
+import os
+from dataclasses import dataclass
+
+ENV_PREFIX = 'CKNOTS_'
+
+# environment variable with path to config file, used if no path is given
+CONFIG_ENV = 'CKNOTS_CONFIG'
+
+
+@dataclass
+class RuntimeConfig:
+    ccd_timeout: int = 6 * 60 * 60  # seconds, single CCD with the first minor finder
+    full_timeout: int = 6 * 60 * 60  # seconds, single CCD with the full algorithm in tiered mode
+    pd_timeout: int = 60 * 60  # seconds, single path decomposition
+    workers: int = 1
+    pd_workers: int = 1
+    pd_queue_size: int = None  # defaults to workers
+    max_memory: float = None  # GB, single minor finder
+    memory_budget: float = None  # GB, all running processes, defaults to memory of the machine
+    pd_max_memory: float = None  # GB, single path decomposition
+    scratch_dir: str = None
+    pd_dir: str = None  # defaults to scratch_dir or /dev/shm
+    cache_dir: str = None
+    cache_size: float = 50  # GB
+    cost_model_path: str = None  # defaults to cost_model.json in out_dir
+    grace_period: int = 20  # seconds
+    retries: int = 1
+    status_interval: float = 5  # seconds
+
+    @classmethod
+    def load(cls, cli_values=None, config_path=None, environ=None):
+        """
+        Builds configuration from, in increasing priority: defaults, JSON config file
+        (object with setting names as keys), environment variables CKNOTS_<SETTING>
+        (e.g. CKNOTS_WORKERS) and cli_values.
+
+        :param cli_values: dict setting name -> value given on command line, None values are skipped
+        :param config_path: path to JSON file, defaults to $CKNOTS_CONFIG, no file if None
+        :param environ: environment, defaults to os.environ
+        :return: RuntimeConfig
+        """
+        environ = os.environ if environ is None else environ
+        config_path = config_path or environ.get(CONFIG_ENV)
+
+        config = cls()
+        sources = {x.name: 'default' for x in dataclasses.fields(cls)}
+
+        if config_path is not None:
+            with open(config_path) as f:
+                file_values = json.load(f)
+            config._update(file_values, f'config file {config_path}', sources)
+
+        env_values = {
+            x.name: environ[f'{ENV_PREFIX}{x.name.upper()}']
+            for x in dataclasses.fields(cls) if f'{ENV_PREFIX}{x.name.upper()}' in environ
+        }
+        config._update(env_values, 'environment', sources)
+
+        config._update({k: v for k, v in (cli_values or {}).items() if v is not None}, 'command line', sources)
+
+        for name, source in sources.items():
+            if source != 'default':
+                logging.info(f'Setting {name} = {getattr(config, name)} from {source}')
+
+        return config
+
+    def _update(self, values, source, sources):
+        field_types = {x.name: x.type for x in dataclasses.fields(self)}
+
+        unknown = sorted(set(values) - set(field_types))
+        if len(unknown) > 0:
+            raise ValueError(f'Unknown settings in {source}: {", ".join(unknown)}')
+
+        for name, value in values.items():
+            try:
+                value = None if value is None else field_types[name](value)
+            except ValueError:
+                raise ValueError(f'Invalid value of {name} in {source}: {value}')
+
+            setattr(self, name, value)
+            sources[name] = source
@@ -1 +0,0 @@
-MAX_MEMORY = 1200 * 1024 * 1024 * 1024
@@ -0,0 +1,182 @@
+"""
+Random access to sequences of reference genome in FASTA file,
+through .fai index (the same as samtools faidx writes) and a memory
+mapped file, without parsing other chromosomes.
+"""
+
+import logging
+import mmap
+import os
+from dataclasses import dataclass
+
+
+@dataclass
+class FaiEntry:
+    name: str
+    length: int  # bases
+    offset: int  # byte offset of the first base
+    line_bases: int
+    line_width: int  # bytes of full line, with newline
+
+
+def read_fai(fai_path: str) -> dict:
+    """
+    Parameters:
+        fai_path [str]: path to .fai file
+    Output:
+        [dict]: sequence name -> FaiEntry, in order of the file
+    """
+    index = {}
+    with open(fai_path) as f:
+        for line in f:
+            fields = line.rstrip('\n').split('\t')
+            if len(fields) < 5:
+                continue
+            index[fields[0]] = FaiEntry(fields[0], *(int(x) for x in fields[1:5]))
+    return index
+
+
+def write_fai(index: dict, fai_path: str) -> None:
+    tmp_path = f'{fai_path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        for entry in index.values():
+            f.write(f'{entry.name}\t{entry.length}\t{entry.offset}\t{entry.line_bases}\t{entry.line_width}\n')
+    os.replace(tmp_path, fai_path)
+
+
+def _index_entry(name: str, region: bytes, offset: int) -> FaiEntry:
+    """
+    Parameters:
+        name [str]: name of sequence
+        region [bytes]: lines of sequence, up to the next header
+        offset [int]: byte offset of region in file
+    Output:
+        [FaiEntry]: index entry, lines of the sequence must have equal length (except the last one)
+    """
+    region = region.rstrip(b'\r\n')
+    if len(region) == 0:
+        return FaiEntry(name, 0, offset, 0, 0)
+
+    first_newline = region.find(b'\n')
+    if first_newline == -1:
+        return FaiEntry(name, len(region), offset, len(region), len(region) + 1)
+
+    line_width = first_newline + 1
+    line_bases = first_newline - 1 if region[first_newline - 1:first_newline] == b'\r' else first_newline
+
+    full_lines = len(region) // line_width
+    last_line = region[full_lines * line_width:]
+
+    if region[line_width - 1:full_lines * line_width:line_width] != b'\n' * full_lines \
+            or b'\n' in last_line or len(last_line) > line_bases:
+        raise ValueError(f'Lines of sequence {name} have different lengths, it cannot be indexed.')
+
+    return FaiEntry(name, full_lines * line_bases + len(last_line), offset, line_bases, line_width)
+
+
+def build_fai(fasta_path: str) -> dict:
+    """
+    Builds .fai index of FASTA file in a single pass over memory mapped file.
+    Parameters:
+        fasta_path [str]: path to FASTA file (not compressed)
+    Output:
+        [dict]: sequence name -> FaiEntry
+    """
+    index = {}
+
+    if os.path.getsize(fasta_path) == 0:
+        return index
+
+    with open(fasta_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        header_start = mm.find(b'>')
+
+        while header_start != -1:
+            header_end = mm.find(b'\n', header_start)
+            if header_end == -1:
+                header_end = len(mm)
+
+            name = mm[header_start + 1:header_end].split()[0].decode()
+
+            next_header = mm.find(b'\n>', header_end)
+            sequence_end = len(mm) if next_header == -1 else next_header + 1
+
+            index[name] = _index_entry(name, mm[header_end + 1:sequence_end], header_end + 1)
+
+            header_start = -1 if next_header == -1 else next_header + 1
+
+    return index
+
+
+class IndexedFasta:
+
+    def __init__(self, fasta_path: str, index: dict = None):
+        """
+        FASTA file with .fai index next to it. The index is built if it is missing
+        or older than the file, and kept in memory only if it cannot be written.
+        Only pages of the file holding fetched regions are read.
+        Parameters:
+            fasta_path [str]: path to FASTA file (not compressed)
+            index [dict]: index of the file loaded before (e.g. passed to other processes), loaded if None
+        """
+        self.fasta_path = fasta_path
+        self.fai_path = f'{fasta_path}.fai'
+        self.index = self._load_index() if index is None else index
+
+        self._file = open(fasta_path, 'rb')
+        self._mm = None
+        if os.path.getsize(fasta_path) > 0:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _load_index(self) -> dict:
+        if os.path.exists(self.fai_path) and os.path.getmtime(self.fai_path) >= os.path.getmtime(self.fasta_path):
+            return read_fai(self.fai_path)
+
+        logging.info(f'Indexing {self.fasta_path}...')
+        index = build_fai(self.fasta_path)
+
+        try:
+            write_fai(index, self.fai_path)
+        except OSError as os_error:
+            logging.warning(f'Index of {self.fasta_path} cannot be written ({os_error}), kept in memory.')
+
+        return index
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def length(self, name: str) -> int:
+        return self.index[name].length
+
+    def fetch(self, name: str, start: int = 0, end: int = None) -> str:
+        """
+        Parameters:
+            name [str]: name of sequence, e.g. chr1
+            start [int]: 0-based start of region
+            end [int]: end of region (exclusive), end of sequence if None
+        Output:
+            [str]: sequence of region
+        """
+        if name not in self.index:
+            raise KeyError(f'Sequence {name} not found in {self.fasta_path}')
+
+        entry = self.index[name]
+        start = max(start, 0)
+        end = entry.length if end is None else min(end, entry.length)
+        if start >= end:
+            return ''
+
+        first_byte = entry.offset + start // entry.line_bases * entry.line_width + start % entry.line_bases
+        last_byte = entry.offset + (end - 1) // entry.line_bases * entry.line_width + (end - 1) % entry.line_bases
+
+        return self._mm[first_byte:last_byte + 1].replace(b'\n', b'').replace(b'\r', b'').decode('ascii')
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -3,23 +3,29 @@ Finds protein motif orientation in both ends
 of PET in bedpe file.
 
 Usage:
-    cknots.py preprocess orientation <in_bedpe> <in_motif> <in_ref> <out_bedpe>
+    cknots.py preprocess orientation <in_bedpe> <in_motif> <in_ref> <out_bedpe> [--motif_cache=<d>] [--processes=<p>]
     cknots.py (-h | --help)
 
 Options:
-    -h --help     Show this help message.
+    -h --help           Show this help message.
+    --motif_cache=<d>   Directory with cached motif hits, reused by runs with the same reference and motif.
+    --processes=<p>     Number of processes scanning reference, defaults to number of CPUs.
 """
 
 
 import logging
-import multiprocessing
+import os
+import tempfile
 
-import dask.dataframe
 import numpy as np
 import pandas as pd
-from Bio import SeqIO, motifs, SeqRecord
+from Bio import SeqRecord
+from Bio.Seq import Seq
 from docopt import docopt
 
+from cknots.preprocessing.fasta_index import IndexedFasta
+from cknots.preprocessing.motif_scan import MotifHits, iter_motif_hits, read_pssm, scan_sequence
+
 BEDPE_COLS = [
     'chrom1', 'start1', 'end1', 'chrom2', 'start2', 'end2', 'count'
 ]
@@ -30,102 +36,207 @@ MOTIF_COLS = [
 
 CHROMOSOMES = list(range(1, 23)) + ['X', 'Y']
 
+BEDPE_CHUNK_SIZE = 10 ** 6  # rows
+
 MOTIF_ORIENTATION = None
 
 
-def check_motif_orientation(input_bedpe: str, motif: str, reference: str, output: str):
+def check_motif_orientation(input_bedpe: str, motif: str, reference: str, output: str,
+                            cache_dir: str = None, processes: int = None, chunk_size: int = BEDPE_CHUNK_SIZE):
+    """
+    Contacts are streamed in chunks of at most chunk_size rows, so memory does not grow with
+    size of .bedpe file: they are first split by chromosome into temporary files next to
+    output, then chunks of every chromosome are annotated and appended to output.
+    Rows are written in order of CHROMOSOMES, in order of input within a chromosome,
+    rows of other chromosomes are skipped.
+    Parameters:
+        input_bedpe [str]: path to .bedpe file with contacts
+        motif [str]: path to .jaspar file, the last motif in it is used
+        reference [str]: path to reference genome (fasta file)
+        output [str]: path to output .bedpe file
+        cache_dir [str]: directory with cached motif hits, see motif_scan.iter_motif_hits()
+        processes [int]: number of processes scanning reference, number of CPUs if None
+        chunk_size [int]: number of rows of .bedpe file processed at once
+    """
+    tmp_output = f'{output}.{os.getpid()}.tmp'
+
+    try:
+        with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(output))) as split_dir:
+            chromosome_paths = split_by_chromosome(input_bedpe, split_dir, chunk_size)
+
+            # reference is scanned only for chromosomes with contacts
+            chr_names = [x for x in CHROMOSOMES if f'chr{x}' in chromosome_paths]
+            chromosome_hits = iter_motif_hits(reference, motif, [f'chr{x}' for x in chr_names],
+                                              threshold=0, processes=processes, cache_dir=cache_dir)
+
+            with open(tmp_output, 'w') as out_file:
+                for chr_name, (_, hits) in zip(chr_names, chromosome_hits):
+                    # chromosomes are scanned ahead in other processes while hits of this one are used
+                    logging.info(f'Running chromosome {chr_name}...')
+                    motif_orientation = hits_to_motif_orientation(hits, chr_name)
+                    motif_index = build_motif_index(motif_orientation)
+
+                    for bedpe_chr in pd.read_csv(chromosome_paths[f'chr{chr_name}'], header=None, sep='\t',
+                                                 names=BEDPE_COLS, chunksize=chunk_size):
+                        bedpe_chr.insert(7, 'orientation1', anchor_orientations(motif_index,
+                                                                                bedpe_chr['start1'].to_numpy(),
+                                                                                bedpe_chr['end1'].to_numpy()))
+                        bedpe_chr.insert(8, 'orientation2', anchor_orientations(motif_index,
+                                                                                bedpe_chr['start2'].to_numpy(),
+                                                                                bedpe_chr['end2'].to_numpy()))
+
+                        bedpe_chr.to_csv(out_file, sep='\t', index=False, header=False)
+    except BaseException:
+        if os.path.exists(tmp_output):
+            os.remove(tmp_output)
+        raise
+
+    os.replace(tmp_output, output)
+    return None
 
-    bedpe = pd.read_csv(input_bedpe, header=None, sep='\t', names=BEDPE_COLS)
 
-    out_bedpe = pd.DataFrame()
+def split_by_chromosome(input_bedpe: str, out_dir: str, chunk_size: int = BEDPE_CHUNK_SIZE) -> dict:
+    """
+    Splits .bedpe file by chromosome of the first anchor, in chunks of chunk_size rows.
+    Fields are copied as text, rows keep their order.
+    Parameters:
+        input_bedpe [str]: path to .bedpe file with contacts
+        out_dir [str]: directory for .bedpe files of chromosomes
+        chunk_size [int]: number of rows read at once
+    Output:
+        [dict]: chromosome (e.g. chr1) -> path to its .bedpe file, only for CHROMOSOMES with contacts
+    """
+    chromosome_names = {f'chr{x}' for x in CHROMOSOMES}
+    chromosome_paths = {}
 
-    for chr_name in CHROMOSOMES:
-        logging.info(f'Running chromosome {chr_name}...')
-        file_fa = read_fasta(reference, chr_name)
-        seq = file_fa.seq
-        motif_orientation = get_motif_orientation(motif, chr_name, seq)
-        transform_function = get_transform_function(motif_orientation)
+    for chunk in pd.read_csv(input_bedpe, header=None, sep='\t', names=BEDPE_COLS, dtype=str,
+                             keep_default_na=False, chunksize=chunk_size):
+        for chromosome, rows in chunk.groupby('chrom1', sort=False):
+            if chromosome not in chromosome_names:
+                continue
 
-        bedpe_chr = bedpe[bedpe['chrom1'] == f'chr{chr_name}']
+            path = chromosome_paths.setdefault(chromosome, os.path.join(out_dir, f'{chromosome}.bedpe'))
+            rows.to_csv(path, mode='a', sep='\t', index=False, header=False)
 
-        bedpe_dd = dask.dataframe.from_pandas(bedpe_chr,
-                                              npartitions=2 * multiprocessing.cpu_count())
+    return chromosome_paths
 
-        orientation_columns = bedpe_dd \
-            .map_partitions(lambda df: df.apply(transform_function, axis=1)) \
-            .compute(scheduler='processes')\
-            .str\
-            .split(',', expand=True)\
-            .rename(columns={0: 'orientation1', 1: 'orientation2'})
 
-        bedpe_chr.insert(7, 'orientation1', orientation_columns['orientation1'],)
-        bedpe_chr.insert(8, 'orientation2', orientation_columns['orientation2'])
+def read_fasta(fasta, chromosome: object, start: int = 0, end: int = None) -> SeqRecord.SeqRecord:
+    """
+    Returns reference sequence for given chromosome, or its region, read through
+    .fai index (built if missing) without parsing other chromosomes.
+    Parameters:
+        fasta [str or IndexedFasta]: path to reference genome (fasta file) or the opened file
+        chromosome [object]: number of chromosome (1..22) or 'X' or 'Y'
+        start [int]: 0-based start of region
+        end [int]: end of region (exclusive), end of chromosome if None
+    Output:
+        [Bio.SeqRecord.SeqRecord]: reference sequence
+    """
+    if isinstance(fasta, IndexedFasta):
+        return SeqRecord.SeqRecord(Seq(fasta.fetch(f'chr{chromosome}', start, end)), id=f'chr{chromosome}')
 
-        out_bedpe = pd.concat([out_bedpe, bedpe_chr], ignore_index=True)
+    with IndexedFasta(fasta) as indexed_fasta:
+        return read_fasta(indexed_fasta, chromosome, start, end)
 
-    out_bedpe.to_csv(path_or_buf=output, sep='\t', index=False, header=False)
-    return None
+
+def get_motif_orientation(motif: str, chromosome: object, seq) -> pd.DataFrame:
+    """
+    Motif hits in sequence already read, scanned in this process.
+    Parameters:
+        motif [str]: path to .jaspar file, the last motif in it is used
+        chromosome [object]: number of chromosome (1..22) or 'X' or 'Y'
+        seq [str or Bio.Seq.Seq]: sequence of the chromosome
+    Output:
+        [pd.DataFrame]: motif hits with MOTIF_COLS
+    """
+    positions, strands, scores = scan_sequence(read_pssm(motif), str(seq), threshold=0)
+    return hits_to_motif_orientation(MotifHits(positions, strands, scores, len(seq)), chromosome)
 
 
-def read_fasta(fasta_path: str, chromosome: object) -> SeqRecord.SeqRecord:
+def hits_to_motif_orientation(hits: MotifHits, chromosome: object) -> pd.DataFrame:
     """
-    Returns reference sequence for given chromosome.
+    Motif hits as reported by orientation so far: Bio.motifs reports hit on the reverse
+    strand at position p as p - length of sequence, and 'pos' is the absolute value of
+    that, 'orientation' is '+' only for positive values (so also forward hit at 0 is '-').
     Parameters:
-        fasta_path [str]: path to reference genome (fasta file)
+        hits [MotifHits]: hits in the chromosome
         chromosome [object]: number of chromosome (1..22) or 'X' or 'Y'
     Output:
-        [Bio.SeqRecord.SeqRecord]: reference sequence
+        [pd.DataFrame]: motif hits with MOTIF_COLS
     """
-    with open(fasta_path) as f:
-        return next(x for x in SeqIO.parse(f, 'fasta') if x.id == f'chr{chromosome}')
+    signed_positions = np.where(hits.strands > 0, hits.positions, hits.positions - hits.sequence_length)
 
+    return pd.DataFrame({
+        'pos': np.abs(signed_positions),
+        'orientation': np.where(signed_positions > 0, '+', '-').astype(object),
+        'score': hits.scores,
+        'chromosome': f'chr{chromosome}'
+    }, columns=MOTIF_COLS)
 
-def get_motif_orientation(motif: str, chromosome: object, seq) -> pd.DataFrame:
-    with open(motif) as f:
-        for motif in motifs.parse(f, "jaspar"):
-            pssm = motif.pssm
-            search_res = pssm.search(seq, threshold=0, both=True)
-            clean_res = [(abs(x[0]), orientation(x[0]), x[1], f'chr{chromosome}') for x in search_res]
-            output_motif_orientation = pd.DataFrame(clean_res, columns=MOTIF_COLS)
 
-    return output_motif_orientation
+def build_motif_index(motif_orientation: pd.DataFrame) -> tuple:
+    """
+    Sorts motif hits by position once, so that hits within any anchor are
+    a contiguous range found with binary search.
 
+    Every hit gets a rank in order in which hits are chosen for an anchor:
+    by score, the lowest first (as sort_values('score', ascending='False') did,
+    the string being truthy), then by position. The chosen hit of a range
+    is the one with the minimal rank.
+    Parameters:
+        motif_orientation [pd.DataFrame]: motif hits with MOTIF_COLS
+    Output:
+        [tuple]: (positions of hits sorted, ranks of hits in order of positions with
+            a sentinel at the end, orientations of hits in order of ranks)
+    """
+    positions = motif_orientation['pos'].to_numpy()
+    scores = motif_orientation['score'].to_numpy()
+    orientations = motif_orientation['orientation'].to_numpy()
+
+    by_position = np.argsort(positions, kind='stable')
+    by_rank = np.lexsort((np.arange(len(positions)), positions, scores))
+
+    ranks = np.empty(len(positions), dtype=np.int64)
+    ranks[by_rank] = np.arange(len(positions))
+
+    # sentinel, so that ranges ending after the last hit are valid for reduceat
+    ranks_by_position = np.append(ranks[by_position], len(positions))
+
+    return positions[by_position], ranks_by_position, orientations[by_rank]
 
-def orientation(x):
-    if x > 0:
-        return '+'
-    else:
-        return '-'
 
+def anchor_orientations(motif_index: tuple, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """
+    Orientation of the chosen motif hit strictly inside every anchor (start, end),
+    '.' if there is none.
+    Parameters:
+        motif_index [tuple]: output of build_motif_index()
+        starts [np.ndarray]: starts of anchors
+        ends [np.ndarray]: ends of anchors
+    Output:
+        [np.ndarray]: orientations ('+', '-' or '.')
+    """
+    positions, ranks, orientations = motif_index
 
-def get_transform_function(motif_orientation):
-    def transform(row):
-        indices_1 = np.logical_and(
-            motif_orientation['pos'] > row['start1'],
-            motif_orientation['pos'] < row['end1']
-        )
+    first = np.searchsorted(positions, starts, side='right')
+    last = np.searchsorted(positions, ends, side='left')
 
-        indices_2 = np.logical_and(
-            motif_orientation['pos'] > row['start2'],
-            motif_orientation['pos'] < row['end2']
-        )
+    result = np.full(len(starts), '.', dtype=object)
+    found = np.flatnonzero(first < last)
+    if len(found) == 0:
+        return result
 
-        if len(motif_orientation[indices_1]) > 0:
-            orientation_1 = motif_orientation[indices_1] \
-                .sort_values('score', ascending='False') \
-                .iloc[0, 1]
-        else:
-            orientation_1 = '.'
+    # ranges sorted by start, so that gaps between them sum up to at most all hits
+    found = found[np.argsort(first[found], kind='stable')]
+    bounds = np.empty(2 * len(found), dtype=np.int64)
+    bounds[0::2] = first[found]
+    bounds[1::2] = last[found]
 
-        if len(motif_orientation[indices_2]) > 0:
-            orientation_2 = motif_orientation[indices_2] \
-                .sort_values('score', ascending='False') \
-                .iloc[0, 1]
-        else:
-            orientation_2 = '.'
+    min_ranks = np.minimum.reduceat(ranks, bounds)[0::2]
+    result[found] = orientations[min_ranks]
 
-        return f'{orientation_1},{orientation_2}'
-    return transform
+    return result
 
 
 if __name__ == '__main__':
@@ -134,5 +245,7 @@ if __name__ == '__main__':
         input_bedpe=parsed_args['<in_bedpe>'],
         motif=parsed_args['<in_motif>'],
         reference=parsed_args['<in_ref>'],
-        output=parsed_args['<out_bedpe>']
+        output=parsed_args['<out_bedpe>'],
+        cache_dir=parsed_args['--motif_cache'],
+        processes=int(parsed_args['--processes']) if parsed_args['--processes'] else None
     )
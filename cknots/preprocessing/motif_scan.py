@@ -0,0 +1,190 @@
+"""
+Scanning reference genome for motif hits with PSSM, in a pool of processes
+over overlapping chunks of chromosomes. Hits are kept in NumPy arrays and
+cached on disk, keyed by reference file, chromosome, motif and threshold,
+so that orientation of other .bedpe files against the same reference and
+motif does not scan it again.
+"""
+
+import hashlib
+import logging
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+from Bio import motifs
+
+from cknots.preprocessing.fasta_index import IndexedFasta
+
+CHUNK_SIZE = 10 ** 7
+
+# bump if format or contents of cached hits change
+CACHE_VERSION = 2
+
+
+@dataclass
+class MotifHits:
+    positions: np.ndarray  # int64, 0-based start of hit on the forward strand
+    strands: np.ndarray  # int8, 1 forward, -1 reverse
+    scores: np.ndarray  # float32
+    sequence_length: int
+
+
+def read_pssm(motif_path: str):
+    """
+    Returns PSSM of the last motif in .jaspar file, as used by orientation so far.
+    Parameters:
+        motif_path [str]: path to .jaspar file
+    Output:
+        [Bio.motifs.matrix.PositionSpecificScoringMatrix]: PSSM of the motif
+    """
+    with open(motif_path) as f:
+        return list(motifs.parse(f, 'jaspar'))[-1].pssm
+
+
+def scan_sequence(pssm, sequence: str, threshold: float = 0.0) -> tuple:
+    """
+    Scores of PSSM and its reverse complement at every position of sequence,
+    the same as pssm.search(sequence, threshold, both=True) computes.
+    Parameters:
+        pssm [PositionSpecificScoringMatrix]: PSSM of motif
+        sequence [str]: DNA sequence
+        threshold [float]: minimal score of hit
+    Output:
+        [tuple]: arrays (positions, strands, scores) of hits ordered by position,
+            forward hit first if both strands have one
+    """
+    sequence = sequence.upper()
+
+    if len(sequence) < pssm.length:
+        return np.empty(0, np.int64), np.empty(0, np.int8), np.empty(0, np.float32)
+
+    strand_positions = []
+    strand_scores = []
+    for strand_pssm in (pssm, pssm.reverse_complement()):
+        scores = np.atleast_1d(strand_pssm.calculate(sequence))
+        hits = scores >= threshold
+        strand_positions.append(np.flatnonzero(hits))
+        strand_scores.append(scores[hits])
+
+    positions = np.concatenate(strand_positions)
+    strands = np.concatenate([np.ones(len(strand_positions[0]), np.int8),
+                              -np.ones(len(strand_positions[1]), np.int8)])
+    scores = np.concatenate(strand_scores)
+
+    order = np.argsort(positions, kind='stable')
+    return positions[order].astype(np.int64), strands[order], scores[order].astype(np.float32)
+
+
+def _scan_chunk(fasta_path: str, index: dict, name: str, start: int, end: int, pssm, threshold: float) -> tuple:
+    # hits starting in [start, end), the chunk reaches into the next one by motif length - 1
+    with IndexedFasta(fasta_path, index=index) as fasta:
+        sequence = fasta.fetch(name, start, end + pssm.length - 1)
+
+    positions, strands, scores = scan_sequence(pssm, sequence, threshold)
+    return positions + start, strands, scores
+
+
+def hits_key(fasta: IndexedFasta, name: str, motif_path: str, threshold: float) -> str:
+    """
+    Cache key of hits of one chromosome: digest of path, size and modification time
+    of the reference, index entry of the chromosome, contents of the motif file and
+    the threshold. Nothing but the index is read from the reference, so that cached
+    hits are found at once.
+    """
+    reference_stat = os.stat(fasta.fasta_path)
+    entry = fasta.index[name]
+
+    digest = hashlib.sha256()
+    digest.update(f'{CACHE_VERSION}\t{os.path.realpath(fasta.fasta_path)}\t{reference_stat.st_size}\t'
+                  f'{reference_stat.st_mtime_ns}\t{entry}\t{float(threshold)!r}\n'.encode())
+
+    with open(motif_path, 'rb') as f:
+        digest.update(hashlib.sha256(f.read()).digest())
+
+    return digest.hexdigest()
+
+
+def load_hits(cache_path: str) -> MotifHits:
+    with np.load(cache_path) as data:
+        return MotifHits(data['positions'], data['strands'], data['scores'], int(data['sequence_length']))
+
+
+def save_hits(hits: MotifHits, cache_path: str) -> None:
+    tmp_path = f'{cache_path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, positions=hits.positions, strands=hits.strands, scores=hits.scores,
+                 sequence_length=hits.sequence_length)
+    os.replace(tmp_path, cache_path)
+
+
+def iter_motif_hits(fasta_path: str, motif_path: str, names: list, threshold: float = 0.0,
+                    processes: int = None, cache_dir: str = None, chunk_size: int = CHUNK_SIZE):
+    """
+    Scans chromosomes in chunks of chunk_size bases in a pool of processes. Chunks of
+    all chromosomes share the pool, so the next chromosome is scanned while hits
+    of the previous one are used. At most 2 * processes chunks are scanned ahead.
+    Parameters:
+        fasta_path [str]: path to reference genome (fasta file), see IndexedFasta
+        motif_path [str]: path to .jaspar file, see read_pssm()
+        names [list]: names of chromosomes, e.g. chr1
+        threshold [float]: minimal score of hit
+        processes [int]: number of processes, number of CPUs if None
+        cache_dir [str]: directory with cached hits, no cache if None
+        chunk_size [int]: bases scanned by one task
+    Output:
+        [generator]: (name, MotifHits) in order of names
+    """
+    pssm = read_pssm(motif_path)
+    processes = processes or len(os.sched_getaffinity(0))
+
+    with IndexedFasta(fasta_path) as fasta:
+        index = fasta.index
+        lengths = {name: fasta.length(name) for name in names}
+
+        cache_paths = {}
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+            cache_paths = {name: os.path.join(cache_dir, f'{hits_key(fasta, name, motif_path, threshold)}.npz')
+                           for name in names}
+
+    cached = [name for name in names if name in cache_paths and os.path.exists(cache_paths[name])]
+    logging.info(f'Motif hits of {len(cached)} of {len(names)} chromosomes taken from cache.')
+
+    chunks = iter([(name, start, min(start + chunk_size, lengths[name]))
+                   for name in names if name not in cached
+                   for start in range(0, lengths[name], chunk_size)])
+
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        running = deque()
+
+        for name in names:
+            if name in cached:
+                yield name, load_hits(cache_paths[name])
+                continue
+
+            logging.info(f'Scanning {name} for motif hits...')
+
+            parts = []
+            for _ in range(0, lengths[name], chunk_size):
+                # chunks are submitted and taken in the same order, the first one is of this chromosome
+                for chunk_name, start, end in chunks:
+                    running.append(executor.submit(_scan_chunk, fasta_path, index, chunk_name, start, end,
+                                                   pssm, threshold))
+                    if len(running) >= 2 * processes:
+                        break
+                parts.append(running.popleft().result())
+
+            hits = MotifHits(
+                np.concatenate([x[0] for x in parts] or [np.empty(0, np.int64)]),
+                np.concatenate([x[1] for x in parts] or [np.empty(0, np.int8)]),
+                np.concatenate([x[2] for x in parts] or [np.empty(0, np.float32)]),
+                lengths[name]
+            )
+
+            if name in cache_paths:
+                save_hits(hits, cache_paths[name])
+
+            yield name, hits
@@ -1,49 +1,250 @@
 """
 Filters .bedpe file by selecting only interactions
 with number of PET count greater or equal than
-probided value.
+probided value. Several values can be given at once
+(e.g. 2,3,4,5), the file is read once for all of them.
 
 Usage:
-    pet_filter.py <in_bedpe> <out_bedpe> <min_pet_count>
+    pet_filter.py <in_bedpe> <out_bedpe> (<min_pet_count> | --min_pet_count=<counts>)
     pet_filter.py (-h | --help)
 
 Options:
-    -h --help     Show this help message.
+    -h --help                   Show this help message.
+    --min_pet_count=<counts>    Minimal PET counts separated by commas, one output file for each.
 """
 
+import logging
+import os
+
+import numpy as np
+import pandas as pd
 from tqdm import tqdm
 from docopt import docopt
-import logging
+
+BLOCK_SIZE = 64 * 1024 * 1024  # bytes read at once
+
+NEWLINE = ord('\n')
+TAB = ord('\t')
+ZERO = ord('0')
+
+# ignored around PET count, as int() did (\r of \r\n line ends among them)
+WHITESPACE = np.array([ord(x) for x in ' \t\r\v\f'], dtype=np.uint8)
+
+
+def parse_min_pet_counts(value: str) -> list:
+    """
+    Parameters:
+        value [str]: PET counts separated by commas, e.g. 2,3,4,5
+    Output:
+        [list]: sorted PET counts, without repetitions
+    """
+    return sorted({int(x) for x in value.split(',') if x.strip() != ''})
+
+
+def pet_filter_outputs(output: str, min_pet_counts: list) -> dict:
+    """
+    Parameters:
+        output [str]: path to output .bedpe file
+        min_pet_counts [list]: minimal PET counts
+    Output:
+        [dict]: minimal PET count -> path to its output file, output itself
+            for a single count, e.g. out.min_pet_3.bedpe for several
+    """
+    if len(min_pet_counts) == 1:
+        return {min_pet_counts[0]: output}
+
+    root, ext = os.path.splitext(output)
+    return {x: f'{root}.min_pet_{x}{ext}' for x in min_pet_counts}
 
 
 def filter_by_pet_count(input_bedpe: str, output: str, min_pet_count: int) -> None:
-    in_file_length = count_lines(input_bedpe)
-    logging.info(f'Processing interactions file of {in_file_length} lines.')
-    out_file_length = 0
-    with open(input_bedpe, 'r') as f_in:
-        with open(output, 'w+') as f_out:
-            for line in tqdm(f_in, total=in_file_length):
-                pet_count = int(line[:-1].split('\t')[-1])
-                if pet_count >= min_pet_count:
-                    f_out.write(line)
-                    out_file_length += 1
-    logging.info(f'Saved interactions file of {out_file_length} lines.')
-    logging.info('Filtering finished.')
+    filter_by_pet_counts(input_bedpe, {min_pet_count: output})
     return None
 
 
-def count_lines(file_path):
-    with open(file_path, 'r') as f:
-        line_count = 0
-        for _ in f:
-            line_count += 1
-    return line_count
+def filter_by_pet_counts(input_bedpe: str, outputs: dict) -> pd.DataFrame:
+    """
+    Writes lines of .bedpe file with PET count (the last column) greater or equal than
+    every minimal PET count to its output file, in a single pass over the file. Lines are
+    copied unchanged, except that the last line gets a newline if it has none. Empty lines
+    (or ones with only whitespace) are skipped, PET count may be surrounded by whitespace.
+    Parameters:
+        input_bedpe [str]: path to .bedpe file
+        outputs [dict]: minimal PET count -> path to output .bedpe file
+    Output:
+        [pd.DataFrame]: number of interactions left, chromosomes (of the first anchor)
+            as rows, minimal PET counts as columns, in order of first appearance in the file
+    """
+    min_pet_counts = sorted(outputs)
+    tmp_paths = {x: f'{outputs[x]}.{os.getpid()}.tmp' for x in min_pet_counts}
+    out_files = {x: open(tmp_paths[x], 'wb') for x in min_pet_counts}
+
+    histogram = {}
+    in_file_length = 0
+
+    logging.info(f'Processing interactions file of {os.path.getsize(input_bedpe)} bytes.')
+
+    try:
+        with open(input_bedpe, 'rb') as f_in, \
+                tqdm(total=os.path.getsize(input_bedpe), unit='B', unit_scale=True) as progress:
+            remainder = b''
+            while True:
+                block = f_in.read(BLOCK_SIZE)
+                progress.update(len(block))
+
+                if len(block) == 0:
+                    if len(remainder) == 0:
+                        break
+                    # the last line without newline
+                    block, remainder = remainder + b'\n', b''
+                else:
+                    block = remainder + block
+                    last_newline = block.rfind(b'\n')
+                    block, remainder = block[:last_newline + 1], block[last_newline + 1:]
+                    if len(block) == 0:
+                        continue
+
+                in_file_length += _filter_block(block, min_pet_counts, out_files, histogram)
+    except BaseException:
+        for x in min_pet_counts:
+            out_files[x].close()
+            os.remove(tmp_paths[x])
+        raise
+
+    for x in min_pet_counts:
+        out_files[x].close()
+        os.replace(tmp_paths[x], outputs[x])
+
+    histogram = pd.DataFrame.from_dict(histogram, orient='index', columns=min_pet_counts)
+    histogram.index.name = 'chromosome'
+    histogram.columns.name = 'min_pet_count'
+
+    logging.info(f'Processed interactions file of {in_file_length} lines.')
+    for x in min_pet_counts:
+        logging.info(f'Saved interactions file {outputs[x]} of {int(histogram[x].sum())} lines '
+                     + f'(PET count >= {x}).')
+    logging.info(f'Interactions left in chromosomes:\n{format_histogram(histogram)}')
+    logging.info('Filtering finished.')
+
+    return histogram
+
+
+def _filter_block(block: bytes, min_pet_counts: list, out_files: dict, histogram: dict) -> int:
+    """
+    Filters complete lines of block (ending with newline) and updates histogram in place.
+    Output:
+        [int]: number of non-empty lines
+    """
+    data = np.frombuffer(block, dtype=np.uint8)
+
+    line_ends = np.flatnonzero(data == NEWLINE)
+    line_starts = np.concatenate([[0], line_ends[:-1] + 1])
+    tabs = np.flatnonzero(data == TAB)
+
+    # fields end before newline and trailing whitespace, e.g. before \r\n
+    field_ends = _skip_whitespace(data, line_ends, line_starts, step=-1)
+
+    non_empty = field_ends > line_starts
+
+    # the last field: after the last tab of the line, if there is one, and leading whitespace
+    last_tabs = np.searchsorted(tabs, field_ends) - 1
+    count_starts = np.maximum(np.where(last_tabs >= 0, tabs[np.maximum(last_tabs, 0)] + 1, 0), line_starts)
+    count_starts = _skip_whitespace(data, count_starts, field_ends, step=1)
+    pet_counts = _parse_counts(data, count_starts, field_ends, non_empty, line_starts)
+
+    # the first field: up to the first tab of the line, if there is one
+    first_tabs = np.searchsorted(tabs, line_starts)
+    chromosome_ends = np.minimum(np.where(first_tabs < len(tabs), tabs[np.minimum(first_tabs, len(tabs) - 1)],
+                                          field_ends), field_ends)
+    chromosomes = _fields_as_array(data, line_starts, chromosome_ends)
+
+    names, chromosome_ids = np.unique(chromosomes[non_empty], return_inverse=True)
+    first_seen = np.full(len(names), len(chromosome_ids))
+    np.minimum.at(first_seen, chromosome_ids, np.arange(len(chromosome_ids)))
+
+    line_lengths = line_ends - line_starts + 1
+    for min_pet_count in min_pet_counts:
+        keep = non_empty & (pet_counts >= min_pet_count)
+        out_files[min_pet_count].write(data[np.repeat(keep, line_lengths)].tobytes())
+
+        left = np.bincount(chromosome_ids[keep[non_empty]], minlength=len(names))
+        for i in np.argsort(first_seen):
+            chromosome_counts = histogram.setdefault(names[i].decode(), {x: 0 for x in min_pet_counts})
+            chromosome_counts[min_pet_count] += int(left[i])
+
+    return int(non_empty.sum())
+
+
+def _skip_whitespace(data: np.ndarray, positions: np.ndarray, limits: np.ndarray, step: int) -> np.ndarray:
+    """
+    Moves positions over whitespace, one byte at a time for all of them, up to limits.
+    With step -1 positions are ends (whitespace before them is skipped), with step 1 starts.
+    """
+    positions = positions.copy()
+    offset = -1 if step < 0 else 0
+
+    while True:
+        moving = (positions - limits) * step < 0
+        moving[moving] = np.isin(data[positions[moving] + offset], WHITESPACE)
+        if not moving.any():
+            return positions
+        positions[moving] += step
+
+
+def _parse_counts(data: np.ndarray, starts: np.ndarray, ends: np.ndarray, non_empty: np.ndarray,
+                  line_starts: np.ndarray) -> np.ndarray:
+    """
+    Parses non-negative integers data[starts[i]:ends[i]] at once, one digit position at a time.
+    """
+    lengths = ends - starts
+    counts = np.zeros(len(starts), dtype=np.int64)
+
+    invalid = non_empty & (lengths == 0)
+    for k in range(int(lengths.max(initial=0))):
+        has_digit = lengths > k
+        digits = data[np.where(has_digit, ends - 1 - k, 0)].astype(np.int64) - ZERO
+        invalid |= has_digit & ((digits < 0) | (digits > 9))
+        counts += np.where(has_digit, digits, 0) * 10 ** k
+
+    if invalid.any():
+        i = np.flatnonzero(invalid)[0]
+        line = data[line_starts[i]:ends[i]].tobytes().decode(errors='replace')
+        raise ValueError(f'Invalid PET count in line: {line}')
+
+    return counts
+
+
+def _fields_as_array(data: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """
+    Fields data[starts[i]:ends[i]] as array of fixed width bytes, which can be compared and sorted.
+    """
+    width = max(int((ends - starts).max(initial=0)), 1)
+    offsets = np.arange(width)
+
+    positions = starts[:, None] + offsets
+    fields = np.where(positions < ends[:, None], data[np.minimum(positions, len(data) - 1)], 0)
+
+    return np.ascontiguousarray(fields.astype(np.uint8)).view(f'S{width}').ravel()
+
+
+def format_histogram(histogram: pd.DataFrame) -> str:
+    """
+    Parameters:
+        histogram [pd.DataFrame]: output of filter_by_pet_counts()
+    Output:
+        [str]: text table of interactions left, with totals
+    """
+    table = histogram.copy()
+    table.loc['total'] = histogram.sum()
+    table.columns = [f'>={x}' for x in table.columns]
+    return table.to_string()
 
 
 if __name__ == '__main__':
     parsed_args = docopt(__doc__)
-    filter_by_pet_count(
+    counts = parse_min_pet_counts(parsed_args['<min_pet_count>'] or parsed_args['--min_pet_count'])
+    result = filter_by_pet_counts(
         input_bedpe=parsed_args['<in_bedpe>'],
-        output=parsed_args['<out_bedpe>'],
-        min_pet_count=int(parsed_args['<min_pet_count>'])
+        outputs=pet_filter_outputs(parsed_args['<out_bedpe>'], counts)
     )
+    print(format_histogram(result))
@@ -9,19 +9,25 @@ cKNOTs preprocessing script.
 orientation
     Takes <in_bedpe> .bedpe contacts file, <in_motif> .jaspar motif file
     and <in_ref> .fa genome reference file to output <out_bedpe> .bedpe file
-    containing additional column with contact orientation.
+    containing additional column with contact orientation. Motif hits
+    found in the reference are cached in --motif_cache directory.
 
 pet_filter
     Takes <in_bedpe> file, outputs <out_bedpe> file containing
     only contacts that have minimum <min_pet_count> PET count.
+    With --min_pet_count=2,3,4,5 the file is read once and one
+    output is written for every count (e.g. out.min_pet_3.bedpe).
 
 Usage:
-    preprocessing_cknots.py orientation <in_bedpe> <in_motif> <in_ref> <out_bedpe>
-    preprocessing_cknots.py pet_filter <in_bedpe> <out_bedpe> <min_pet_count>
+    preprocessing_cknots.py orientation <in_bedpe> <in_motif> <in_ref> <out_bedpe> [--motif_cache=<d>] [--processes=<p>]
+    preprocessing_cknots.py pet_filter <in_bedpe> <out_bedpe> (<min_pet_count> | --min_pet_count=<counts>)
     preprocessing_cknots.py (-h | --help)
 
 Options:
-    -h --help     Show this help message.
+    -h --help                   Show this help message.
+    --motif_cache=<d>           Directory with cached motif hits of reference [default: ~/.cache/cknots/motif_hits].
+    --processes=<p>             Number of processes scanning reference, defaults to number of CPUs.
+    --min_pet_count=<counts>    Minimal PET counts separated by commas, one output file for each.
 """
 
 import datetime
@@ -38,14 +44,18 @@ def preprocess(arguments):
             input_bedpe=arguments['<in_bedpe>'],
             motif=arguments['<in_motif>'],
             reference=arguments['<in_ref>'],
-            output=arguments['<out_bedpe>']
+            output=arguments['<out_bedpe>'],
+            cache_dir=os.path.expanduser(arguments['--motif_cache']),
+            processes=int(arguments['--processes']) if arguments['--processes'] else None
         )
     if arguments['pet_filter']:
-        pet_filter.filter_by_pet_count(
+        min_pet_counts = pet_filter.parse_min_pet_counts(arguments['<min_pet_count>']
+                                                         or arguments['--min_pet_count'])
+        histogram = pet_filter.filter_by_pet_counts(
             input_bedpe=arguments['<in_bedpe>'],
-            output=arguments['<out_bedpe>'],
-            min_pet_count=int(arguments['<min_pet_count>'])
+            outputs=pet_filter.pet_filter_outputs(arguments['<out_bedpe>'], min_pet_counts)
         )
+        print(pet_filter.format_histogram(histogram))
 
 
 if __name__ == "__main__":
@@ -6,19 +6,46 @@
 
 Script for running cKNOTs on a Slurm cluster with Enroot.
 
-It runs cKNOTs in 23 separate tasks for each chromosome
+By default it runs cKNOTs in 23 separate tasks for each chromosome.
 
-Usage:
-    slurm_cknots.py <data_path> <in_bedpe> <in_ccd> <out_dir> [timeout]
+With pack, input files are split first, then CCDs of all chromosomes are
+bin-packed by predicted runtime and memory into job arrays, with memory and
+time of every array sized to its bins. Time of every array task is enough for
+one of its CCDs to reach the timeout in every attempt. A final job merges the
+results and lists CCDs left without results in remaining_ccds.txt.
+With --local, jobs are run in local processes instead of submitting them.
+
+Paths are paths inside the container, <data_path> is mounted as /data.
 
+Usage:
+    slurm_cknots.py pack <data_path> <in_bedpe> <in_ccd> <out_dir> [--full] [--timeout=<t>]
+                    [--max_bin_time=<h>] [--partition=<p>] [--local] [--local_processes=<n>]
+    slurm_cknots.py <data_path> <in_bedpe> <in_ccd> <out_dir> [<timeout>]
+
+Options:
+    -h --help               Show this help message
+    --full                  Use non-linear algorithm
+    --timeout=<t>           Single CCD timeout in seconds [default: 21600]
+    --max_bin_time=<h>      Maximal predicted runtime of CCDs in one array task in hours [default: 12]
+    --partition=<p>         Slurm partition [default: medium]
+    --local                 Run jobs in local processes, <data_path> is not used and paths are local
+    --local_processes=<n>   Number of jobs run at the same time with --local [default: 1]
 """
+import json
 import os
 import subprocess
+import sys
 from shutil import which
 
 from docopt import docopt
 from jinja2 import Template
 
+from cknots.cknots.ccd_packing import ccd_time_limit, pack_ccds, resource_classes
+from cknots.cknots.job_submission import LocalSubmitter, SbatchSubmitter
+from cknots.cknots.runtime_config import RuntimeConfig
+
+CONTAINER_IMAGE = '/mnt/evafs/sfglab/home/kspalinski/cKNOTs/krzysztofspalinski+cknots+latest.sqsh'
+
 SBATCH_TEMPLATE = """#!/bin/bash
 #SBATCH --ntasks=1
 #SBATCH --mem 60G
@@ -27,7 +54,7 @@ SBATCH_TEMPLATE = """#!/bin/bash
 
 srun --export=ENROOT_CONFIG_PATH \
 --container-mounts={{ data_path }}:/data \
---container-image=/mnt/evafs/sfglab/home/kspalinski/cKNOTs/krzysztofspalinski+cknots+latest.sqsh \
+--container-image={{ container_image }} \
 /cknots-app/docker_cknots.sh \
 {{ bedpe_path }} \
 {{ ccd_path }} \
@@ -36,10 +63,34 @@ srun --export=ENROOT_CONFIG_PATH \
 {{ timeout }}
 """
 
+PACK_SBATCH_TEMPLATE = """#!/bin/bash
+#SBATCH --ntasks=1
+#SBATCH --mem {{ memory }}G
+#SBATCH --time {{ time }}
+#SBATCH --job-name="{{ job_name }}"
+#SBATCH --partition={{ partition }}
+
+{{ cknots_command }} \
+{{ bedpe_path }} \
+{{ ccd_path }} \
+{{ results_path }} \
+0 \
+{{ arguments }}
+"""
+
+CONTAINER_CKNOTS_COMMAND = """srun --export=ENROOT_CONFIG_PATH \
+--container-mounts={{ data_path }}:/data \
+--container-image={{ container_image }} \
+/cknots-app/docker_cknots.sh"""
+
+# Memory (GB) and time (minutes) of splitting and merging jobs
+SPLIT_RESOURCES = (60, 12 * 60)
+MERGE_RESOURCES = (4, 60)
+
 
 def run_slurm(arguments):
-    for chromosome_number in range(15, 24):
-        timeout = arguments['timeout'] if arguments['timeout'] else ''
+    for chromosome_number in range(1, 24):
+        timeout = f"--timeout={arguments['<timeout>']}" if arguments['<timeout>'] else ''
 
         script_to_run = create_sbatch_script(
             data_path=arguments['<data_path>'],
@@ -68,6 +119,7 @@ def create_sbatch_script(data_path: str,
     template = Template(SBATCH_TEMPLATE)
     script_text = template.render(
         job_name=f'chr{chromosome}',
+        container_image=CONTAINER_IMAGE,
         data_path=data_path,
         bedpe_path=in_bedpe,
         ccd_path=in_ccd,
@@ -84,6 +136,98 @@ def create_sbatch_script(data_path: str,
     return script_file_path
 
 
+def run_packed(arguments):
+    """
+    Splits input files in one job, packs CCDs into job arrays and
+    submits them with a dependent job merging the results.
+    """
+    local = arguments['--local']
+    submitter = LocalSubmitter(arguments['--local_processes']) if local else SbatchSubmitter()
+
+    out_dir = arguments['<out_dir>']
+    host_out_dir = out_dir if local else os.path.join(arguments['<data_path>'],
+                                                      os.path.relpath(out_dir, '/data'))
+    scripts_dir = os.path.join(host_out_dir, 'slurm')
+    os.makedirs(scripts_dir, exist_ok=True)
+
+    common_arguments = [f"--timeout={arguments['--timeout']}"]
+    if arguments['--full']:
+        common_arguments.append('--full')
+
+    print('Splitting input files.')
+    split_script = create_pack_sbatch_script(arguments, scripts_dir, 'split', SPLIT_RESOURCES,
+                                             common_arguments + ['--split_only'])
+    submitter.submit(split_script, wait=True)
+
+    with open(os.path.join(host_out_dir, 'ccd_costs.json')) as f:
+        ccds = json.load(f)
+
+    # array tasks read the same settings from environment and config file
+    config = RuntimeConfig.load(cli_values={'ccd_timeout': arguments['--timeout']})
+    timeout = int(config.ccd_timeout) + (int(config.pd_timeout) if arguments['--full'] else 0)
+
+    bins = pack_ccds(ccds, float(arguments['--max_bin_time']) * 3600,
+                     max_ccd_time=ccd_time_limit(timeout, config.retries))
+    classes = resource_classes(bins)
+
+    array_job_ids = []
+    for i, ((memory_gb, time_minutes), class_bins) in enumerate(sorted(classes.items())):
+        array_name = f'ccds_{i:02d}'
+
+        for j, ccd_bin in enumerate(class_bins):
+            with open(os.path.join(scripts_dir, f'{array_name}_{j}.txt'), 'w') as f:
+                f.writelines(f"{x['ccd_dir']}/{x['input_filename']}\n" for x in ccd_bin.ccds)
+
+        ccd_list = os.path.join(out_dir, 'slurm', f'{array_name}_${{SLURM_ARRAY_TASK_ID}}.txt')
+        array_script = create_pack_sbatch_script(arguments, scripts_dir, array_name, (memory_gb, time_minutes),
+                                                 common_arguments + [f'--ccd_list={ccd_list}'])
+        array_job_ids.append(submitter.submit(array_script, array_size=len(class_bins)))
+
+        print(f'Job array {array_name}: {len(class_bins)} tasks with {memory_gb}GB '
+              + f'and {time_minutes} minutes, {sum(len(x.ccds) for x in class_bins)} CCDs.')
+
+    merge_script = create_pack_sbatch_script(arguments, scripts_dir, 'merge', MERGE_RESOURCES,
+                                             common_arguments + ['--merge'])
+    merge_job_id = submitter.submit(merge_script, dependencies=array_job_ids)
+
+    print(f'{len(ccds)} CCDs packed into {len(bins)} array tasks, results merged by job {merge_job_id}, '
+          + 'CCDs left without results are listed in remaining_ccds.txt.')
+
+    submitter.wait_all()
+
+
+def create_pack_sbatch_script(arguments, scripts_dir, job_name, resources, cknots_arguments) -> str:
+    memory_gb, time_minutes = resources
+
+    if arguments['--local']:
+        cknots_script_path = os.path.join(os.path.split(os.path.realpath(__file__))[0], 'cknots.py')
+        cknots_command = f'{sys.executable} {cknots_script_path}'
+    else:
+        cknots_command = Template(CONTAINER_CKNOTS_COMMAND).render(
+            data_path=arguments['<data_path>'],
+            container_image=CONTAINER_IMAGE
+        )
+
+    script_text = Template(PACK_SBATCH_TEMPLATE).render(
+        job_name=job_name,
+        memory=memory_gb,
+        time=time_minutes,
+        partition=arguments['--partition'],
+        cknots_command=cknots_command,
+        bedpe_path=arguments['<in_bedpe>'],
+        ccd_path=arguments['<in_ccd>'],
+        results_path=arguments['<out_dir>'],
+        arguments=' '.join(cknots_arguments)
+    )
+
+    script_file_path = os.path.join(scripts_dir, f'{job_name}.sh')
+
+    with open(script_file_path, 'w') as f:
+        f.write(script_text)
+
+    return script_file_path
+
+
 def check_program_exists(name):
     app_version = which(name)
     if app_version is not None:
@@ -94,6 +238,14 @@ def check_program_exists(name):
 
 if __name__ == '__main__':
     parsed_args = docopt(__doc__)
-    check_program_exists('srun')
-    check_program_exists('enroot')
-    run_slurm(parsed_args)
+
+    if parsed_args['pack'] and parsed_args['--local']:
+        run_packed(parsed_args)
+    else:
+        check_program_exists('srun')
+        check_program_exists('enroot')
+
+        if parsed_args['pack']:
+            run_packed(parsed_args)
+        else:
+            run_slurm(parsed_args)
@@ -0,0 +1,46 @@
+from cknots.cknots.bedpe_sharding import chromosome_number, restore_line_numbers, shard_bedpe
+
+BEDPE_LINES = [
+    'chr1\t100\t200\tchr1\t900\t1000\t5\n',
+    'chr2\t100\t200\tchr2\t900\t1000\t3\n',
+    '\n',
+    'chrX\t100\t200\tchrX\t900\t1000\t2\n',
+    'chr1\t300\t400\tchr1\t700\t800\t4\n',
+    'chrUn_gl000220\t1\t2\tchrUn_gl000220\t3\t4\t9\n',
+    'chr2\t500\t600\tchr2\t700\t800\t7\n',
+]
+
+
+def test_chromosome_number():
+    assert [chromosome_number(x) for x in ['chr1', 'chr22', 'chrX', 'chrY', 'chrM', 'chrUn_gl000220', '1']] \
+        == [1, 22, 23, 24, 25, -1, -1]
+
+
+def test_shard_and_restore_line_numbers(tmp_path):
+    in_bedpe = tmp_path / 'in.bedpe'
+    in_bedpe.write_text(''.join(BEDPE_LINES))
+
+    shard_paths = shard_bedpe(str(in_bedpe), str(tmp_path / 'shards'), [1, 2, 3, 23])
+
+    assert shard_paths[3] is None
+    assert shard_paths[1] == str(tmp_path / 'shards' / 'chr_1' / 'in.bedpe')
+    with open(shard_paths[1]) as f:
+        assert f.readlines() == [BEDPE_LINES[0], BEDPE_LINES[4]]
+    with open(shard_paths[2]) as f:
+        assert f.readlines() == [BEDPE_LINES[1], BEDPE_LINES[6]]
+    with open(shard_paths[23]) as f:
+        assert f.readlines() == [BEDPE_LINES[3]]
+
+    # splitter numbers EDGE lines by line of its input (the shard)
+    mp_path = tmp_path / 'in.bedpe.0001.chr0002.mp'
+    mp_path.write_text('NODE chr2_0000000100\n'
+                       'NODE chr2_0000000700\n'
+                       'EDGE chr2_0000000100 chr2_0000000900 3 1\n'
+                       'EDGE chr2_0000000500 chr2_0000000700 7 2\n')
+
+    restore_line_numbers(str(mp_path), shard_paths[2])
+
+    assert mp_path.read_text() == ('NODE chr2_0000000100\n'
+                                   'NODE chr2_0000000700\n'
+                                   'EDGE chr2_0000000100 chr2_0000000900 3 2\n'
+                                   'EDGE chr2_0000000500 chr2_0000000700 7 7\n')
@@ -0,0 +1,110 @@
+import json
+import os
+
+from cknots.cknots.ccd_packing import GB, ccd_time_limit, pack_ccds
+from cknots.cknots.computation_scheduler import ComputationScheduler
+from cknots.cknots.cost_model import CostModel
+from cknots.cknots.memory_budget import MemoryEstimator
+from cknots.cknots.results_journal import ResultsJournal
+
+
+def ccd(runtime, memory_gb=1):
+    return {'predicted_runtime': runtime, 'memory_estimate': memory_gb * GB}
+
+
+def test_first_fit_decreasing():
+    bins = pack_ccds([ccd(20), ccd(50), ccd(30), ccd(40)], max_bin_runtime=60)
+
+    assert [[x['predicted_runtime'] for x in b.ccds] for b in bins] == [[50], [40, 20], [30]]
+    assert [b.runtime for b in bins] == [50, 60, 30]
+
+
+def test_long_ccd_gets_own_bin():
+    bins = pack_ccds([ccd(100), ccd(10)], max_bin_runtime=60)
+
+    assert [b.runtime for b in bins] == [100, 10]
+
+
+def test_memory_classes_not_mixed():
+    bins = pack_ccds([ccd(10, memory_gb=1), ccd(10, memory_gb=10)], max_bin_runtime=60)
+
+    assert sorted(b.memory_gb for b in bins) == [2, 16]
+
+
+def test_ccd_time_limit_covers_retries():
+    assert ccd_time_limit(3600) == 3600
+    assert ccd_time_limit(3600, retries=2) == 3600 + 7200 + 14400
+
+
+def test_time_limit_leaves_room_for_timeout():
+    # predicted 1h, but one CCD may use its whole 6h timeout
+    bins = pack_ccds([ccd(1800), ccd(1800)], max_bin_runtime=3600, max_ccd_time=6 * 3600)
+
+    assert len(bins) == 1
+    assert bins[0].time_minutes == 8 * 60
+
+    # without timeout, twice the predicted runtime with overhead
+    assert pack_ccds([ccd(1800), ccd(1800)], max_bin_runtime=3600)[0].time_minutes == 3 * 60
+
+
+def test_models_saved_by_concurrent_runs_are_merged(tmp_path):
+    model_path = str(tmp_path / 'cost_model.json')
+    features = {'nodes': 10, 'edges': 20, 'treewidth': 3, 'cutwidth': 4}
+
+    CostModel(model_path).save()
+
+    # array tasks start from the same file and save one after another
+    first, second = CostModel(model_path), CostModel(model_path)
+    first.observe('linear', features, 1.0)
+    second.observe('linear', features, 2.0)
+    second.observe('full', features, 3.0)
+    first.save()
+    second.save()
+
+    assert [runtime for _, runtime in CostModel(model_path).observations['linear']] == [1.0, 2.0]
+    assert [runtime for _, runtime in CostModel(model_path).observations['full']] == [3.0]
+    assert second.observations['linear'] == CostModel(model_path).observations['linear']
+
+    # saving again does not repeat observations
+    second.save()
+    assert len(CostModel(model_path).observations['linear']) == 2
+
+    memory_model_path = str(tmp_path / 'memory_model.json')
+    first, second = MemoryEstimator(memory_model_path), MemoryEstimator(memory_model_path)
+    first.observe('linear', 10, 20, 100)
+    second.observe('linear', 30, 40, 200)
+    first.save()
+    second.save()
+
+    assert MemoryEstimator(memory_model_path).observations['linear'] == [[30, 100], [70, 200]]
+
+
+def test_merge_lists_ccds_without_results(tmp_path):
+    out_dir = tmp_path / 'out'
+    (out_dir / 'chr_21').mkdir(parents=True)
+    (out_dir / 'chr_22').mkdir(parents=True)
+
+    with open(out_dir / 'ccd_costs.json', 'w') as f:
+        json.dump([{'ccd_dir': 'chr_21', 'input_filename': 't.0001.chr0021.mp', 'algorithm_type': 'linear'},
+                   {'ccd_dir': 'chr_21', 'input_filename': 't.0002.chr0021.mp', 'algorithm_type': 'linear'},
+                   {'ccd_dir': 'chr_22', 'input_filename': 't.0001.chr0022.mp', 'algorithm_type': 'linear'}], f)
+
+    journal = ResultsJournal(str(out_dir / 'chr_21' / 'results.jsonl'))
+    journal.append({'input_filename': 't.0002.chr0021.mp', 'return_code': 124})
+    journal.close()
+
+    assert ComputationScheduler('in.bedpe', 'in.bed', str(out_dir), 0, merge=True).run() == 0
+
+    with open(out_dir / 'remaining_ccds.txt') as f:
+        assert f.read() == 'chr_21/t.0001.chr0021.mp\nchr_22/t.0001.chr0022.mp\n'
+
+    journal = ResultsJournal(str(out_dir / 'chr_21' / 'results.jsonl'))
+    journal.append({'input_filename': 't.0001.chr0021.mp', 'return_code': 0})
+    journal.close()
+    journal = ResultsJournal(str(out_dir / 'chr_22' / 'results.jsonl'))
+    journal.append({'input_filename': 't.0001.chr0022.mp', 'return_code': 0})
+    journal.close()
+
+    ComputationScheduler('in.bedpe', 'in.bed', str(out_dir), 0, merge=True).run()
+
+    assert not os.path.exists(out_dir / 'remaining_ccds.txt')
@@ -0,0 +1,68 @@
+import random
+
+import pytest
+
+from cknots.preprocessing.fasta_index import IndexedFasta, read_fai
+
+SEQUENCES = {
+    'chr1': 'ACGTNacgtn' * 25 + 'ACG',
+    'chr2': 'TTGCA' * 3,
+    'chr3': '',
+    'chrX': 'G' * 60
+}
+
+
+def write_fasta(path, line_bases, newline='\n'):
+    with open(path, 'w', newline='') as f:
+        for name, sequence in SEQUENCES.items():
+            f.write(f'>{name} description{newline}')
+            for i in range(0, len(sequence), line_bases):
+                f.write(sequence[i:i + line_bases] + newline)
+
+
+def parse_fasta(path):
+    sequences = {}
+    with open(path) as f:
+        for line in f:
+            line = line.rstrip('\r\n')
+            if line.startswith('>'):
+                name = line[1:].split()[0]
+                sequences[name] = ''
+            else:
+                sequences[name] += line
+    return sequences
+
+
+@pytest.mark.parametrize('line_bases,newline', [(60, '\n'), (7, '\n'), (60, '\r\n')])
+def test_fetch_same_as_plain_parse(tmp_path, line_bases, newline):
+    fasta_path = str(tmp_path / 'ref.fa')
+    write_fasta(fasta_path, line_bases, newline)
+    sequences = parse_fasta(fasta_path)
+
+    random.seed(0)
+    with IndexedFasta(fasta_path) as fasta:
+        assert list(fasta.index) == list(SEQUENCES)
+
+        for name, sequence in sequences.items():
+            assert fasta.length(name) == len(sequence)
+            assert fasta.fetch(name) == sequence
+
+            for _ in range(50):
+                start = random.randint(-5, len(sequence) + 5)
+                end = random.randint(start, len(sequence) + 10)
+                assert fasta.fetch(name, start, end) == sequence[max(start, 0):max(end, 0)]
+
+        with pytest.raises(KeyError):
+            fasta.fetch('chr4')
+
+    # index written next to the file is used by the next run
+    with IndexedFasta(fasta_path) as fasta:
+        assert read_fai(f'{fasta_path}.fai') == fasta.index
+
+
+def test_lines_of_different_length_rejected(tmp_path):
+    fasta_path = tmp_path / 'ref.fa'
+    fasta_path.write_text('>chr1\nACGT\nAC\nACGT\n')
+
+    with pytest.raises(ValueError):
+        IndexedFasta(str(fasta_path))
@@ -0,0 +1,43 @@
+from cknots.cknots.graph_reduction import GraphBlock, map_minors_to_original, split_into_blocks
+
+
+def test_blocks_of_overlapping_edges():
+    edge_nodes = [(0, 3), (2, 1), (5, 8), (6, 7), (9, 9)]
+
+    blocks = split_into_blocks(edge_nodes, min_edges=1)
+
+    assert blocks == [GraphBlock(nodes=[0, 1, 2, 3], edges=[0, 1]), GraphBlock(nodes=[5, 6, 7, 8], edges=[2, 3])]
+
+
+def test_blocks_sharing_a_node():
+    blocks = split_into_blocks([(0, 3), (3, 5)], min_edges=1)
+
+    assert [x.nodes for x in blocks] == [[0, 3], [3, 5]]
+
+
+def test_small_blocks_skipped():
+    edge_nodes = [(0, 3), (1, 2), (5, 8)]
+
+    assert [x.edges for x in split_into_blocks(edge_nodes, min_edges=2)] == [[0, 1]]
+
+
+def test_minors_mapped_to_original_graph():
+    node_names = [f'n{i}' for i in range(10)]
+    block = GraphBlock(nodes=[2, 5, 9], edges=[4, 7])
+    raw_minors = ('MINOR { \n'
+                  '  endpoints=[\n'
+                  '    segment=0 start=(0=n2) end=(0=n2) \n'
+                  '    segment=1 start=(1=n5) end=(2=n9) \n'
+                  '  ]\n'
+                  '  edges=[\n'
+                  '  from 0 to 1, eid=1, left=(0=n2), right=(2=n9)\n'
+                  '  ]\n'
+                  '}\n')
+
+    mapped = map_minors_to_original(raw_minors + raw_minors, block, node_names).splitlines()
+
+    assert mapped[2] == '    segment=0 start=(0=n0) end=(2=n2) '
+    assert mapped[3] == '    segment=1 start=(3=n3) end=(9=n9) '
+    assert mapped[6] == '  from 0 to 1, eid=7, left=(2=n2), right=(9=n9)'
+    # segments of every minor start again at the first node
+    assert mapped[11] == mapped[2]
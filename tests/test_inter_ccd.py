@@ -0,0 +1,78 @@
+from cknots.cknots.inter_ccd import CCDBoundaries, crossing_minors, inter_ccd_windows, minor_edges, split_minors
+
+
+def minor(left, right):
+    return ('MINOR { \n'
+            '  edges=[\n'
+            f'  from 0 to 1, eid=0, left=(0=chr1_{left:010d}), right=(1=chr1_{right:010d})\n'
+            '  ]\n'
+            '}\n')
+
+
+def full_minor(left, right):
+    # find-knots writes a minor in one line, see print_minor() of minorfinder.cpp
+    return ('MINOR (jump_edges=1+0, max_branch_set=1, sum_branch_sets=6):  '
+            f'edge(0 1)=7=(chr1_{left:010d} chr1_{right:010d}) '
+            f'edge(2 3)=9=(chr1_{left + 50:010d} chr1_{right + 50:010d})\n')
+
+
+def test_windows_around_boundaries():
+    assert inter_ccd_windows([100, 1000], [600, 1600], 50) == [(550, 1050)]
+
+
+def test_windows_clipped_to_ccds():
+    assert inter_ccd_windows([100, 1000], [600, 1020], 200) == [(400, 1020)]
+
+
+def test_overlapping_windows_merged():
+    assert inter_ccd_windows([0, 1000, 2000], [900, 1900, 2900], 600) == [(300, 2600)]
+
+
+def test_touching_windows_not_merged():
+    assert inter_ccd_windows([0, 1000, 2000], [1000, 1500, 2500], 250) == [(750, 1250), (1250, 2250)]
+
+
+def test_windows_of_unsorted_ccds():
+    assert inter_ccd_windows([1000, 0], [1600, 600], 100) == [(500, 1100)]
+
+
+def test_single_ccd_has_no_windows():
+    assert inter_ccd_windows([0], [600], 100) == []
+
+
+def test_within_one_ccd():
+    boundaries = CCDBoundaries([0, 1000], [600, 1600])
+    assert boundaries.within_one_ccd([100, 600])
+    assert not boundaries.within_one_ccd([500, 1100])
+    assert not boundaries.within_one_ccd([700, 800])
+
+
+def test_crossing_minors_new_and_crossing_only():
+    boundaries = CCDBoundaries([0, 1000], [600, 1600])
+    crossing = minor(500, 1100)
+    inside = minor(100, 200)
+    known_edges = set()
+
+    assert crossing_minors(crossing + inside + crossing, known_edges, boundaries) == [crossing]
+    assert crossing_minors(crossing, known_edges, boundaries) == []
+
+
+def test_minor_edges_of_both_finders():
+    full = full_minor(500, 1100)
+
+    assert split_minors(full + full_minor(100, 200)) == [full, full_minor(100, 200)]
+    assert minor_edges(full) == frozenset([('chr1_0000000500', 'chr1_0000001100'),
+                                           ('chr1_0000000550', 'chr1_0000001150')])
+    assert minor_edges(minor(500, 1100)) == frozenset([('chr1_0000000500', 'chr1_0000001100')])
+
+    # node order of an edge does not matter
+    assert minor_edges(minor(1100, 500)) == minor_edges(minor(500, 1100))
+
+
+def test_crossing_minors_of_find_knots():
+    boundaries = CCDBoundaries([0, 1000], [600, 1600])
+    crossing = full_minor(500, 1100)
+    inside = full_minor(100, 200)
+    known_edges = {minor_edges(full_minor(520, 1120))}
+
+    assert crossing_minors(inside + crossing + full_minor(520, 1120), known_edges, boundaries) == [crossing]
@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+
+from cknots.preprocessing.motif_orientation import MOTIF_COLS, anchor_orientations, build_motif_index
+
+
+def motif_index(hits):
+    return build_motif_index(pd.DataFrame([x + ('chr1',) for x in hits], columns=MOTIF_COLS))
+
+
+def test_hit_with_the_lowest_score_chosen():
+    index = motif_index([(10, '+', 5.0), (20, '-', 1.0), (30, '+', 3.0)])
+
+    result = anchor_orientations(index, np.array([5, 25, 40]), np.array([25, 35, 50]))
+
+    assert list(result) == ['-', '+', '.']
+
+
+def test_hits_strictly_inside_anchor():
+    index = motif_index([(10, '+', 1.0), (20, '-', 2.0), (30, '+', 1.0)])
+
+    assert list(anchor_orientations(index, np.array([10]), np.array([30]))) == ['-']
+
+
+def test_equal_scores_resolved_by_position():
+    index = motif_index([(30, '+', 1.0), (10, '-', 1.0)])
+
+    assert list(anchor_orientations(index, np.array([0]), np.array([40]))) == ['-']
+
+
+def test_no_hits():
+    index = motif_index([])
+
+    assert list(anchor_orientations(index, np.array([0, 5]), np.array([40, 50]))) == ['.', '.']
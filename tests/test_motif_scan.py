@@ -0,0 +1,79 @@
+import os
+import random
+
+import numpy as np
+from Bio import motifs
+from Bio.Seq import Seq
+
+from cknots.preprocessing.motif_scan import iter_motif_hits, scan_sequence
+
+JASPAR = """>MA0001.1 TEST
+A [ 4 0 1 0 2 ]
+C [ 0 4 1 0 1 ]
+G [ 0 0 1 4 0 ]
+T [ 0 0 1 0 1 ]
+"""
+
+
+def random_sequence(length, seed):
+    random.seed(seed)
+    return ''.join(random.choice('ACGT') for _ in range(length))
+
+
+def read_test_pssm():
+    motif = motifs.create([Seq('ACAGA'), Seq('ACCGA'), Seq('ACGGC'), Seq('ACTGT')])
+    motif.pseudocounts = 0.5
+    return motif.pssm
+
+
+def test_scan_same_as_pssm_search():
+    pssm = read_test_pssm()
+    sequence = random_sequence(2000, seed=1) + 'acagaNNNNN'
+
+    for threshold in (-5.0, 0.0, 3.0):
+        positions, strands, scores = scan_sequence(pssm, sequence, threshold)
+
+        # Bio.motifs reports hits on the reverse strand at p - len(sequence),
+        # scan_sequence() puts forward hit first
+        expected = sorted(((p if p >= 0 else p + len(sequence), 1 if p >= 0 else -1, score)
+                           for p, score in pssm.search(Seq(sequence.upper()), threshold, both=True)),
+                          key=lambda x: (x[0], -x[1]))
+
+        assert [(p, s) for p, s, _ in expected] == list(zip(positions.tolist(), strands.tolist()))
+        np.testing.assert_allclose(scores, [x[2] for x in expected], rtol=1e-5)
+
+
+def test_short_sequence_has_no_hits():
+    positions, strands, scores = scan_sequence(read_test_pssm(), 'ACG')
+
+    assert len(positions) == len(strands) == len(scores) == 0
+
+
+def test_chunked_scan_same_as_whole_sequence(tmp_path):
+    sequences = {'chr1': random_sequence(1234, seed=2), 'chr2': random_sequence(77, seed=3)}
+
+    fasta_path = tmp_path / 'ref.fa'
+    with open(fasta_path, 'w') as f:
+        for name, sequence in sequences.items():
+            f.write(f'>{name}\n')
+            f.writelines(f'{sequence[i:i + 60]}\n' for i in range(0, len(sequence), 60))
+    motif_path = tmp_path / 'motif.jaspar'
+    motif_path.write_text(JASPAR)
+    cache_dir = str(tmp_path / 'cache')
+
+    with open(motif_path) as f:
+        pssm = list(motifs.parse(f, 'jaspar'))[-1].pssm
+
+    for _ in range(2):  # the second time hits are taken from cache
+        hits = dict(iter_motif_hits(str(fasta_path), str(motif_path), ['chr1', 'chr2'], threshold=0,
+                                    processes=1, cache_dir=cache_dir, chunk_size=100))
+
+        for name, sequence in sequences.items():
+            positions, strands, scores = scan_sequence(pssm, sequence, threshold=0)
+
+            assert hits[name].sequence_length == len(sequence)
+            assert hits[name].positions.tolist() == positions.tolist()
+            assert hits[name].strands.tolist() == strands.tolist()
+            np.testing.assert_allclose(hits[name].scores, scores, rtol=1e-5)
+
+    assert len(os.listdir(cache_dir)) == 2
@@ -0,0 +1,70 @@
+import io
+
+import pytest
+
+from cknots.preprocessing.pet_filter import _filter_block, filter_by_pet_counts, pet_filter_outputs
+
+BLOCK = (b'chr1\t1\t2\tchr1\t3\t4\t2\n'
+         b'chr2\t1\t2\tchr2\t3\t4\t10\n'
+         b'\n'
+         b'chr1\t1\t2\tchr1\t3\t4\t5\r\n'
+         b'chr10\t1\t2\tchr10\t3\t4\t1\n')
+
+
+def filter_block(block, min_pet_counts):
+    out_files = {x: io.BytesIO() for x in min_pet_counts}
+    histogram = {}
+    lines = _filter_block(block, min_pet_counts, out_files, histogram)
+    return lines, {x: f.getvalue() for x, f in out_files.items()}, histogram
+
+
+def test_lines_copied_for_every_count():
+    lines, outputs, _ = filter_block(BLOCK, [2, 5])
+
+    assert lines == 4
+    assert outputs[2] == (b'chr1\t1\t2\tchr1\t3\t4\t2\n'
+                          b'chr2\t1\t2\tchr2\t3\t4\t10\n'
+                          b'chr1\t1\t2\tchr1\t3\t4\t5\r\n')
+    assert outputs[5] == b'chr2\t1\t2\tchr2\t3\t4\t10\nchr1\t1\t2\tchr1\t3\t4\t5\r\n'
+
+
+def test_histogram_in_order_of_appearance():
+    _, _, histogram = filter_block(BLOCK, [2, 5])
+
+    assert list(histogram) == ['chr1', 'chr2', 'chr10']
+    assert histogram == {'chr1': {2: 2, 5: 1}, 'chr2': {2: 1, 5: 1}, 'chr10': {2: 0, 5: 0}}
+
+
+def test_invalid_count():
+    with pytest.raises(ValueError):
+        filter_block(b'chr1\t1\t2\tchr1\t3\t4\tfoo\n', [2])
+    with pytest.raises(ValueError):
+        filter_block(b'chr1\t1\t2\tchr1\t3\t4\t3 4\n', [2])
+
+
+def test_whitespace_around_count():
+    # as int() of the count did before
+    block = (b'chr1\t1\t2\tchr1\t3\t4\t3 \n'
+             b'chr1\t1\t2\tchr1\t3\t4\t 4\t\r\n'
+             b'chr1\t1\t2\tchr1\t3\t4\t1  \n'
+             b' \t\n')
+
+    lines, outputs, _ = filter_block(block, [3])
+
+    assert lines == 3
+    assert outputs[3] == b'chr1\t1\t2\tchr1\t3\t4\t3 \nchr1\t1\t2\tchr1\t3\t4\t 4\t\r\n'
+
+
+def test_last_line_without_newline(tmp_path):
+    in_bedpe = tmp_path / 'in.bedpe'
+    in_bedpe.write_bytes(b'chr1\t1\t2\tchr1\t3\t4\t1\nchr1\t1\t2\tchr1\t3\t4\t12')
+
+    histogram = filter_by_pet_counts(str(in_bedpe), {2: str(tmp_path / 'out.bedpe')})
+
+    assert (tmp_path / 'out.bedpe').read_bytes() == b'chr1\t1\t2\tchr1\t3\t4\t12\n'
+    assert histogram.loc['chr1', 2] == 1
+
+
+def test_outputs_of_several_counts():
+    assert pet_filter_outputs('out.bedpe', [3]) == {3: 'out.bedpe'}
+    assert pet_filter_outputs('out.bedpe', [2, 3]) == {2: 'out.min_pet_2.bedpe', 3: 'out.min_pet_3.bedpe'}
@@ -0,0 +1,34 @@
+import networkx as nx
+
+from cknots.analysis.ccd import parse_graph_from_mp
+from cknots.cknots.prescreen import k6_minor_excluded
+
+
+def test_k6_not_excluded():
+    assert k6_minor_excluded(nx.complete_graph(6)) is None
+
+
+def test_small_graph_excluded():
+    assert k6_minor_excluded(nx.complete_graph(5)) == 'size'
+    assert k6_minor_excluded(nx.path_graph(30)) == 'size'
+
+
+def test_low_treewidth_excluded():
+    # 24 edges, treewidth 4
+    assert k6_minor_excluded(nx.grid_2d_graph(4, 4)) == 'treewidth'
+
+
+def test_known_treewidth_bound_used():
+    assert k6_minor_excluded(nx.complete_graph(7), treewidth=4) == 'treewidth'
+
+
+def test_large_graph_not_screened():
+    assert k6_minor_excluded(nx.grid_2d_graph(4, 4), max_edges=20) is None
+
+
+def test_k6_of_contact_edges_on_backbone():
+    nodes = [f'chr1_{i:010d}' for i in range(6)]
+    edges = [f'EDGE {u} {v}' for i, u in enumerate(nodes) for v in nodes[i + 2:]]
+    graph = parse_graph_from_mp('\n'.join([f'NODE {x}' for x in nodes] + edges))
+
+    assert k6_minor_excluded(graph) is None
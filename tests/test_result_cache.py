@@ -0,0 +1,59 @@
+import os
+
+from cknots.cknots.result_cache import ResultCache
+
+
+def _write(path, text):
+    with open(path, 'w') as f:
+        f.write(text)
+    return str(path)
+
+
+def test_key_depends_on_graph_finder_and_arguments(tmp_path):
+    mp_path = _write(tmp_path / 'a.mp', 'EDGE a b 3 1\n')
+    other_mp_path = _write(tmp_path / 'b.mp', 'EDGE a b 4 1\n')
+    finder_path = _write(tmp_path / 'find-k6-linear', 'binary 1')
+
+    key = ResultCache.key(mp_path, [finder_path], ['-x'])
+
+    assert ResultCache.key(mp_path, [finder_path], ['-x']) == key
+    assert ResultCache.key(other_mp_path, [finder_path], ['-x']) != key
+    assert ResultCache.key(mp_path, [finder_path], None) != key
+    assert ResultCache.key(mp_path, [finder_path, finder_path], ['-x']) != key
+
+
+def test_store_and_fetch(tmp_path):
+    cache = ResultCache(str(tmp_path / 'cache'))
+    source = _write(tmp_path / 'a.mp.raw_minors', 'MINOR { }\n')
+    destination = str(tmp_path / 'b.mp.raw_minors')
+
+    assert not cache.fetch('ab' * 32, destination)
+    assert not os.path.exists(destination)
+
+    cache.store('ab' * 32, source)
+
+    assert cache.fetch('ab' * 32, destination)
+    with open(destination) as f:
+        assert f.read() == 'MINOR { }\n'
+    assert not cache.fetch('cd' * 32, destination)
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = ResultCache(str(tmp_path / 'cache'), max_size=25)
+    source = _write(tmp_path / 'a.raw_minors', 'x' * 10)
+    keys = ['a1' * 32, 'b2' * 32, 'c3' * 32]
+
+    cache.store(keys[0], source)
+    cache.store(keys[1], source)
+    os.utime(cache._entry_path(keys[0]), (1000, 1000))
+    os.utime(cache._entry_path(keys[1]), (2000, 2000))
+
+    # fetching marks the older entry as recently used
+    assert cache.fetch(keys[0], str(tmp_path / 'fetched.raw_minors'))
+
+    cache.store(keys[2], source)
+
+    assert os.path.exists(cache._entry_path(keys[0]))
+    assert not os.path.exists(cache._entry_path(keys[1]))
+    assert os.path.exists(cache._entry_path(keys[2]))
+    assert cache._size == 20
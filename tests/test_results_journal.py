@@ -0,0 +1,86 @@
+import json
+import os
+
+import pandas as pd
+
+from cknots.cknots.computation_scheduler import ComputationScheduler
+from cknots.cknots.results_journal import ResultsJournal
+
+
+def test_replay_after_torn_last_line(tmp_path):
+    path = str(tmp_path / 'results.jsonl')
+
+    journal = ResultsJournal(path)
+    journal.append({'input_filename': 'a.mp', 'return_code': 1})
+    journal.append({'input_filename': 'a.mp', 'return_code': 0})
+    journal.append({'input_filename': 'b.mp', 'return_code': 0})
+    journal.close()
+
+    with open(path, 'a') as f:
+        f.write('{"input_filename": "c.mp", "retu')
+
+    assert ResultsJournal(path).load() == {
+        'a.mp': {'input_filename': 'a.mp', 'return_code': 0},
+        'b.mp': {'input_filename': 'b.mp', 'return_code': 0}
+    }
+
+    journal = ResultsJournal(path)
+    journal.append({'input_filename': 'c.mp', 'return_code': 0})
+    journal.close()
+
+    with open(path) as f:
+        lines = f.readlines()
+    assert [json.loads(x)['input_filename'] for x in lines] == ['a.mp', 'a.mp', 'b.mp', 'c.mp']
+
+
+def _scheduler_with_ccds(tmp_path, filenames):
+    out_dir = tmp_path / 'out'
+    ccd_dir = out_dir / 'chr_22'
+    ccd_dir.mkdir(parents=True)
+    for filename in filenames:
+        (ccd_dir / filename).write_text('NODE chr22_0000000100\n')
+
+    all_ccds = pd.DataFrame({'chromosome': ['chr22'] * len(filenames),
+                             'start': [1000 * i for i in range(len(filenames))],
+                             'end': [1000 * i + 900 for i in range(len(filenames))]})
+
+    return ComputationScheduler('in.bedpe', 'in.bed', str(out_dir), 22), str(ccd_dir), all_ccds
+
+
+def test_resumed_run_skips_journaled_ccds(tmp_path):
+    scheduler, ccd_dir, all_ccds = _scheduler_with_ccds(tmp_path, ['t.0001.chr0022.mp', 't.0002.chr0022.mp',
+                                                                   't.0003.chr0022.mp'])
+
+    journal = ResultsJournal(os.path.join(ccd_dir, 'results.jsonl'))
+    journal.append({'input_filename': 't.0001.chr0022.mp', 'return_code': 0})
+    journal.append({'input_filename': 't.0002.chr0022.mp', 'return_code': 0})
+    journal.close()
+
+    # results of t.0002 were lost, it is computed again
+    open(os.path.join(ccd_dir, 't.0001.chr0022.mp.raw_minors'), 'w').close()
+
+    scheduler._load_previous_results(ccd_dir, 'linear')
+    tasks = scheduler._collect_ccd_tasks(ccd_dir, all_ccds, 'linear')
+
+    assert [(x.input_filename, x.ccd_start, x.ccd_end) for x in tasks] == [
+        ('t.0002.chr0022.mp', 1000, 1900),
+        ('t.0003.chr0022.mp', 2000, 2900)
+    ]
+
+
+def test_resumed_run_takes_results_json_without_journal(tmp_path):
+    scheduler, ccd_dir, all_ccds = _scheduler_with_ccds(tmp_path, ['t.0001.chr0022.mp', 't.0002.chr0022.mp'])
+
+    with open(os.path.join(ccd_dir, 'results.json'), 'w') as f:
+        json.dump([{'input_filename': 't.0002.chr0022.mp', 'return_code': 0}, None], f)
+    open(os.path.join(ccd_dir, 't.0002.chr0022.mp.raw_minors'), 'w').close()
+
+    scheduler.resuming_computation = True
+    scheduler._load_previous_results(ccd_dir, 'linear')
+    tasks = scheduler._collect_ccd_tasks(ccd_dir, all_ccds, 'linear')
+
+    assert [x.input_filename for x in tasks] == ['t.0001.chr0022.mp']
+
+    # and the journal continues from them
+    scheduler._journal(ccd_dir, 'linear').close()
+    assert list(ResultsJournal(os.path.join(ccd_dir, 'results.jsonl')).load()) == ['t.0002.chr0022.mp']
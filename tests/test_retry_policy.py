@@ -0,0 +1,47 @@
+import signal
+
+from cknots.cknots.computation_scheduler import CCDTask
+from cknots.cknots.retry_policy import RetryPolicy
+
+
+def task(algorithm_type='linear'):
+    return CCDTask('chr_01', 'ccd.mp', 0, 100, algorithm_type)
+
+
+def results(return_code, attempts=1, **fields):
+    return dict(return_code=return_code, attempts=[{}] * attempts, **fields)
+
+
+def test_timeout_retried_with_longer_timeout():
+    retried = RetryPolicy().retry(task(), results(124))
+
+    assert (retried.timeout_factor, retried.memory_factor) == (2, 1)
+
+
+def test_watchdog_kill_retried_with_more_memory():
+    retried = RetryPolicy().retry(task(), results(-signal.SIGKILL, finder_killed_by='memory_limit'))
+
+    assert (retried.timeout_factor, retried.memory_factor) == (1, 2)
+
+
+def test_kernel_oom_kill_retried_with_more_memory():
+    retried = RetryPolicy().retry(task('full'), results(-signal.SIGKILL))
+
+    assert retried.memory_factor == 2
+
+
+def test_other_failures_not_retried():
+    assert RetryPolicy().retry(task(), results(-signal.SIGABRT)) is None
+    assert RetryPolicy().retry(task(), results(1)) is None
+    assert RetryPolicy().retry(task(), results(0)) is None
+
+
+def test_attempts_limited():
+    assert RetryPolicy(max_attempts=2).retry(task(), results(124, attempts=2)) is None
+    assert RetryPolicy(max_attempts=3).retry(task(), results(124, attempts=2)) is not None
+
+
+def test_linear_retried_with_reduction():
+    assert RetryPolicy(reduce_linear=True).retry(task(), results(124)).reduce_graph
+    assert not RetryPolicy(reduce_linear=True).retry(task('full'), results(124)).reduce_graph
+    assert not RetryPolicy().retry(task(), results(124)).reduce_graph
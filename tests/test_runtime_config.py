@@ -0,0 +1,37 @@
+import json
+
+import pytest
+
+from cknots.cknots.runtime_config import RuntimeConfig
+
+
+def test_precedence(tmp_path):
+    config_path = tmp_path / 'config.json'
+    config_path.write_text(json.dumps({'workers': 2, 'ccd_timeout': 10, 'pd_workers': 5}))
+    environ = {'CKNOTS_WORKERS': '3', 'CKNOTS_PD_WORKERS': '6'}
+
+    config = RuntimeConfig.load({'workers': 4, 'pd_workers': None}, str(config_path), environ)
+
+    assert config.workers == 4
+    assert config.pd_workers == 6
+    assert config.ccd_timeout == 10
+    assert config.pd_timeout == RuntimeConfig().pd_timeout
+
+
+def test_config_path_from_environment(tmp_path):
+    config_path = tmp_path / 'config.json'
+    config_path.write_text(json.dumps({'max_memory': 1.5}))
+
+    config = RuntimeConfig.load(environ={'CKNOTS_CONFIG': str(config_path)})
+
+    assert config.max_memory == 1.5
+
+
+def test_unknown_setting(tmp_path):
+    with pytest.raises(ValueError):
+        RuntimeConfig.load({'worker': 4}, environ={})
+
+
+def test_invalid_value():
+    with pytest.raises(ValueError):
+        RuntimeConfig.load(environ={'CKNOTS_WORKERS': 'many'})